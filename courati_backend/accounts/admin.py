@@ -7,6 +7,8 @@ from .models import (
     User, StudentProfile, AdminProfile, 
     Level, Major, TeacherProfile, TeacherAssignment
 )
+from .permissions import invalidate_teacher_permissions
+from courses.services import curriculum
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -296,24 +298,39 @@ class TeacherAssignmentAdmin(admin.ModelAdmin):
     
     actions = ['activate_assignments', 'deactivate_assignments', 'grant_full_permissions']
     
+    def _update_assignments(self, queryset, **fields):
+        """
+        update() ne déclenche pas post_save : invalider ici la matrice de
+        permissions des professeurs concernés et les cohortes des matières
+        """
+        rows = list(queryset.values_list('teacher_id', 'subject_id'))
+        updated = queryset.update(**fields)
+        
+        for teacher_id in {teacher_id for teacher_id, _ in rows}:
+            invalidate_teacher_permissions(teacher_id)
+        curriculum.bump_subject_cohorts({subject_id for _, subject_id in rows})
+        
+        return updated
+    
     def activate_assignments(self, request, queryset):
-        queryset.update(is_active=True)
-        self.message_user(request, f"{queryset.count()} assignations activées.")
+        updated = self._update_assignments(queryset, is_active=True)
+        self.message_user(request, f"{updated} assignations activées.")
     activate_assignments.short_description = "Activer les assignations"
     
     def deactivate_assignments(self, request, queryset):
-        queryset.update(is_active=False)
-        self.message_user(request, f"{queryset.count()} assignations désactivées.")
+        updated = self._update_assignments(queryset, is_active=False)
+        self.message_user(request, f"{updated} assignations désactivées.")
     deactivate_assignments.short_description = "Désactiver les assignations"
     
     def grant_full_permissions(self, request, queryset):
-        queryset.update(
+        updated = self._update_assignments(
+            queryset,
             can_edit_content=True,
             can_upload_documents=True,
             can_delete_documents=True,
             can_manage_students=True
         )
-        self.message_user(request, f"Toutes les permissions accordées pour {queryset.count()} assignations.")
+        self.message_user(request, f"Toutes les permissions accordées pour {updated} assignations.")
     grant_full_permissions.short_description = "Accorder toutes les permissions"
 
 # Configuration de l'admin Django
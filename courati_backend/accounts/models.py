@@ -229,6 +229,62 @@ class TeacherAssignment(models.Model):
 
 
 
+def prune_favorites_after_major_change(user_ids_by_old_major, new_major_id):
+    """
+    Supprimer les favoris devenus non pertinents après un changement de filière,
+    pour un ensemble d'étudiants à la fois (une suppression par ancienne filière)
+    
+    Args:
+        user_ids_by_old_major: {ancienne filière (id): [user_id, ...]}
+        new_major_id: ID de la nouvelle filière
+    
+    Returns:
+        tuple: (favoris documents supprimés, favoris matières supprimés,
+                nombre de matières retirées)
+    """
+    from courses.models import UserFavorite, Subject
+    
+    new_subject_ids = set()
+    if new_major_id is not None:
+        new_subject_ids = set(Subject.objects.filter(
+            majors=new_major_id,
+            is_active=True
+        ).values_list('id', flat=True))
+    
+    deleted_docs = deleted_subjects = removed_count = 0
+    
+    for old_major_id, user_ids in user_ids_by_old_major.items():
+        if old_major_id is None or old_major_id == new_major_id:
+            continue
+        
+        # Matières de l'ancienne filière qui ne sont plus pertinentes
+        removed_subject_ids = set(Subject.objects.filter(
+            majors=old_major_id,
+            is_active=True
+        ).values_list('id', flat=True)) - new_subject_ids
+        
+        if not removed_subject_ids:
+            continue
+        
+        removed_count += len(removed_subject_ids)
+        
+        # Supprimer les favoris documents
+        deleted_docs += UserFavorite.objects.filter(
+            user_id__in=user_ids,
+            document__subject_id__in=removed_subject_ids,
+            favorite_type='DOCUMENT'
+        ).delete()[0]
+        
+        # Supprimer les favoris matières
+        deleted_subjects += UserFavorite.objects.filter(
+            user_id__in=user_ids,
+            subject_id__in=removed_subject_ids,
+            favorite_type='SUBJECT'
+        ).delete()[0]
+    
+    return deleted_docs, deleted_subjects, removed_count
+
+
 @receiver(pre_save, sender=StudentProfile)
 def handle_major_change(sender, instance, **kwargs):
     """
@@ -244,38 +300,12 @@ def handle_major_change(sender, instance, **kwargs):
         
         # Vérifier si la filière a réellement changé
         if old_profile.major != instance.major:
-            from courses.models import UserFavorite, Subject
-            
-            # Récupérer les matières de chaque filière
-            old_subjects = Subject.objects.filter(
-                majors=old_profile.major,
-                is_active=True
-            )
-            new_subjects = Subject.objects.filter(
-                majors=instance.major,
-                is_active=True
+            deleted_docs, deleted_subjects_fav, removed_count = prune_favorites_after_major_change(
+                {old_profile.major_id: [instance.user_id]},
+                instance.major_id
             )
             
-            # Identifier les matières qui ne sont plus pertinentes
-            removed_subject_ids = old_subjects.exclude(
-                id__in=new_subjects.values_list('id', flat=True)
-            ).values_list('id', flat=True)
-            
-            if removed_subject_ids:
-                # Supprimer les favoris documents
-                deleted_docs = UserFavorite.objects.filter(
-                    user=instance.user,
-                    document__subject_id__in=removed_subject_ids,
-                    favorite_type='DOCUMENT'
-                ).delete()[0]
-                
-                # Supprimer les favoris matières
-                deleted_subjects_fav = UserFavorite.objects.filter(
-                    user=instance.user,
-                    subject_id__in=removed_subject_ids,
-                    favorite_type='SUBJECT'
-                ).delete()[0]
-                
+            if removed_count:
                 total_deleted = deleted_docs + deleted_subjects_fav
                 
                 # Log pour monitoring
@@ -286,7 +316,7 @@ def handle_major_change(sender, instance, **kwargs):
                 print(f"Nouvelle filière: {instance.major.name} ({instance.major.code})")
                 print(f"✅ Quiz: CONSERVÉS (isolation automatique dans l'API)")
                 print(f"❤️  Favoris supprimés: {total_deleted} ({deleted_docs} docs, {deleted_subjects_fav} matières)")
-                print(f"📊 Matières retirées: {len(removed_subject_ids)}")
+                print(f"📊 Matières retirées: {removed_count}")
                 print(f"=" * 60)
             else:
                 print(f"ℹ️  Changement de filière pour {instance.user.username} : Aucune matière commune supprimée")
@@ -1,6 +1,7 @@
 # accounts/permissions.py
 from functools import wraps
-from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied as DRFPermissionDenied
@@ -46,6 +47,103 @@ def admin_or_teacher_required(function):
     return wrap
 
 
+# ========================================
+# MATRICE DE PERMISSIONS PROFESSEUR
+# ========================================
+
+TEACHER_PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+
+TEACHER_PERMISSION_FLAGS = (
+    'can_edit_content',
+    'can_upload_documents',
+    'can_delete_documents',
+    'can_manage_students',
+)
+
+
+def _teacher_permissions_key(teacher_id):
+    return f'teacher_permissions:{teacher_id}'
+
+
+def _subject_id(subject):
+    """Accepter une instance Subject ou directement son ID"""
+    return getattr(subject, 'pk', subject)
+
+
+def _parse_subject_id(value):
+    """ID de matière issu de l'URL ou des données POST (None si invalide)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_teacher_permissions(user):
+    """
+    Matrice des permissions d'un professeur : {subject_id: {flag: bool}}
+    pour ses assignations actives.
+    
+    Chargée une fois par requête (mémorisée sur l'instance user, partagée
+    par toute la requête) et mise en cache entre les requêtes ; invalidée
+    par les signaux TeacherAssignment (accounts/signals.py).
+    
+    Args:
+        user: Instance User
+    
+    Returns:
+        dict: {subject_id: {'can_edit_content': bool, ...}} (vide si pas professeur)
+    """
+    matrix = getattr(user, '_teacher_permissions', None)
+    if matrix is not None:
+        return matrix
+    
+    matrix = {}
+    if user.role == 'TEACHER':
+        key = _teacher_permissions_key(user.pk)
+        matrix = cache.get(key)
+        
+        if matrix is None:
+            from .models import TeacherAssignment
+            matrix = {
+                row['subject_id']: {flag: row[flag] for flag in TEACHER_PERMISSION_FLAGS}
+                for row in TeacherAssignment.objects.filter(
+                    teacher=user,
+                    is_active=True
+                ).values('subject_id', *TEACHER_PERMISSION_FLAGS)
+            }
+            cache.set(key, matrix, timeout=TEACHER_PERMISSIONS_CACHE_TIMEOUT)
+    
+    user._teacher_permissions = matrix
+    return matrix
+
+
+def invalidate_teacher_permissions(teacher_id):
+    """Assignation du professeur créée, modifiée ou supprimée"""
+    cache.delete(_teacher_permissions_key(teacher_id))
+
+
+def has_teacher_permission(user, subject, flag=None):
+    """
+    Vérifie une permission de la matrice professeur
+    
+    Args:
+        user: Instance User
+        subject: Instance Subject ou ID
+        flag: Permission granulaire (None = simple assignation active)
+    
+    Returns:
+        bool: True si autorisé
+    """
+    if user.role == 'ADMIN':
+        return True
+    
+    permissions_for_subject = get_teacher_permissions(user).get(_subject_id(subject))
+    if permissions_for_subject is None:
+        return False
+    
+    return flag is None or permissions_for_subject[flag]
+
+
 # ========================================
 # FONCTIONS DE VÉRIFICATION
 # ========================================
@@ -61,20 +159,8 @@ def has_subject_access(user, subject):
     Returns:
         bool: True si accès autorisé, False sinon
     """
-    # Admin a accès à tout
-    if user.role == 'ADMIN':
-        return True
-    
-    # Professeur doit avoir une assignation active
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        return TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=subject,
-            is_active=True
-        ).exists()
-    
-    return False
+    # Admin a accès à tout, professeur doit avoir une assignation active
+    return has_teacher_permission(user, subject)
 
 
 def can_upload_document(user, subject):
@@ -88,22 +174,7 @@ def can_upload_document(user, subject):
     Returns:
         bool: True si autorisé
     """
-    # Admin peut tout faire
-    if user.role == 'ADMIN':
-        return True
-    
-    # Vérifier permission spécifique du professeur
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=subject,
-            is_active=True
-        ).first()
-        
-        return assignment and assignment.can_upload_documents
-    
-    return False
+    return has_teacher_permission(user, subject, 'can_upload_documents')
 
 
 def can_edit_subject_content(user, subject):
@@ -117,20 +188,7 @@ def can_edit_subject_content(user, subject):
     Returns:
         bool: True si autorisé
     """
-    if user.role == 'ADMIN':
-        return True
-    
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=subject,
-            is_active=True
-        ).first()
-        
-        return assignment and assignment.can_edit_content
-    
-    return False
+    return has_teacher_permission(user, subject, 'can_edit_content')
 
 
 def can_delete_document(user, document):
@@ -144,20 +202,7 @@ def can_delete_document(user, document):
     Returns:
         bool: True si autorisé
     """
-    if user.role == 'ADMIN':
-        return True
-    
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=document.subject,
-            is_active=True
-        ).first()
-        
-        return assignment and assignment.can_delete_documents
-    
-    return False
+    return has_teacher_permission(user, document.subject_id, 'can_delete_documents')
 
 
 def can_manage_students(user, subject):
@@ -171,20 +216,7 @@ def can_manage_students(user, subject):
     Returns:
         bool: True si autorisé
     """
-    if user.role == 'ADMIN':
-        return True
-    
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=subject,
-            is_active=True
-        ).first()
-        
-        return assignment and assignment.can_manage_students
-    
-    return False
+    return has_teacher_permission(user, subject, 'can_manage_students')
 
 
 def get_teacher_subjects(user):
@@ -200,15 +232,86 @@ def get_teacher_subjects(user):
     if user.role != 'TEACHER':
         return []
     
-    from .models import TeacherAssignment
     from courses.models import Subject
     
-    assignment_ids = TeacherAssignment.objects.filter(
-        teacher=user,
-        is_active=True
-    ).values_list('subject_id', flat=True)
+    return Subject.objects.filter(id__in=list(get_teacher_permissions(user)), is_active=True)
+
+
+# ========================================
+# ACCÈS ÉTUDIANT (PROGRAMME DE COHORTE EN CACHE)
+# ========================================
+
+def get_student_subject_ids(user):
+    """
+    Matières accessibles à un étudiant : matières actives de sa cohorte
+    (niveau, filière), lues depuis le programme en cache
+    (courses/services/curriculum.py). Mémorisé sur l'instance user
+    pour la durée de la requête.
     
-    return Subject.objects.filter(id__in=assignment_ids, is_active=True)
+    Args:
+        user: Instance User
+    
+    Returns:
+        frozenset: IDs des matières (vide si pas étudiant ou profil incomplet)
+    """
+    subject_ids = getattr(user, '_student_subject_ids', None)
+    if subject_ids is not None:
+        return subject_ids
+    
+    subject_ids = frozenset()
+    if user.role == 'STUDENT':
+        from courses.services.curriculum import get_student_curriculum
+        try:
+            student_profile = user.student_profile
+        except ObjectDoesNotExist:
+            student_profile = None
+        if student_profile is not None:
+            subject_ids = frozenset(get_student_curriculum(student_profile)['subject_ids'])
+    
+    user._student_subject_ids = subject_ids
+    return subject_ids
+
+
+def can_access_subject(user, subject_id):
+    """
+    Vérifie si un étudiant peut consulter une matière
+    
+    Args:
+        user: Instance User
+        subject_id: ID de la matière
+    
+    Returns:
+        bool: True si la matière fait partie de sa cohorte
+    """
+    return subject_id in get_student_subject_ids(user)
+
+
+def can_access_document(user, document):
+    """
+    Vérifie si un étudiant peut consulter un document
+    
+    Args:
+        user: Instance User
+        document: Instance Document
+    
+    Returns:
+        bool: True si document actif dans une matière de sa cohorte
+    """
+    return document.is_active and can_access_subject(user, document.subject_id)
+
+
+def can_access_quiz(user, quiz):
+    """
+    Vérifie si un étudiant peut consulter un quiz (résultats, correction)
+    
+    Args:
+        user: Instance User
+        quiz: Instance Quiz
+    
+    Returns:
+        bool: True si le quiz appartient à une matière de sa cohorte
+    """
+    return can_access_subject(user, quiz.subject_id)
 
 
 # ========================================
@@ -261,16 +364,12 @@ class HasSubjectAccess(permissions.BasePermission):
             return True
         
         # Récupérer le subject_id depuis l'URL
-        subject_id = view.kwargs.get('pk') or view.kwargs.get('subject_id')
-        if not subject_id:
+        subject_id = _parse_subject_id(view.kwargs.get('pk') or view.kwargs.get('subject_id'))
+        if subject_id is None:
             return False
         
-        from courses.models import Subject
-        try:
-            subject = Subject.objects.get(id=subject_id)
-            return has_subject_access(request.user, subject)
-        except Subject.DoesNotExist:
-            return False
+        # Matière inexistante = absente de la matrice
+        return has_subject_access(request.user, subject_id)
     
     def has_object_permission(self, request, view, obj):
         """Vérification au niveau objet"""
@@ -278,8 +377,8 @@ class HasSubjectAccess(permissions.BasePermission):
             return True
         
         # obj peut être un Subject ou un Document
-        subject = obj if hasattr(obj, 'name') else obj.subject
-        return has_subject_access(request.user, subject)
+        subject_id = obj.pk if hasattr(obj, 'name') else obj.subject_id
+        return has_subject_access(request.user, subject_id)
 
 
 class CanUploadDocument(permissions.BasePermission):
@@ -293,16 +392,11 @@ class CanUploadDocument(permissions.BasePermission):
             return True
         
         # Pour les uploads, le subject_id est généralement dans les données POST
-        subject_id = request.data.get('subject') or view.kwargs.get('subject_id')
-        if not subject_id:
+        subject_id = _parse_subject_id(request.data.get('subject') or view.kwargs.get('subject_id'))
+        if subject_id is None:
             return False
         
-        from courses.models import Subject
-        try:
-            subject = Subject.objects.get(id=subject_id)
-            return can_upload_document(request.user, subject)
-        except Subject.DoesNotExist:
-            return False
+        return can_upload_document(request.user, subject_id)
 
 
 class CanEditSubjectContent(permissions.BasePermission):
@@ -348,16 +442,11 @@ class CanManageStudents(permissions.BasePermission):
         if request.user.role == 'ADMIN':
             return True
         
-        subject_id = view.kwargs.get('subject_id')
-        if not subject_id:
+        subject_id = _parse_subject_id(view.kwargs.get('subject_id'))
+        if subject_id is None:
             return False
         
-        from courses.models import Subject
-        try:
-            subject = Subject.objects.get(id=subject_id)
-            return can_manage_students(request.user, subject)
-        except Subject.DoesNotExist:
-            return False
+        return can_manage_students(request.user, subject_id)
 
 
 # ========================================
@@ -392,7 +481,7 @@ class TeacherSubjectPermission(permissions.BasePermission):
             return True
         
         # Déterminer le subject
-        subject = obj if hasattr(obj, 'name') else getattr(obj, 'subject', None)
+        subject = obj.pk if hasattr(obj, 'name') else getattr(obj, 'subject_id', None)
         
         if not subject:
             return False
@@ -428,23 +517,8 @@ def can_create_quiz(user, subject):
     Returns:
         bool: True si autorisé
     """
-    # Admin peut tout faire
-    if user.role == 'ADMIN':
-        return True
-    
-    # Professeur doit avoir les permissions d'édition de contenu
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=subject,
-            is_active=True
-        ).first()
-        
-        # Peut créer un quiz s'il peut éditer le contenu
-        return assignment and assignment.can_edit_content
-    
-    return False
+    # Peut créer un quiz s'il peut éditer le contenu
+    return has_teacher_permission(user, subject, 'can_edit_content')
 
 
 def can_edit_quiz(user, quiz):
@@ -458,20 +532,7 @@ def can_edit_quiz(user, quiz):
     Returns:
         bool: True si autorisé
     """
-    if user.role == 'ADMIN':
-        return True
-    
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=quiz.subject,
-            is_active=True
-        ).first()
-        
-        return assignment and assignment.can_edit_content
-    
-    return False
+    return has_teacher_permission(user, quiz.subject_id, 'can_edit_content')
 
 
 def can_delete_quiz(user, quiz):
@@ -485,21 +546,8 @@ def can_delete_quiz(user, quiz):
     Returns:
         bool: True si autorisé
     """
-    if user.role == 'ADMIN':
-        return True
-    
-    if user.role == 'TEACHER':
-        from .models import TeacherAssignment
-        assignment = TeacherAssignment.objects.filter(
-            teacher=user,
-            subject=quiz.subject,
-            is_active=True
-        ).first()
-        
-        # Peut supprimer s'il peut supprimer des documents
-        return assignment and assignment.can_delete_documents
-    
-    return False
+    # Peut supprimer s'il peut supprimer des documents
+    return has_teacher_permission(user, quiz.subject_id, 'can_delete_documents')
 
 
 def can_view_quiz_statistics(user, quiz):
@@ -518,7 +566,7 @@ def can_view_quiz_statistics(user, quiz):
     
     # Professeur assigné à la matière peut voir les stats
     if user.role == 'TEACHER':
-        return has_subject_access(user, quiz.subject)
+        return has_subject_access(user, quiz.subject_id)
     
     return False
 
@@ -552,17 +600,8 @@ def can_take_quiz(user, quiz):
     if quiz.available_until and now > quiz.available_until:
         return False
     
-    # Vérifier que l'étudiant a accès à la matière
-    try:
-        student_profile = user.student_profile
-        
-        # Vérifier que le niveau et la filière correspondent
-        return (
-            student_profile.level in quiz.subject.levels.all() and
-            student_profile.major in quiz.subject.majors.all()
-        )
-    except:
-        return False
+    # Vérifier que l'étudiant a accès à la matière (programme en cache)
+    return can_access_quiz(user, quiz)
 
 
 def has_quiz_attempts_left(user, quiz):
@@ -647,7 +686,7 @@ class CanManageQuiz(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             # Professeur : accès si assigné
             if request.user.role == 'TEACHER':
-                return has_subject_access(request.user, quiz.subject)
+                return has_subject_access(request.user, quiz.subject_id)
             # Étudiant : peut voir si peut passer le quiz
             if request.user.role == 'STUDENT':
                 return can_take_quiz(request.user, quiz)
@@ -4,6 +4,8 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import gettext_lazy as _
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import StudentProfile, AdminProfile, Level, Major
 from accounts.models import TeacherProfile, TeacherAssignment
 from courses.models import Subject
@@ -946,6 +948,38 @@ class StudentUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
+def annotate_student_activity_stats(queryset):
+    """
+    Annoter une liste d'étudiants avec les statistiques de StudentAdminListSerializer
+    (sous-requêtes corrélées, calculées seulement pour les lignes renvoyées) :
+    total_documents_viewed, total_quiz_attempts, last_activity
+    """
+    from courses.models import QuizAttempt, UserActivity
+    
+    def count_of(subquery):
+        return Coalesce(
+            Subquery(
+                subquery.order_by().values('user_id').annotate(total=Count('id')).values('total'),
+                output_field=models.IntegerField()
+            ),
+            0
+        )
+    
+    return queryset.annotate(
+        total_documents_viewed=count_of(
+            UserActivity.objects.filter(user_id=OuterRef('pk'), action='view')
+        ),
+        total_quiz_attempts=count_of(
+            QuizAttempt.objects.filter(user_id=OuterRef('pk'))
+        ),
+        last_activity=Subquery(
+            UserActivity.objects.filter(
+                user_id=OuterRef('pk')
+            ).order_by('-created_at').values('created_at')[:1]
+        )
+    )
+
+
 class StudentAdminListSerializer(serializers.ModelSerializer):
     """Serializer simple pour la liste des étudiants (Admin)"""
     full_name = serializers.CharField(source='get_full_name', read_only=True)
@@ -1001,8 +1035,13 @@ class StudentAdminListSerializer(serializers.ModelSerializer):
             logger.error(f"❌ Erreur get_major_id: {str(e)}")
         return None
     
+    # Les statistiques viennent de annotate_student_activity_stats() ;
+    # requêtes individuelles seulement pour un objet non annoté
+    
     def get_total_documents_viewed(self, obj):
         """Nombre de documents consultés"""
+        if hasattr(obj, 'total_documents_viewed'):
+            return obj.total_documents_viewed
         from courses.models import UserActivity
         return UserActivity.objects.filter(
             user=obj,
@@ -1011,11 +1050,15 @@ class StudentAdminListSerializer(serializers.ModelSerializer):
     
     def get_total_quiz_attempts(self, obj):
         """Nombre de tentatives de quiz"""
+        if hasattr(obj, 'total_quiz_attempts'):
+            return obj.total_quiz_attempts
         from courses.models import QuizAttempt
         return QuizAttempt.objects.filter(user=obj).count()
     
     def get_last_activity(self, obj):
         """Dernière activité"""
+        if hasattr(obj, 'last_activity'):
+            return obj.last_activity
         from courses.models import UserActivity
         last = UserActivity.objects.filter(user=obj).order_by('-created_at').first()
         return last.created_at if last else None
@@ -1071,7 +1114,8 @@ class StudentAdminDetailSerializer(serializers.ModelSerializer):
     
     def get_statistics(self, obj):
         """Statistiques globales de l'étudiant"""
-        from courses.models import UserActivity, QuizAttempt, UserFavorite
+        from courses.models import UserActivity, UserFavorite
+        from courses.analytics import student_quiz_performance
         
         try:
             # Documents
@@ -1079,32 +1123,12 @@ class StudentAdminDetailSerializer(serializers.ModelSerializer):
             total_downloads = UserActivity.objects.filter(user=obj, action='download').count()
             total_favorites = UserFavorite.objects.filter(user=obj).count()
             
-            # Quiz
-            quiz_attempts = QuizAttempt.objects.filter(user=obj)
-            total_attempts = quiz_attempts.count()
-            completed_attempts = quiz_attempts.filter(status='COMPLETED')
-            completed_count = completed_attempts.count()
-            
-            # Score moyen et taux de réussite
-            avg_score = 0
-            passed = 0
-            
-            if completed_count > 0:
-                scores = []
-                for attempt in completed_attempts.select_related('quiz'):
-                    total_points = attempt.quiz.total_points
-                    if total_points and total_points > 0:
-                        normalized = (float(attempt.score) / float(total_points)) * 20
-                        scores.append(normalized)
-                        
-                        percentage = (float(attempt.score) / float(total_points)) * 100
-                        if percentage >= float(attempt.quiz.passing_percentage):
-                            passed += 1
-                
-                if scores:
-                    avg_score = round(sum(scores) / len(scores), 2)
-            
-            pass_rate = round((passed / completed_count) * 100, 1) if completed_count > 0 else 0
+            # Quiz : score moyen (/20) et taux de réussite en une requête
+            performance = student_quiz_performance(obj)
+            total_attempts = performance['total_attempts']
+            completed_count = performance['completed_attempts']
+            avg_score = performance['average_score']
+            pass_rate = performance['pass_rate']
             
             return {
                 'total_views': total_views,
@@ -1147,7 +1171,8 @@ class StudentAdminDetailSerializer(serializers.ModelSerializer):
     
     def get_quiz_performance(self, obj):
         """Performance aux quiz par matière"""
-        from courses.models import QuizAttempt, Subject
+        from courses.models import Subject
+        from courses.analytics import student_quiz_performance_by_subject
         
         try:
             if not hasattr(obj, 'student_profile'):
@@ -1162,57 +1187,27 @@ class StudentAdminDetailSerializer(serializers.ModelSerializer):
                 majors=profile.major
             ).distinct()
             
+            # Une seule requête groupée par matière
+            stats_by_subject = student_quiz_performance_by_subject(
+                obj,
+                subject_ids=[subject.id for subject in subjects]
+            )
+            
             performance = []
             
             for subject in subjects:
-                attempts = QuizAttempt.objects.filter(
-                    user=obj,
-                    quiz__subject=subject
-                ).select_related('quiz')
-                
-                total = attempts.count()
-                if total == 0:
+                stats = stats_by_subject.get(subject.id)
+                if not stats:
                     continue
                 
-                completed = attempts.filter(status='COMPLETED')
-                completed_count = completed.count()
-                
-                if completed_count == 0:
-                    performance.append({
-                        'subject_id': subject.id,
-                        'subject_name': subject.name,
-                        'subject_code': subject.code,
-                        'total_attempts': total,
-                        'completed_attempts': 0,
-                        'average_score': 0,
-                        'pass_rate': 0
-                    })
-                    continue
-                
-                scores = []
-                passed = 0
-                
-                for attempt in completed:
-                    total_points = attempt.quiz.total_points
-                    if total_points and total_points > 0:
-                        normalized = (float(attempt.score) / float(total_points)) * 20
-                        scores.append(normalized)
-                        
-                        percentage = (float(attempt.score) / float(total_points)) * 100
-                        if percentage >= float(attempt.quiz.passing_percentage):
-                            passed += 1
-                
-                avg_score = round(sum(scores) / len(scores), 2) if scores else 0
-                pass_rate = round((passed / completed_count) * 100, 1)
-                
                 performance.append({
                     'subject_id': subject.id,
                     'subject_name': subject.name,
                     'subject_code': subject.code,
-                    'total_attempts': total,
-                    'completed_attempts': completed_count,
-                    'average_score': avg_score,
-                    'pass_rate': pass_rate
+                    'total_attempts': stats['total_attempts'],
+                    'completed_attempts': stats['completed_attempts'],
+                    'average_score': stats['average_score'],
+                    'pass_rate': stats['pass_rate']
                 })
             
             return performance
@@ -1,5 +1,5 @@
 # accounts/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
@@ -49,4 +49,12 @@ def set_default_quiz_permissions(sender, instance, created, **kwargs):
         TeacherAssignment.objects.filter(pk=instance.pk).update(
             can_edit_content=True,
             can_delete_documents=True
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=TeacherAssignment)
+@receiver(post_delete, sender=TeacherAssignment)
+def invalidate_teacher_permission_matrix(sender, instance, **kwargs):
+    """Invalider la matrice de permissions en cache du professeur"""
+    from .permissions import invalidate_teacher_permissions
+    invalidate_teacher_permissions(instance.teacher_id)
@@ -1,13 +1,14 @@
 import random
 import logging
+from collections import defaultdict
 from datetime import timedelta
 
 from django.utils import timezone
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Count, Sum, Avg, Q, F
-from django.db import models
+from django.db.models import Count, Sum, Avg, Q, F, Exists, OuterRef
+from django.db import models, transaction
 from django.shortcuts import get_object_or_404
 
 
@@ -15,12 +16,13 @@ from rest_framework import status, permissions, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.permissions import IsAuthenticated
 
-from .models import StudentProfile, Level, Major
+from .models import StudentProfile, Level, Major, prune_favorites_after_major_change
 from accounts.models import AdminProfile, TeacherProfile, TeacherAssignment
 from .serializers import (
     CustomTokenObtainPairSerializer,
@@ -39,7 +41,12 @@ from .serializers import (
     WebChangePasswordSerializer
 )
 from courses.models import Subject, Document, Quiz, QuizAttempt, UserActivity,  UserFavorite
+from courses.services.activity_rollup import get_daily_counts
+from courses.services.document_counters import apply_buffered_counts
+from courses.analytics import global_quiz_performance, quiz_performance_by
 from accounts.permissions import IsAdminPermission
+from config.pagination import cursor_requested, paginate_request
+from courses.views import AdminExportView
 from accounts.serializers import (
     TeacherProfileDetailSerializer,
     TeacherCreateSerializer,
@@ -48,6 +55,7 @@ from accounts.serializers import (
     StudentCreateSerializer,
     StudentUpdateSerializer,
     StudentAdminListSerializer,
+    annotate_student_activity_stats,
     StudentAdminDetailSerializer,
     StudentStatisticsSerializer,
     BulkStudentActionSerializer,
@@ -1434,38 +1442,22 @@ class AdminDashboardView(APIView):
             # 4. CHRONOLOGIE D'ACTIVITÉ (7 derniers jours)
             # =====================================
             
-            activity_timeline = []
-            for i in range(6, -1, -1):
-                day = now - timedelta(days=i)
-                day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-                
-                activity_timeline.append({
-                    'date': day_start.date(),
-                    'new_students': User.objects.filter(
-                        role='STUDENT',
-                        date_joined__gte=day_start,
-                        date_joined__lt=day_end
-                    ).count(),
-                    'new_documents': Document.objects.filter(
-                        created_at__gte=day_start,
-                        created_at__lt=day_end
-                    ).count(),
-                    'views': UserActivity.objects.filter(
-                        action='view',
-                        created_at__gte=day_start,
-                        created_at__lt=day_end
-                    ).count(),
-                    'downloads': UserActivity.objects.filter(
-                        action='download',
-                        created_at__gte=day_start,
-                        created_at__lt=day_end
-                    ).count(),
-                    'quiz_attempts': QuizAttempt.objects.filter(
-                        started_at__gte=day_start,
-                        started_at__lt=day_end
-                    ).count()
-                })
+            timeline_dates, daily_counts = get_daily_counts(
+                days=7,
+                actions=['new_student', 'new_document', 'view', 'download', 'quiz_attempt']
+            )
+            
+            def day_count(day, action):
+                return daily_counts.get((day, action), {}).get('count', 0)
+            
+            activity_timeline = [{
+                'date': day,
+                'new_students': day_count(day, 'new_student'),
+                'new_documents': day_count(day, 'new_document'),
+                'views': day_count(day, 'view'),
+                'downloads': day_count(day, 'download'),
+                'quiz_attempts': day_count(day, 'quiz_attempt')
+            } for day in timeline_dates]
             
             # =====================================
             # 5. TOP MATIÈRES
@@ -1490,9 +1482,11 @@ class AdminDashboardView(APIView):
             # 6. TOP DOCUMENTS
             # =====================================
             
-            top_documents_data = Document.objects.select_related('subject').filter(
-                is_active=True
-            ).order_by('-view_count')[:10]
+            top_documents_data = apply_buffered_counts(
+                Document.objects.select_related('subject').filter(
+                    is_active=True
+                ).order_by('-view_count')[:10]
+            )
             
             top_documents = [{
                 'document_id': d.id,
@@ -1507,71 +1501,30 @@ class AdminDashboardView(APIView):
             # 7. PERFORMANCE DES QUIZ (corrigé)
             # =====================================
 
-            total_attempts = QuizAttempt.objects.count()
-            completed_attempts = QuizAttempt.objects.filter(status='COMPLETED').count()
-
-            # Calcul de la note moyenne (normalisée sur 20)
-            avg_score_data = QuizAttempt.objects.filter(
-                status='COMPLETED'
-            ).select_related('quiz')
+            # Note moyenne (normalisée sur 20) et taux de réussite global
+            # calculés en une seule requête agrégée
+            global_performance = global_quiz_performance()
 
-            average_score = 0
-            if avg_score_data.exists():
-                scores = []
-                for attempt in avg_score_data:
-                    total = attempt.quiz.total_points
-                    if total > 0:
-                        normalized = (float(attempt.score) / float(total)) * 20
-                        scores.append(normalized)
-                
-                if scores:
-                    average_score = round(sum(scores) / len(scores), 2)
-
-            # Taux de réussite global
-            completed = QuizAttempt.objects.filter(status='COMPLETED').select_related('quiz')
-
-            passed = 0
-            for attempt in completed:
-                total = attempt.quiz.total_points
-                if total > 0:
-                    score_percentage = (float(attempt.score) / float(total)) * 100
-                    if score_percentage >= attempt.quiz.passing_percentage:
-                        passed += 1
-
-            pass_rate = 0
-            if completed.count() > 0:
-                pass_rate = round((passed / completed.count()) * 100, 1)
+            total_attempts = global_performance['total_attempts']
+            completed_attempts = global_performance['completed_attempts']
+            average_score = global_performance['average_score']
+            pass_rate = global_performance['pass_rate']
 
             # Quiz les plus difficiles (taux de réussite le plus bas)
-            hardest_quizzes = []
-            quizzes_with_attempts = Quiz.objects.annotate(
-                attempt_count=Count('attempts', filter=Q(attempts__status='COMPLETED'))
-            ).filter(attempt_count__gte=3)  # Au moins 3 tentatives
-
-            for quiz in quizzes_with_attempts:
-                completed_quiz_attempts = QuizAttempt.objects.filter(
-                    quiz=quiz,
-                    status='COMPLETED'
-                )
-                completed_count = completed_quiz_attempts.count()
-
-                if completed_count > 0:
-                    passed_quiz = 0
-                    for attempt in completed_quiz_attempts:
-                        total = attempt.quiz.total_points
-                        if total > 0:
-                            score_percentage = (float(attempt.score) / float(total)) * 100
-                            if score_percentage >= attempt.quiz.passing_percentage:
-                                passed_quiz += 1
-
-                    quiz_pass_rate = (passed_quiz / completed_count) * 100
-                    hardest_quizzes.append({
-                        'quiz_id': quiz.id,
-                        'title': quiz.title,
-                        'subject': quiz.subject.name,
-                        'attempts': completed_count,
-                        'pass_rate': round(quiz_pass_rate, 1)
-                    })
+            quiz_stats = quiz_performance_by(
+                QuizAttempt.objects.filter(status='COMPLETED'),
+                'quiz_id',
+                extra_fields=('quiz__title', 'quiz__subject__name')
+            )
+
+            hardest_quizzes = [{
+                'quiz_id': quiz_id,
+                'title': stats['quiz__title'],
+                'subject': stats['quiz__subject__name'],
+                'attempts': stats['completed_attempts'],
+                'pass_rate': stats['pass_rate']
+            } for quiz_id, stats in quiz_stats.items()
+              if stats['completed_attempts'] >= 3]  # Au moins 3 tentatives
 
             # Trier pour obtenir les 5 plus difficiles
             hardest_quizzes = sorted(hardest_quizzes, key=lambda x: x['pass_rate'])[:5]
@@ -1806,7 +1759,7 @@ class AdminStudentListCreateView(APIView):
                     Q(student_profile__phone_number__icontains=search)
                 )
             
-            # Tri
+            # Tri (l'id départage les égalités pour la pagination par curseur)
             order_by = request.GET.get('order_by', '-date_joined')
             allowed_orders = [
                 'date_joined', '-date_joined',
@@ -1814,16 +1767,30 @@ class AdminStudentListCreateView(APIView):
                 'last_name', '-last_name',
                 'email', '-email'
             ]
-            if order_by in allowed_orders:
-                queryset = queryset.order_by(order_by)
+            if order_by not in allowed_orders:
+                order_by = '-date_joined'
+            ordering = (order_by, '-id' if order_by.startswith('-') else 'id')
+            
+            # Pagination par curseur sur demande (?cursor=) ; sinon liste complète
+            if cursor_requested(request):
+                students, pagination = paginate_request(
+                    request,
+                    annotate_student_activity_stats(queryset),
+                    ordering
+                )
+                total_students = pagination['total']
+            else:
+                students = list(annotate_student_activity_stats(queryset).order_by(*ordering))
+                pagination, total_students = None, len(students)
             
             # Sérialiser les résultats
-            serializer = StudentAdminListSerializer(queryset, many=True)
+            serializer = StudentAdminListSerializer(students, many=True)
             
             return Response({
                 'success': True,
-                'total_students': queryset.count(),
+                'total_students': total_students,
                 'students': serializer.data,
+                'pagination': pagination,
                 'filters_applied': {
                     'is_active': is_active,
                     'level': level_id,
@@ -1832,6 +1799,12 @@ class AdminStudentListCreateView(APIView):
                 }
             })
             
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'error': 'Paramètres de pagination invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"❌ Erreur liste étudiants: {str(e)}")
             import traceback
@@ -2228,43 +2201,66 @@ class AdminStudentBulkActionView(APIView):
                 logger.info(f"✅ {count} étudiant(s) désactivé(s)")
             
             elif action == 'delete':
-                # Vérifier qu'ils n'ont pas d'activités
-                for student in students:
-                    activity_count = UserActivity.objects.filter(user=student).count()
-                    quiz_count = QuizAttempt.objects.filter(user=student).count()
-                    
-                    if activity_count > 0 or quiz_count > 0:
-                        results['error_count'] += 1
-                        results['errors'].append({
-                            'student_id': student.id,
-                            'student_name': student.get_full_name(),
-                            'error': 'A des activités ou tentatives de quiz'
-                        })
-                    else:
-                        student.delete()
-                        results['success_count'] += 1
+                # Étudiants ayant des activités ou tentatives : une seule requête annotée
+                blocked = students.annotate(
+                    has_activity=Exists(UserActivity.objects.filter(user=OuterRef('pk'))),
+                    has_attempts=Exists(QuizAttempt.objects.filter(user=OuterRef('pk')))
+                ).filter(Q(has_activity=True) | Q(has_attempts=True))
+                
+                blocked_ids = []
+                for student in blocked:
+                    blocked_ids.append(student.id)
+                    results['error_count'] += 1
+                    results['errors'].append({
+                        'student_id': student.id,
+                        'student_name': student.get_full_name(),
+                        'error': 'A des activités ou tentatives de quiz'
+                    })
+                
+                with transaction.atomic():
+                    results['success_count'] = students.exclude(id__in=blocked_ids).delete()[1].get(
+                        User._meta.label, 0
+                    )
                 
                 logger.info(f"✅ {results['success_count']} étudiant(s) supprimé(s)")
             
             elif action == 'change_level':
                 new_level = serializer.validated_data['new_level']
                 
-                for student in students:
-                    student.student_profile.level = new_level
-                    student.student_profile.save(update_fields=['level'])
-                    results['success_count'] += 1
+                # Mise à jour groupée (la clé du cache d'accueil inclut le niveau)
+                results['success_count'] = StudentProfile.objects.filter(
+                    user__in=students
+                ).update(level=new_level, updated_at=timezone.now())
                 
                 logger.info(f"✅ {results['success_count']} étudiant(s) changé(s) de niveau")
             
             elif action == 'change_major':
                 new_major = serializer.validated_data['new_major']
+                profiles = StudentProfile.objects.filter(user__in=students)
                 
-                for student in students:
-                    student.student_profile.major = new_major
-                    student.student_profile.save(update_fields=['major'])
-                    results['success_count'] += 1
+                # Étudiants regroupés par ancienne filière
+                user_ids_by_old_major = defaultdict(list)
+                for user_id, major_id in profiles.exclude(
+                    major=new_major
+                ).values_list('user_id', 'major_id'):
+                    user_ids_by_old_major[major_id].append(user_id)
                 
-                logger.info(f"✅ {results['success_count']} étudiant(s) changé(s) de filière")
+                with transaction.atomic():
+                    # Même nettoyage des favoris que handle_major_change, pour tout le lot
+                    deleted_docs, deleted_subjects, _ = prune_favorites_after_major_change(
+                        user_ids_by_old_major,
+                        new_major.id
+                    )
+                    results['success_count'] = profiles.update(
+                        major=new_major,
+                        updated_at=timezone.now()
+                    )
+                
+                results['favorites_removed'] = deleted_docs + deleted_subjects
+                logger.info(
+                    f"✅ {results['success_count']} étudiant(s) changé(s) de filière, "
+                    f"{results['favorites_removed']} favori(s) supprimé(s)"
+                )
             
             return Response({
                 'success': True,
@@ -2284,94 +2280,13 @@ class AdminStudentBulkActionView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class AdminStudentExportView(APIView):
+class AdminStudentExportView(AdminExportView):
     """
-    Export des étudiants en CSV
-    GET /api/auth/admin/students/export/
+    Export des étudiants en CSV (flux) ou XLSX
+    GET /api/auth/admin/students/export/?level=&major=&is_active=&export_format=csv|xlsx&async=true
     """
     permission_classes = [IsAdminPermission]
-    
-    def get(self, request):
-        """Exporter les étudiants en CSV"""
-        logger.info(f"📥 Export étudiants par admin: {request.user.username}")
-        
-        try:
-            import csv
-            from django.http import HttpResponse
-            
-            # Créer la réponse HTTP
-            response = HttpResponse(content_type='text/csv; charset=utf-8')
-            response['Content-Disposition'] = 'attachment; filename="etudiants.csv"'
-            
-            # Ajouter le BOM UTF-8 pour Excel
-            response.write('\ufeff')
-            
-            writer = csv.writer(response)
-            
-            # En-têtes (sans "Numéro étudiant")
-            writer.writerow([
-                'ID',
-                'Nom d\'utilisateur',
-                'Email',
-                'Prénom',
-                'Nom',
-                'Niveau',
-                'Filière',
-                'Téléphone',
-                'Actif',
-                'Date d\'inscription'
-            ])
-            
-            # Récupérer les étudiants avec filtres
-            queryset = User.objects.filter(role='STUDENT').select_related(
-                'student_profile',
-                'student_profile__level',
-                'student_profile__major'
-            )
-            
-            # Appliquer les mêmes filtres que la liste
-            level_id = request.GET.get('level', None)
-            if level_id:
-                queryset = queryset.filter(student_profile__level_id=level_id)
-            
-            major_id = request.GET.get('major', None)
-            if major_id:
-                queryset = queryset.filter(student_profile__major_id=major_id)
-            
-            is_active = request.GET.get('is_active', None)
-            if is_active is not None:
-                queryset = queryset.filter(is_active=is_active.lower() == 'true')
-            
-            # Écrire les données
-            for student in queryset:
-                profile = student.student_profile if hasattr(student, 'student_profile') else None
-                writer.writerow([
-                    student.id,
-                    student.username,
-                    student.email,
-                    student.first_name,
-                    student.last_name,
-                    profile.level.name if profile and profile.level else '',
-                    profile.major.name if profile and profile.major else '',
-                    profile.phone_number if profile else '',
-                    'Oui' if student.is_active else 'Non',
-                    student.date_joined.strftime('%Y-%m-%d %H:%M')
-                ])
-            
-            logger.info(f"✅ Export de {queryset.count()} étudiant(s)")
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur export étudiants: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-            return Response({
-                'success': False,
-                'error': 'Erreur serveur',
-                'details': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    source_name = 'students'
 
 
 # ========================================
@@ -24,12 +24,51 @@ app.conf.beat_schedule = {
         'task': 'notifications.tasks.delete_old_notifications',
         'schedule': crontab(hour=3, minute=0),
     },
+    # Recalculer les agrégats d'activité des dashboards (hier + aujourd'hui)
+    # S'exécute toutes les heures
+    'rebuild-daily-activity-rollup-hourly': {
+        'task': 'courses.tasks.rebuild_daily_activity_rollup',
+        'schedule': crontab(minute=15),
+    },
+    # Reporter les compteurs de vues / téléchargements des documents
+    # S'exécute toutes les minutes
+    'flush-document-counters-every-minute': {
+        'task': 'courses.tasks.flush_document_counters',
+        'schedule': crontab(),
+    },
+    # Supprimer les exports administrateur expirés (EXPORT_RETENTION_HOURS)
+    # S'exécute toutes les heures
+    'delete-expired-exports-hourly': {
+        'task': 'courses.tasks.delete_expired_exports',
+        'schedule': crontab(minute=45),
+    },
+    # Partitions mensuelles de l'historique d'activité + rétention
+    # S'exécute tous les jours à 2h30 du matin
+    'maintain-activity-partitions-daily': {
+        'task': 'courses.tasks.maintain_activity_partitions',
+        'schedule': crontab(hour=2, minute=30),
+    },
 }
 
 # Configuration timezone
 app.conf.timezone = 'UTC'
 
 
+@app.on_after_configure.connect
+def schedule_activity_flush(sender, **kwargs):
+    """
+    Enregistrer par lots les activités mises en file par les vues
+    Intervalle : settings.ACTIVITY_INGEST_FLUSH_INTERVAL (5 secondes par défaut)
+    """
+    from django.conf import settings
+
+    sender.add_periodic_task(
+        getattr(settings, 'ACTIVITY_INGEST_FLUSH_INTERVAL', 5.0),
+        sender.signature('courses.tasks.flush_activity_events'),
+        name='flush-activity-events'
+    )
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     """Tâche de debug pour tester Celery"""
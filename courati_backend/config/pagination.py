@@ -0,0 +1,205 @@
+# 📁 courati_backend/config/pagination.py
+"""
+Pagination par curseur (keyset).
+
+Au lieu d'un OFFSET, chaque page reprend après la dernière ligne de la page
+précédente : WHERE (tri) > (valeurs de la dernière ligne). Une page profonde
+coûte donc autant que la première.
+
+Le curseur est opaque pour le client : valeurs de tri de la dernière ligne,
+encodées en JSON puis base64. Le tri doit se terminer par une clé unique
+(l'id) pour que chaque ligne ait une position stable.
+
+paginate_request() regroupe le tout pour une vue : lecture de ?cursor=,
+?page_size= (alias ?limit=) et ?total=exact|approx|none, et renvoie les
+métadonnées communes à toutes les listes paginées :
+
+    {'page_size', 'next_cursor', 'has_more', 'total', 'total_is_approximate'}
+
+Le total approximatif vient des statistiques PostgreSQL (pg_class.reltuples)
+pour une table non filtrée, sinon d'un COUNT exact.
+
+Le mode curseur est activé par le client (?cursor=, vide pour la première
+page, cf. cursor_requested) : sans ce paramètre, les vues gardent leur
+contrat historique (?page= / total_pages, liste complète ou ?limit=).
+"""
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+TOTAL_MODES = ('exact', 'approx', 'none')
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Dates à la microseconde (DjangoJSONEncoder tronque aux millisecondes)"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    """Valeurs de tri contenues dans le curseur (ValidationError si invalide)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError({'cursor': 'Curseur invalide'})
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValidationError({'cursor': 'Curseur invalide'})
+    return values
+
+
+def cursor_requested(request):
+    """Le client demande-t-il la pagination par curseur (?cursor=, même vide) ?"""
+    return 'cursor' in request.query_params
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    """Taille de page demandée (?page_size= ou ?limit=), bornée à MAX_PAGE_SIZE"""
+    params = request.query_params
+    try:
+        page_size = int(params.get('page_size', params.get('limit', default)))
+    except ValueError:
+        raise ValidationError({'page_size': 'Doit être un entier'})
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_filter(ordering, values):
+    """
+    Condition « après cette ligne » pour un tri multi-colonnes :
+    (a > x) OR (a = x AND b > y) OR ... ; '<' pour les champs décroissants.
+    """
+    conditions = []
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+
+        condition = {f'{name}__{lookup}': values[index]}
+        for previous, value in zip(ordering[:index], values):
+            condition[previous.lstrip('-')] = value
+        conditions.append(Q(**condition))
+
+    return reduce(or_, conditions)
+
+
+def _sort_value(obj, field):
+    """Valeur d'un champ de tri sur l'objet (chemins 'user__last_name' inclus)"""
+    value = obj
+    for attr in field.lstrip('-').split('__'):
+        value = getattr(value, attr)
+    return value
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Une page du queryset trié par `ordering`, à partir du curseur.
+
+    Returns:
+        tuple: (objets de la page, curseur de la page suivante ou None)
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, ordering)))
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    next_cursor = encode_cursor([_sort_value(items[-1], field) for field in ordering])
+    return items, next_cursor
+
+
+# ========================================
+# TOTAL (EXACT OU APPROXIMATIF)
+# ========================================
+
+def approximate_count(queryset):
+    """
+    Nombre de lignes estimé par PostgreSQL (pg_class.reltuples, partitions
+    comprises) si le queryset n'est pas filtré ; COUNT exact sinon.
+
+    Returns:
+        tuple: (total, True si approximatif)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return queryset.count(), False
+
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint,
+                   BOOL_OR(c.reltuples >= 0)
+            FROM pg_class c
+            WHERE c.oid = %s::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+            """,
+            [table, table]
+        )
+        estimate, analyzed = cursor.fetchone()
+
+    # Table jamais analysée : pas de statistiques exploitables
+    if not analyzed:
+        return queryset.count(), False
+    return estimate, True
+
+
+def paginate_request(request, queryset, ordering, default_page_size=DEFAULT_PAGE_SIZE, total='exact'):
+    """
+    Page courante d'une vue liste + métadonnées de pagination.
+
+    Args:
+        request: Requête DRF (?cursor=, ?page_size=, ?total=)
+        queryset: QuerySet filtré (non trié)
+        ordering: Champs de tri, terminés par une clé unique
+        default_page_size: Taille de page par défaut de la vue
+        total: Mode de total par défaut ('exact', 'approx' ou 'none')
+
+    Returns:
+        tuple: (objets de la page, métadonnées)
+    """
+    total_mode = request.query_params.get('total', total)
+    if total_mode not in TOTAL_MODES:
+        raise ValidationError({'total': f"Valeurs possibles : {', '.join(TOTAL_MODES)}"})
+
+    page_size = get_page_size(request, default_page_size)
+    items, next_cursor = paginate_keyset(
+        queryset,
+        ordering,
+        cursor=request.query_params.get('cursor'),
+        page_size=page_size
+    )
+
+    total_count, is_approximate = None, False
+    if total_mode == 'exact':
+        total_count = queryset.count()
+    elif total_mode == 'approx':
+        total_count, is_approximate = approximate_count(queryset)
+
+    return items, {
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        'total': total_count,
+        'total_is_approximate': is_approximate,
+    }
@@ -0,0 +1,159 @@
+# 📁 courati_backend/config/query_profiler.py
+"""
+Profilage SQL par requête HTTP.
+
+QueryProfilingMiddleware mesure pour chaque vue :
+- le nombre de requêtes SQL et le temps total passé en base
+- les requêtes dupliquées (même empreinte SQL, paramètres ignorés)
+- le temps de réponse total
+
+En DEBUG, les mesures sont renvoyées dans les en-têtes X-Query-*.
+En production, elles sont journalisées (logger 'config.query_profiler').
+
+Le décorateur @query_budget(n) fixe un nombre maximum de requêtes par vue :
+dépassement journalisé, ou exception si QUERY_BUDGET_STRICT (tests).
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Nombre de requêtes SQL supérieur au budget de la vue"""
+
+
+def query_budget(max_queries):
+    """
+    Fixer le budget de requêtes SQL d'une vue (fonction, APIView ou ViewSet).
+
+        @query_budget(10)
+        class TeacherSubjectsView(APIView):
+            ...
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """Normaliser une requête SQL : valeurs littérales et listes IN remplacées par %s"""
+    sql = _STRING_RE.sub('%s', sql)
+    sql = _NUMBER_RE.sub('%s', sql)
+    sql = _IN_LIST_RE.sub('(%s)', sql)
+    return ' '.join(sql.split())
+
+
+def _view_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is not None:
+        return budget
+
+    # Vues classe : as_view() expose la classe via view_class (Django) / cls (DRF)
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'query_budget', None)
+
+
+def _view_name(request, view_func):
+    match = getattr(request, 'resolver_match', None)
+    if match and match.view_name:
+        return match.view_name
+    return getattr(view_func, '__qualname__', repr(view_func))
+
+
+class _QueryRecorder:
+    """execute_wrapper : chronomètre et empreinte de chaque requête"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+class QueryProfilingMiddleware:
+    """Mesurer requêtes SQL, temps base et temps total de chaque vue"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_PROFILER_ENABLED', True):
+            return self.get_response(request)
+
+        request._query_profile_view = None
+        recorder = _QueryRecorder()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        wall_time = time.perf_counter() - start
+        view_func = request._query_profile_view
+        if view_func is None:
+            return response
+
+        view_name = _view_name(request, view_func)
+        duplicates = recorder.duplicates()
+        budget = _view_budget(view_func)
+
+        record = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_time_ms': round(recorder.duration * 1000, 2),
+            'wall_time_ms': round(wall_time * 1000, 2),
+            'duplicated_queries': sum(duplicates.values()) - len(duplicates),
+            'budget': budget,
+        }
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = str(record['db_time_ms'])
+            response['X-Query-Duplicates'] = str(record['duplicated_queries'])
+            response['X-Response-Time-Ms'] = str(record['wall_time_ms'])
+        else:
+            logger.info(json.dumps(record))
+
+        if budget is not None and recorder.count > budget:
+            worst = sorted(duplicates.items(), key=lambda item: item[1], reverse=True)[:3]
+            message = (
+                f"⚠️ Budget SQL dépassé pour {view_name}: "
+                f"{recorder.count} requêtes (budget {budget})"
+            )
+            for sql, count in worst:
+                message += f"\n   x{count} {sql[:200]}"
+
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_profile_view = view_func
+        return None
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -68,6 +69,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
+    'config.query_profiler.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -78,6 +80,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Profilage SQL par vue (voir config/query_profiler.py)
+# En-têtes X-Query-* en DEBUG, logs structurés sinon
+QUERY_PROFILER_ENABLED = True
+# Dépassement de @query_budget : exception pendant les tests, simple log sinon
+QUERY_BUDGET_STRICT = 'test' in sys.argv
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'config.query_profiler': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -228,6 +253,12 @@ EMAIL_TIMEOUT = 10
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Exports administrateur en arrière-plan : hors de MEDIA_ROOT (données
+# personnelles), téléchargés uniquement via la vue admin, supprimés après
+# EXPORT_RETENTION_HOURS
+EXPORTS_ROOT = BASE_DIR / 'private_exports'
+EXPORT_RETENTION_HOURS = 24
+
 # Configuration des fichiers statiques
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -251,6 +282,17 @@ if not firebase_admin._apps:
 
 print("✅ Firebase Admin SDK initialisé")
 
+# ========================================
+# CACHE (REDIS)
+# ========================================
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+
 # ========================================
 # CONFIGURATION CELERY
 # ========================================
@@ -276,6 +318,24 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes max par tâche
 # Ignorer les résultats par défaut (économise de la mémoire)
 CELERY_TASK_IGNORE_RESULT = False
 
+# Nombre de destinataires traités par sous-tâche de notification
+NOTIFICATION_CHUNK_SIZE = 500
+
+# Ingestion des activités (consultations, téléchargements, favoris)
+# 'redis' : file Redis vidée par Celery / 'sync' : écriture immédiate pendant les tests
+ACTIVITY_INGEST_MODE = 'sync' if 'test' in sys.argv else 'redis'
+ACTIVITY_INGEST_REDIS_URL = 'redis://localhost:6379/1'
+ACTIVITY_INGEST_FLUSH_SIZE = 500
+ACTIVITY_INGEST_FLUSH_INTERVAL = 5.0  # secondes entre deux vidages (Celery beat)
+
+# Compteurs de consultations / téléchargements en attente de report (hash + set Redis)
+DOCUMENT_COUNTERS_REDIS_URL = 'redis://localhost:6379/1'
+
+# Rétention de l'historique d'activité (partitions mensuelles PostgreSQL)
+# 'archive' : partition détachée vers le schéma archive / 'drop' : supprimée
+USER_ACTIVITY_RETENTION_MONTHS = 12
+USER_ACTIVITY_RETENTION_MODE = 'archive'
+
 # Logging
 CELERY_WORKER_LOG_FORMAT = '[%(asctime)s: %(levelname)s/%(processName)s] %(message)s'
 CELERY_WORKER_TASK_LOG_FORMAT = '[%(asctime)s: %(levelname)s/%(processName)s][%(task_name)s(%(task_id)s)] %(message)s'
\ No newline at end of file
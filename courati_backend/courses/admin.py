@@ -4,15 +4,15 @@ from django.utils.html import format_html
 from django.urls import reverse, path
 from django.utils.safestring import mark_safe
 from django.db.models import Count, Q, Avg
-from django.http import HttpResponse
 from django.utils.safestring import mark_safe
-import csv
 
 from .models import (
     Subject, Document, UserFavorite, UserProgress, UserActivity,
     Quiz, Question, Choice, QuizAttempt, StudentAnswer, StudentProject, ProjectTask,
 )
 from accounts.permissions import get_teacher_subjects
+from .services import curriculum
+from .services.exports import stream_export
 
 
 # ==================== INLINES ====================
@@ -537,43 +537,25 @@ class QuizAdmin(admin.ModelAdmin):
     duplicate_quiz.short_description = "Dupliquer les quiz sélectionnés"
     
     def activate_quizzes(self, request, queryset):
+        subject_ids = set(queryset.values_list('subject_id', flat=True))
         updated = queryset.update(is_active=True)
+        # update() ne déclenche pas post_save : invalider le programme des cohortes
+        curriculum.bump_subject_cohorts(subject_ids)
         self.message_user(request, f"{updated} quiz activé(s)")
     activate_quizzes.short_description = "Activer les quiz sélectionnés"
     
     def deactivate_quizzes(self, request, queryset):
+        subject_ids = set(queryset.values_list('subject_id', flat=True))
         updated = queryset.update(is_active=False)
+        curriculum.bump_subject_cohorts(subject_ids)
         self.message_user(request, f"{updated} quiz désactivé(s)")
     deactivate_quizzes.short_description = "Désactiver les quiz sélectionnés"
     
     def export_statistics(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="quiz_statistics.csv"'
-        response.write('\ufeff'.encode('utf8'))
-        
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow([
-            'Quiz', 'Matière', 'Total tentatives', 'Complétées',
-            'Note moyenne', 'Taux de réussite (%)'
-        ])
-        
-        for quiz in queryset:
-            attempts = QuizAttempt.objects.filter(quiz=quiz)
-            completed = attempts.filter(status='COMPLETED')
-            avg_score = completed.aggregate(avg=Avg('score'))['avg'] or 0
-            passed = completed.filter(score__gte=quiz.passing_percentage).count()
-            pass_rate = (passed / completed.count() * 100) if completed.count() > 0 else 0
-            
-            writer.writerow([
-                quiz.title,
-                quiz.subject.name,
-                attempts.count(),
-                completed.count(),
-                f"{avg_score:.2f}",
-                f"{pass_rate:.1f}"
-            ])
-        
-        return response
+        # Une seule requête agrégée pour tous les quiz sélectionnés, écrite en flux
+        return stream_export('quiz_statistics', {
+            'quiz_ids': list(queryset.values_list('id', flat=True))
+        })
     export_statistics.short_description = "Exporter les statistiques (CSV)"
     
     def get_urls(self):
@@ -0,0 +1,143 @@
+# courses/analytics.py
+"""
+Agrégats de performance des quiz calculés en SQL.
+
+Toutes les fonctions travaillent sur un queryset de QuizAttempt et renvoient
+pour chaque périmètre (global, matière, quiz, étudiant) :
+- total_attempts / completed_attempts / passed_attempts
+- average_score : moyenne des scores normalisés sur 20
+- pass_rate : % de tentatives terminées avec score*100/total_points >= passing_percentage
+"""
+from django.db.models import Avg, Case, Count, F, FloatField, Q, When
+from django.db.models.functions import Cast
+
+from .models import QuizAttempt
+
+
+def annotate_score_ratios(attempts):
+    """
+    Annoter chaque tentative avec :
+    - quiz_total_points : total des points du quiz
+    - score_percentage : score en % (NULL si le quiz n'a pas de points)
+    - score_normalized : score sur 20 (NULL si le quiz n'a pas de points)
+    """
+    attempts = attempts.annotate(quiz_total_points=F('quiz__total_points'))
+
+    valid = Q(status='COMPLETED', score__isnull=False, quiz_total_points__gt=0)
+    ratio = Cast('score', FloatField()) / Cast('quiz_total_points', FloatField())
+
+    return attempts.annotate(
+        score_percentage=Case(When(valid, then=ratio * 100), default=None, output_field=FloatField()),
+        score_normalized=Case(When(valid, then=ratio * 20), default=None, output_field=FloatField()),
+    )
+
+
+def _performance_aggregates():
+    return {
+        'total_attempts': Count('id'),
+        'completed_attempts': Count('id', filter=Q(status='COMPLETED')),
+        'passed_attempts': Count(
+            'id',
+            filter=Q(score_percentage__gte=F('quiz__passing_percentage'))
+        ),
+        'average_normalized': Avg('score_normalized'),
+    }
+
+
+def _format(row):
+    completed = row['completed_attempts'] or 0
+    passed = row['passed_attempts'] or 0
+    average = row['average_normalized']
+
+    return {
+        'total_attempts': row['total_attempts'] or 0,
+        'completed_attempts': completed,
+        'passed_attempts': passed,
+        'average_score': round(float(average), 2) if average is not None else 0,
+        'pass_rate': round((passed / completed) * 100, 1) if completed > 0 else 0,
+    }
+
+
+def quiz_performance(attempts=None):
+    """
+    Performance agrégée d'un ensemble de tentatives (une seule requête).
+
+    Args:
+        attempts: queryset de QuizAttempt (défaut: toutes les tentatives)
+
+    Returns:
+        dict: total_attempts, completed_attempts, passed_attempts,
+              average_score (/20), pass_rate (%)
+    """
+    if attempts is None:
+        attempts = QuizAttempt.objects.all()
+
+    row = annotate_score_ratios(attempts).aggregate(**_performance_aggregates())
+    return _format(row)
+
+
+def quiz_performance_by(attempts, field, extra_fields=()):
+    """
+    Performance groupée par `field` (ex: 'quiz__subject_id', 'quiz_id', 'user_id').
+    Une seule requête GROUP BY quel que soit le nombre de groupes.
+
+    Args:
+        attempts: queryset de QuizAttempt
+        field (str): champ de regroupement
+        extra_fields (tuple): champs supplémentaires à renvoyer (ex: 'quiz__title')
+
+    Returns:
+        dict: {valeur de field: dict de performance (+ extra_fields)}
+    """
+    rows = annotate_score_ratios(attempts).values(
+        field, *extra_fields
+    ).annotate(
+        **_performance_aggregates()
+    ).order_by()
+
+    performance = {}
+    for row in rows:
+        stats = _format(row)
+        for extra in extra_fields:
+            stats[extra] = row[extra]
+        performance[row[field]] = stats
+    return performance
+
+
+# ========================================
+# PÉRIMÈTRES COURANTS
+# ========================================
+
+def global_quiz_performance():
+    """Performance de toutes les tentatives de la plateforme"""
+    return quiz_performance(QuizAttempt.objects.all())
+
+
+def subject_quiz_performance(subject_ids):
+    """Performance par matière : {subject_id: stats}"""
+    return quiz_performance_by(
+        QuizAttempt.objects.filter(quiz__subject_id__in=subject_ids),
+        'quiz__subject_id'
+    )
+
+
+def quiz_performance_by_quiz(quiz_ids, extra_fields=()):
+    """Performance par quiz : {quiz_id: stats}"""
+    return quiz_performance_by(
+        QuizAttempt.objects.filter(quiz_id__in=quiz_ids),
+        'quiz_id',
+        extra_fields
+    )
+
+
+def student_quiz_performance(user):
+    """Performance globale d'un étudiant"""
+    return quiz_performance(QuizAttempt.objects.filter(user=user))
+
+
+def student_quiz_performance_by_subject(user, subject_ids=None):
+    """Performance d'un étudiant par matière : {subject_id: stats}"""
+    attempts = QuizAttempt.objects.filter(user=user)
+    if subject_ids is not None:
+        attempts = attempts.filter(quiz__subject_id__in=subject_ids)
+    return quiz_performance_by(attempts, 'quiz__subject_id')
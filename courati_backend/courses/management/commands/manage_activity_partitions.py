@@ -0,0 +1,67 @@
+# courses/management/commands/manage_activity_partitions.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.services.activity_partitions import (
+    apply_retention, ensure_partitions, is_partitioned, list_partitions
+)
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions mensuelles de UserActivity et applique la rétention (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Nombre de mois futurs à partitionner (défaut: 3)'
+        )
+        parser.add_argument(
+            '--retention',
+            action='store_true',
+            help='Appliquer la politique de rétention après création des partitions'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help='Rétention en mois (défaut: USER_ACTIVITY_RETENTION_MONTHS)'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['archive', 'drop'],
+            help='archive: détacher vers le schéma archive, drop: supprimer (défaut: USER_ACTIVITY_RETENTION_MODE)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Lister les partitions concernées par la rétention sans rien modifier'
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError(
+                "La table courses_useractivity n'est pas partitionnée "
+                "(PostgreSQL requis, migration courses 0014)"
+            )
+
+        if not options['dry_run']:
+            created = ensure_partitions(months_ahead=options['months_ahead'])
+            for name in created:
+                self.stdout.write(f'🧱 {name} créée')
+
+        if options['retention'] or options['dry_run']:
+            retired = apply_retention(
+                retention_months=options['retention_months'],
+                mode=options['mode'],
+                dry_run=options['dry_run']
+            )
+            verb = 'à retirer' if options['dry_run'] else 'retirée'
+            for name in retired:
+                self.stdout.write(f'🗄️ {name} {verb}')
+
+        partitions = list_partitions()
+        if partitions:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {len(partitions)} partition(s) de {partitions[0][0]:%Y-%m} à {partitions[-1][0]:%Y-%m}'
+            ))
@@ -0,0 +1,30 @@
+# courses/management/commands/rebuild_activity_rollup.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.services.activity_rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table DailyActivityRollup à partir de l'historique"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Nombre de jours à recalculer (défaut: 30)'
+        )
+
+    def handle(self, *args, **options):
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=options['days'] - 1)
+
+        rows = rebuild_rollup(start_date, end_date)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rollup recalculé du {start_date} au {end_date}: {rows} lignes'
+        ))
@@ -0,0 +1,45 @@
+# courses/management/commands/sync_quiz_totals.py
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from courses.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recalcule et vérifie les champs dénormalisés total_points et question_count des quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Vérifier uniquement, sans corriger (code de sortie 1 si incohérences)'
+        )
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.annotate(
+            actual_total=Sum('questions__points'),
+            actual_count=Count('questions')
+        ).order_by('id')
+
+        mismatched = []
+        for quiz in quizzes:
+            actual_total = quiz.actual_total or 0
+            if quiz.total_points != actual_total or quiz.question_count != quiz.actual_count:
+                mismatched.append(quiz.id)
+                self.stdout.write(
+                    f"✗ Quiz #{quiz.id} '{quiz.title}': "
+                    f"total_points {quiz.total_points} → {actual_total}, "
+                    f"question_count {quiz.question_count} → {quiz.actual_count}"
+                )
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS(f'✅ {quizzes.count()} quiz cohérents'))
+            return
+
+        if options['check']:
+            self.stdout.write(self.style.ERROR(f'❌ {len(mismatched)} quiz incohérents'))
+            raise SystemExit(1)
+
+        Quiz.refresh_question_stats(mismatched)
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(mismatched)} quiz corrigés'))
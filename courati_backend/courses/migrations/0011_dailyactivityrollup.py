@@ -0,0 +1,121 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BACKFILL_DAYS = 30
+
+
+def backfill_rollup(apps, schema_editor):
+    """
+    Agrégats des 30 derniers jours, pour que le tableau de bord ne démarre pas vide.
+    Même calcul que rebuild_rollup, avec les modèles historiques uniquement
+    (une requête groupée par source, bornes sur les colonnes datetime).
+    """
+    from datetime import datetime, time, timedelta
+
+    from django.db.models import Count, Q
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+
+    DailyActivityRollup = apps.get_model('courses', 'DailyActivityRollup')
+    UserActivity = apps.get_model('courses', 'UserActivity')
+    QuizAttempt = apps.get_model('courses', 'QuizAttempt')
+    Document = apps.get_model('courses', 'Document')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    today = timezone.localdate()
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=BACKFILL_DAYS - 1), time.min))
+    until = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+
+    rows = {}
+
+    def add(date, subject_id, action, count, student_count):
+        current = rows.setdefault((date, subject_id, action), [0, 0])
+        current[0] += count
+        current[1] += student_count
+
+    # Consultations, téléchargements, favoris
+    for row in UserActivity.objects.filter(
+        created_at__gte=since, created_at__lt=until
+    ).annotate(day=TruncDate('created_at')).values('day', 'subject_id', 'action').annotate(
+        total=Count('id'),
+        students=Count('id', filter=Q(user__role='STUDENT'))
+    ).order_by():
+        add(row['day'], row['subject_id'], row['action'], row['total'], row['students'])
+
+    # Tentatives de quiz
+    for row in QuizAttempt.objects.filter(
+        started_at__gte=since, started_at__lt=until
+    ).annotate(day=TruncDate('started_at')).values('day', 'quiz__subject_id').annotate(
+        total=Count('id'),
+        students=Count('id', filter=Q(user__role='STUDENT'))
+    ).order_by():
+        add(row['day'], row['quiz__subject_id'], 'quiz_attempt', row['total'], row['students'])
+
+    # Nouveaux documents
+    for row in Document.objects.filter(
+        created_at__gte=since, created_at__lt=until
+    ).annotate(day=TruncDate('created_at')).values('day', 'subject_id').annotate(
+        total=Count('id')
+    ).order_by():
+        add(row['day'], row['subject_id'], 'new_document', row['total'], 0)
+
+    # Nouveaux étudiants (action globale, sans matière)
+    for row in User.objects.filter(
+        role='STUDENT', date_joined__gte=since, date_joined__lt=until
+    ).annotate(day=TruncDate('date_joined')).values('day').annotate(
+        total=Count('id')
+    ).order_by():
+        add(row['day'], None, 'new_student', row['total'], row['total'])
+
+    DailyActivityRollup.objects.bulk_create([
+        DailyActivityRollup(
+            date=date,
+            subject_id=subject_id,
+            action=action,
+            count=count,
+            student_count=student_count
+        )
+        for (date, subject_id, action), (count, student_count) in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0010_quiz_passing_percentage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('action', models.CharField(choices=[('view', 'Consultation'), ('download', 'Téléchargement'), ('favorite', 'Favori ajouté'), ('unfavorite', 'Favori retiré'), ('quiz_attempt', 'Tentative de quiz'), ('new_document', 'Nouveau document'), ('new_student', 'Nouvel étudiant')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='courses.subject')),
+            ],
+            options={
+                'verbose_name': 'Activité journalière agrégée',
+                'verbose_name_plural': 'Activités journalières agrégées',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'action'], name='courses_dai_date_84f7a4_idx'), models.Index(fields=['subject', 'date'], name='courses_dai_subject_805aea_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivityrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', False)), fields=('date', 'subject', 'action'), name='unique_rollup_date_subject_action'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivityrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('date', 'action'), name='unique_rollup_date_action_global'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:36
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_quiz_totals(apps, schema_editor):
+    Quiz = apps.get_model('courses', 'Quiz')
+    quizzes = Quiz.objects.annotate(
+        actual_total=Sum('questions__points'),
+        actual_count=Count('questions')
+    )
+    for quiz in quizzes.iterator():
+        Quiz.objects.filter(pk=quiz.pk).update(
+            total_points=quiz.actual_total or 0,
+            question_count=quiz.actual_count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_dailyactivityrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='nombre de questions'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_points',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=7, verbose_name='total des points'),
+        ),
+        migrations.RunPython(backfill_quiz_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,121 @@
+# Conversion de courses_useractivity en table partitionnée par mois (PostgreSQL)
+
+from datetime import date
+
+from django.db import migrations
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_useractivity(apps, schema_editor):
+    """
+    Recréer courses_useractivity en table partitionnée par RANGE (created_at) :
+    clé primaire (id, created_at), une partition par mois couvrant les données
+    existantes + 3 mois à venir, et une partition DEFAULT.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    UserActivity = apps.get_model('courses', 'UserActivity')
+    table = UserActivity._meta.db_table
+    legacy = f'{table}_legacy'
+    qn = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(created_at) FROM {qn(table)}")
+        oldest = cursor.fetchone()[0]
+
+        # Clés étrangères et index existants (noms générés par Django), recréés
+        # à l'identique sur la table partitionnée. La clé primaire est exclue.
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+            [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT i.indisprimary ORDER BY c.relname",
+            [table]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        # Table créée avant Django 4.1 : id en serial, séquence possédée par la colonne
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+            [table]
+        )
+        is_identity = bool(cursor.fetchone()[0])
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+
+    today = date.today()
+    first_month = (oldest.date() if oldest else today).replace(day=1)
+    last_month = _add_months(today.replace(day=1), 3)
+
+    schema_editor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+    schema_editor.execute(
+        f"CREATE TABLE {qn(table)} "
+        f"(LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    if not is_identity and sequence:
+        # Sinon DROP TABLE legacy supprimerait la séquence utilisée par le DEFAULT
+        schema_editor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id")
+    schema_editor.execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+
+    month = first_month
+    while month <= last_month:
+        name = f'{table}_p{month.year}_{month.month:02d}'
+        schema_editor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+    columns = ', '.join(qn(field.column) for field in UserActivity._meta.local_concrete_fields)
+    overriding = 'OVERRIDING SYSTEM VALUE ' if is_identity else ''
+    schema_editor.execute(
+        f"INSERT INTO {qn(table)} ({columns}) {overriding}"
+        f"SELECT {columns} FROM {qn(legacy)}"
+    )
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {qn(table)}), 0) + 1, false)"
+    )
+    schema_editor.execute(f"DROP TABLE {qn(legacy)}")
+    if is_identity:
+        # La séquence IDENTITY de la nouvelle table a reçu un suffixe (…_id_seq1)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            new_sequence = cursor.fetchone()[0]
+        if new_sequence != sequence:
+            schema_editor.execute(
+                f"ALTER SEQUENCE {new_sequence} RENAME TO {qn(sequence.rsplit('.', 1)[-1])}"
+            )
+
+    # La clé de partition doit faire partie de la clé primaire
+    schema_editor.execute(
+        f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} PRIMARY KEY (id, created_at)"
+    )
+
+    # Définitions lues avant le renommage : elles visent déjà la nouvelle table
+    for definition in index_definitions:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_useractivity_created_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_useractivity, migrations.RunPython.noop),
+    ]
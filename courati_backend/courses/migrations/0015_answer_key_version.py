@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_partition_useractivity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='version du barème'),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Version du barème utilisée pour la correction', null=True, verbose_name='version du barème'),
+        ),
+    ]
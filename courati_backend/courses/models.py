@@ -5,6 +5,8 @@ from django.core.validators import FileExtensionValidator, MaxValueValidator,Min
 from accounts.models import Level, Major
 from django.utils.translation import gettext_lazy as _ 
 from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -280,7 +282,8 @@ class UserActivity(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='activities')
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='activities')
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default (et non auto_now_add) : conserve l'horodatage des événements ingérés par lots
+    created_at = models.DateTimeField(default=timezone.now)
     
     # Données supplémentaires optionnelles
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -299,6 +302,64 @@ class UserActivity(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_action_display()} - {self.document.title}"
 
+
+class DailyActivityRollup(models.Model):
+    """
+    Compteurs d'activité pré-agrégés par jour, matière et action.
+    Alimenté en temps réel par les signals (courses/signals.py) et
+    recalculé par la tâche Celery rebuild_daily_activity_rollup.
+    """
+
+    ACTION_CHOICES = [
+        ('view', 'Consultation'),
+        ('download', 'Téléchargement'),
+        ('favorite', 'Favori ajouté'),
+        ('unfavorite', 'Favori retiré'),
+        ('quiz_attempt', 'Tentative de quiz'),
+        ('new_document', 'Nouveau document'),
+        ('new_student', 'Nouvel étudiant'),
+    ]
+
+    date = models.DateField(_('date'))
+    # Null pour les actions globales (ex: nouvel étudiant)
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='activity_rollups'
+    )
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    # Part du compteur générée par des utilisateurs STUDENT
+    student_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Activité journalière agrégée"
+        verbose_name_plural = "Activités journalières agrégées"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'subject', 'action'],
+                condition=models.Q(subject__isnull=False),
+                name='unique_rollup_date_subject_action'
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'action'],
+                condition=models.Q(subject__isnull=True),
+                name='unique_rollup_date_action_global'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'action']),
+            models.Index(fields=['subject', 'date']),
+        ]
+
+    def __str__(self):
+        subject_code = self.subject.code if self.subject_id else 'GLOBAL'
+        return f"{self.date} - {subject_code} - {self.action}: {self.count}"
+
 # courses/models.py (à la fin du fichier existant)
 
 class Quiz(models.Model):
@@ -357,25 +418,83 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Champs dénormalisés, maintenus par les signals sur Question
+    # (voir courses/signals.py et la commande sync_quiz_totals)
+    total_points = models.DecimalField(
+        _('total des points'),
+        max_digits=7,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+    question_count = models.PositiveIntegerField(
+        _('nombre de questions'),
+        default=0,
+        editable=False
+    )
+    
+    # Version du barème (questions, choix, points) : incrémentée à chaque
+    # modification, clé du snapshot en cache (voir services/answer_keys.py)
+    answer_key_version = models.PositiveIntegerField(
+        _('version du barème'),
+        default=1,
+        editable=False
+    )
+    
     class Meta:
         verbose_name = _('quiz')
         verbose_name_plural = _('quiz')
         ordering = ['-created_at']
     
+    # Maintenus par des UPDATE ciblés (signals sur Question/Choice, services/answer_keys.py)
+    MANAGED_FIELDS = ('total_points', 'question_count', 'answer_key_version')
+    
     def __str__(self):
         return f"{self.subject.code} - {self.title}"
     
-    @property
-    def total_points(self):
-        """Calcule le total des points du quiz"""
-        return self.questions.aggregate(
-            total=models.Sum('points')
-        )['total'] or 0
+    def save(self, *args, **kwargs):
+        """
+        Un save() complet d'un quiz existant n'écrit pas MANAGED_FIELDS :
+        une instance chargée avant une modification du barème ne doit pas
+        réécrire l'ancienne version (et réactiver l'ancien snapshot en cache)
+        """
+        if self.pk is not None and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MANAGED_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
-    @property
-    def question_count(self):
-        """Nombre de questions dans le quiz"""
-        return self.questions.count()
+    @classmethod
+    def refresh_question_stats(cls, quiz_ids):
+        """
+        Recalculer total_points et question_count en une seule requête UPDATE
+        (sans déclencher save() ni les signals post_save du quiz)
+        """
+        questions = Question.objects.filter(quiz=models.OuterRef('pk')).values('quiz')
+        
+        return cls.objects.filter(pk__in=quiz_ids).update(
+            total_points=Coalesce(
+                models.Subquery(
+                    questions.annotate(total=Sum('points')).values('total'),
+                    output_field=models.DecimalField(max_digits=7, decimal_places=2)
+                ),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=7, decimal_places=2)
+            ),
+            question_count=Coalesce(
+                models.Subquery(
+                    questions.annotate(count=models.Count('id')).values('count'),
+                    output_field=models.IntegerField()
+                ),
+                models.Value(0)
+            )
+        )
+    
+    def update_question_stats(self):
+        """Recalculer les champs dénormalisés de ce quiz et recharger l'instance"""
+        Quiz.refresh_question_stats([self.pk])
+        self.refresh_from_db(fields=['total_points', 'question_count'])
     
     @property
     def passing_score(self):
@@ -491,6 +610,13 @@ class QuizAttempt(models.Model):
     attempt_number = models.PositiveIntegerField(_('numéro de tentative'))
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    answer_key_version = models.PositiveIntegerField(
+        _('version du barème'),
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Version du barème utilisée pour la correction"
+    )
     
     class Meta:
         verbose_name = _('tentative de quiz')
@@ -2,10 +2,12 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.db.models import Avg, Count, Q, Max, Sum, F
-from django.db import models  # Ajoutez cette ligne
+from django.db import models, transaction
 from accounts.serializers import LevelSimpleSerializer, MajorSimpleSerializer,LevelSerializer, MajorSerializer
 from accounts.models import Level, Major
 from .models import Subject, Document, UserActivity, UserFavorite, UserProgress,Quiz, Question, Choice, QuizAttempt, StudentAnswer, StudentProject, ProjectTask
+from .services import answer_keys
+from .services.document_counters import apply_buffered_counts
 
 
 
@@ -46,6 +48,11 @@ class SubjectSimpleSerializer(serializers.ModelSerializer):
     
     def get_assigned_teachers(self, obj):
         """Retourne la liste des professeurs assignés à cette matière"""
+        # Listes préchargées par la vue (programme de la cohorte en cache)
+        assigned_teachers = self.context.get('assigned_teachers')
+        if assigned_teachers is not None and obj.id in assigned_teachers:
+            return assigned_teachers[obj.id]
+        
         from accounts.models import TeacherAssignment
         
         assignments = TeacherAssignment.objects.filter(
@@ -195,7 +202,27 @@ class SubjectDetailSerializer(serializers.ModelSerializer):
         return None
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+# ========================================
+# COMPTEURS EN ÉCRITURE DIFFÉRÉE
+# ========================================
+
+class BufferedCountsMixin:
+    """view_count / download_count : ajouter les incréments en attente (services/document_counters.py)"""
+
+    def to_representation(self, instance):
+        apply_buffered_counts([instance])
+        return super().to_representation(instance)
+
+
+class BufferedCountsListSerializer(serializers.ListSerializer):
+    """Liste de documents : incréments en attente lus en une seule fois"""
+
+    def to_representation(self, data):
+        documents = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(apply_buffered_counts(documents))
+
+
+class DocumentSerializer(BufferedCountsMixin, serializers.ModelSerializer):
     """Serializer pour les documents - avec info créateur"""
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     subject_code = serializers.CharField(source='subject.code', read_only=True)
@@ -233,6 +260,7 @@ class DocumentSerializer(serializers.ModelSerializer):
             'order', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_by', 'download_count', 'view_count', 'created_at', 'updated_at']
+        list_serializer_class = BufferedCountsListSerializer
     
     def get_file_url(self, obj):
         if obj.file:
@@ -427,7 +455,7 @@ class UserActivitySerializer(serializers.ModelSerializer):
         }
 
 
-class ConsultationDocumentSerializer(serializers.ModelSerializer):
+class ConsultationDocumentSerializer(BufferedCountsMixin, serializers.ModelSerializer):
     document_type_display = serializers.CharField(source='get_document_type_display', read_only=True)
     is_favorite = serializers.SerializerMethodField()
     
@@ -437,6 +465,7 @@ class ConsultationDocumentSerializer(serializers.ModelSerializer):
             'id', 'title', 'document_type', 'document_type_display', 
             'file_size_mb', 'is_favorite', 'view_count', 'download_count'
         ]
+        list_serializer_class = BufferedCountsListSerializer
     
     def get_is_favorite(self, obj):
         request = self.context.get('request')
@@ -452,6 +481,15 @@ class ConsultationSubjectSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'code']
 
 
+class ConsultationListSerializer(serializers.ListSerializer):
+    """Historique : incréments en attente des documents lus en une seule fois"""
+
+    def to_representation(self, data):
+        activities = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        apply_buffered_counts(activity.document for activity in activities)
+        return super().to_representation(activities)
+
+
 class ConsultationActivitySerializer(serializers.ModelSerializer):
     document = ConsultationDocumentSerializer(read_only=True)
     subject = ConsultationSubjectSerializer(read_only=True)
@@ -464,6 +502,7 @@ class ConsultationActivitySerializer(serializers.ModelSerializer):
             'id', 'document', 'subject', 'action', 'action_display', 
             'consulted_at', 'ip_address'
         ]
+        list_serializer_class = ConsultationListSerializer
     
     def get_action_display(self, obj):
         action_mapping = {
@@ -569,6 +608,10 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'text', 'question_type', 'points', 'order', 'choices']
 
 
+# Représentation des points identique à QuestionWithAnswerSerializer
+_POINTS_FIELD = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
 class QuestionWithAnswerSerializer(serializers.ModelSerializer):
     """Serializer avec les bonnes réponses (pour correction)"""
     choices = ChoiceWithAnswerSerializer(many=True, read_only=True)
@@ -580,12 +623,50 @@ class QuestionWithAnswerSerializer(serializers.ModelSerializer):
 
 # courses/serializers.py
 
+def get_user_quiz_stats(user, quiz_ids):
+    """
+    Agrégats des tentatives d'un utilisateur pour plusieurs quiz (une seule requête)
+    
+    Returns:
+        dict: {quiz_id: {'attempts_count', 'best_score', 'last_attempt_date'}}
+    """
+    rows = QuizAttempt.objects.filter(
+        user=user,
+        quiz_id__in=quiz_ids
+    ).values('quiz_id').annotate(
+        attempts_count=Count('id'),
+        best_score=Max('score', filter=Q(status='COMPLETED')),
+        last_attempt_date=Max('started_at')
+    ).order_by()
+    
+    return {row['quiz_id']: row for row in rows}
+
+
+class QuizListListSerializer(serializers.ListSerializer):
+    """
+    Précharge les tentatives de l'utilisateur pour tous les quiz de la liste
+    et les place dans le contexte ('user_quiz_stats') avant la sérialisation
+    """
+    
+    def to_representation(self, data):
+        quizzes = list(data.all() if isinstance(data, models.Manager) else data)
+        
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            self.context['user_quiz_stats'] = get_user_quiz_stats(
+                request.user,
+                [quiz.id for quiz in quizzes]
+            )
+        
+        return super().to_representation(quizzes)
+
+
 class QuizListSerializer(serializers.ModelSerializer):
     """Serializer pour la liste des quiz (vue d'ensemble)"""
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     subject_code = serializers.CharField(source='subject.code', read_only=True)
     question_count = serializers.IntegerField(read_only=True)
-    total_points = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    total_points = serializers.DecimalField(max_digits=7, decimal_places=2, read_only=True)
     
     # Champs calculés à partir du pourcentage
     passing_percentage_normalized = serializers.SerializerMethodField()
@@ -603,6 +684,7 @@ class QuizListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Quiz
+        list_serializer_class = QuizListListSerializer
         fields = [
             'id', 'title', 'description', 'subject_name', 'subject_code',
             'duration_minutes', 'passing_percentage', 'passing_percentage_normalized',
@@ -613,6 +695,25 @@ class QuizListSerializer(serializers.ModelSerializer):
             'is_available', 'can_attempt'
         ]
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._single_quiz_stats = {}
+    
+    def _get_user_stats(self, obj):
+        """
+        Agrégats de l'utilisateur pour ce quiz : lus depuis le contexte
+        (préchargés par QuizListListSerializer), sinon calculés pour ce seul quiz
+        """
+        stats = self.context.get('user_quiz_stats')
+        if stats is None:
+            # Sérialisation d'un seul quiz : une requête, mémorisée sur le serializer
+            if obj.id not in self._single_quiz_stats:
+                self._single_quiz_stats[obj.id] = get_user_quiz_stats(
+                    self.context.get('request').user, [obj.id]
+                ).get(obj.id, {})
+            return self._single_quiz_stats[obj.id]
+        return stats.get(obj.id, {})
+    
     def get_passing_percentage_normalized(self, obj):
         """Score de passage normalisé sur 20"""
         # Calculer manuellement au lieu d'utiliser la property
@@ -624,18 +725,8 @@ class QuizListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return None
         
-        # ✅ SIMPLIFIÉ : Pas de vérification de filière (déjà filtré dans la vue)
-        attempts = QuizAttempt.objects.filter(
-            user=user, 
-            quiz=obj, 
-            status='COMPLETED'
-        )
-        
-        if not attempts.exists():
-            return None
-        
-        # Récupérer le meilleur score brut
-        best = attempts.aggregate(best=Max('score'))['best']
+        # Meilleur score brut parmi les tentatives terminées
+        best = self._get_user_stats(obj).get('best_score')
         
         if best is None:
             return None
@@ -654,8 +745,7 @@ class QuizListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
         
-        # ✅ SIMPLIFIÉ
-        return QuizAttempt.objects.filter(user=user, quiz=obj).count()
+        return self._get_user_stats(obj).get('attempts_count', 0)
     
     def get_user_last_attempt(self, obj):
         """Date de la dernière tentative"""
@@ -663,15 +753,7 @@ class QuizListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return None
         
-        # ✅ SIMPLIFIÉ
-        last = QuizAttempt.objects.filter(
-            user=user, 
-            quiz=obj
-        ).order_by('-started_at').first()
-        
-        if last:
-            return last.started_at
-        return None
+        return self._get_user_stats(obj).get('last_attempt_date')
     
     def get_best_score_percentage(self, obj):
         """Pourcentage du meilleur score"""
@@ -679,16 +761,7 @@ class QuizListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
         
-        attempts = QuizAttempt.objects.filter(
-            user=user, 
-            quiz=obj, 
-            status='COMPLETED'
-        )
-        
-        if not attempts.exists():
-            return 0
-        
-        best = attempts.aggregate(best=Max('score'))['best']
+        best = self._get_user_stats(obj).get('best_score')
         
         if best is None or not obj.total_points or obj.total_points == 0:
             return 0
@@ -725,7 +798,7 @@ class QuizDetailSerializer(serializers.ModelSerializer):
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     subject_code = serializers.CharField(source='subject.code', read_only=True)
     question_count = serializers.IntegerField(read_only=True)
-    total_points = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    total_points = serializers.DecimalField(max_digits=7, decimal_places=2, read_only=True)
     passing_percentage_normalized = serializers.SerializerMethodField()
     
     class Meta:
@@ -863,7 +936,10 @@ class QuizResultSerializer(serializers.ModelSerializer):
 
 
 class QuizCorrectionSerializer(serializers.ModelSerializer):
-    """Serializer pour afficher la correction détaillée"""
+    """
+    Serializer pour afficher la correction détaillée
+    (questions et bonnes réponses lues dans le snapshot du barème)
+    """
     questions = serializers.SerializerMethodField()
     
     class Meta:
@@ -872,16 +948,39 @@ class QuizCorrectionSerializer(serializers.ModelSerializer):
     
     def get_questions(self, obj):
         """Retourne les questions avec les réponses de l'étudiant"""
+        # Barème utilisé pour la correction de cette tentative (s'il est encore en cache)
+        answer_key = answer_keys.get_answer_key(obj.quiz, version=obj.answer_key_version)
+        student_answers = {
+            answer.question_id: answer
+            for answer in obj.answers.prefetch_related('selected_choices')
+        }
+        
         questions_data = []
         
-        for question in obj.quiz.questions.all():
-            student_answer = obj.answers.filter(question=question).first()
-            
-            question_data = QuestionWithAnswerSerializer(question).data
-            question_data['student_selected'] = []
-            question_data['is_correct'] = False
-            question_data['points_earned'] = 0
+        for question in answer_key.questions:
+            correct_ids = answer_keys.correct_choice_ids(question)
+            question_data = {
+                'id': question.id,
+                'text': question.text,
+                'question_type': question.question_type,
+                'points': _POINTS_FIELD.to_representation(question.points),
+                'order': question.order,
+                'explanation': question.explanation,
+                'choices': [
+                    {
+                        'id': choice.id,
+                        'text': choice.text,
+                        'is_correct': choice.id in correct_ids,
+                        'order': choice.order
+                    }
+                    for choice in question.choices
+                ],
+                'student_selected': [],
+                'is_correct': False,
+                'points_earned': 0
+            }
             
+            student_answer = student_answers.get(question.id)
             if student_answer:
                 question_data['student_selected'] = [
                     choice.id for choice in student_answer.selected_choices.all()
@@ -911,15 +1010,23 @@ class QuizStatisticsSerializer(serializers.ModelSerializer):
         ]
     
     def get_question_statistics(self, obj):
-        """Statistiques par question"""
+        """Statistiques par question (une requête agrégée + snapshot du barème)"""
+        answer_counts = {
+            row['question_id']: row
+            for row in StudentAnswer.objects.filter(
+                question__quiz=obj
+            ).values('question_id').annotate(
+                total=Count('id'),
+                correct=Count('id', filter=Q(is_correct=True))
+            ).order_by()
+        }
+        
         questions_stats = []
         
-        for question in obj.questions.all():
-            total_answers = StudentAnswer.objects.filter(question=question).count()
-            correct_answers = StudentAnswer.objects.filter(
-                question=question, 
-                is_correct=True
-            ).count()
+        for question in answer_keys.get_answer_key(obj).questions:
+            counts = answer_counts.get(question.id, {})
+            total_answers = counts.get('total', 0)
+            correct_answers = counts.get('correct', 0)
             
             error_rate = 0
             if total_answers > 0:
@@ -1408,11 +1515,12 @@ class SubjectStatisticsSerializer(serializers.Serializer):
 
 class ChoiceCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer pour créer/modifier un choix de réponse"""
+    # id d'un choix existant : modifié sur place (sinon nouveau choix)
+    id = serializers.IntegerField(required=False)
     
     class Meta:
         model = Choice
         fields = ['id', 'text', 'is_correct', 'order']
-        read_only_fields = ['id']
     
     def validate_text(self, value):
         """Vérifier que le texte n'est pas vide"""
@@ -1423,12 +1531,13 @@ class ChoiceCreateUpdateSerializer(serializers.ModelSerializer):
 
 class QuestionCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer pour créer/modifier une question avec ses choix"""
+    # id d'une question existante : modifiée sur place (sinon nouvelle question)
+    id = serializers.IntegerField(required=False)
     choices = ChoiceCreateUpdateSerializer(many=True)
     
     class Meta:
         model = Question
         fields = ['id', 'text', 'question_type', 'points', 'order', 'explanation', 'choices']
-        read_only_fields = ['id']
     
     def validate_text(self, value):
         """Vérifier que la question n'est pas vide"""
@@ -1489,37 +1598,150 @@ class QuestionCreateUpdateSerializer(serializers.ModelSerializer):
         return data
     
     def create(self, validated_data):
-        """Créer la question avec ses choix"""
+        """Créer la question avec ses choix (choix en bulk_create)"""
         choices_data = validated_data.pop('choices')
-        question = Question.objects.create(**validated_data)
+        validated_data.pop('id', None)
         
-        # Créer les choix
-        for choice_data in choices_data:
-            Choice.objects.create(question=question, **choice_data)
+        with transaction.atomic():
+            question = Question.objects.create(**validated_data)
+            Choice.objects.bulk_create([
+                Choice(question=question, **_model_fields(choice_data))
+                for choice_data in choices_data
+            ])
         
         return question
     
     def update(self, instance, validated_data):
-        """Mettre à jour la question et ses choix"""
+        """Mettre à jour la question et ses choix (mise à jour différentielle)"""
         choices_data = validated_data.pop('choices', None)
+        validated_data.pop('id', None)
         
-        # Mettre à jour les champs de la question
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Mettre à jour les choix si fournis
-        if choices_data is not None:
-            # Supprimer les anciens choix
-            instance.choices.all().delete()
+        with transaction.atomic():
+            changed = _apply_changes(instance, validated_data, QUESTION_FIELDS)
+            if changed:
+                instance.save()
             
-            # Créer les nouveaux choix
-            for choice_data in choices_data:
-                Choice.objects.create(question=instance, **choice_data)
+            # Mettre à jour les choix si fournis
+            if choices_data is not None:
+                sync = _QuestionSync()
+                sync.choices(instance, choices_data, {c.id: c for c in instance.choices.all()})
+                changed = sync.save() or changed
+        
+        if changed:
+            answer_keys.bump_answer_key(instance.quiz)
         
         return instance
 
 
+# ========================================
+# PERSISTANCE EN BULK DES QUESTIONS ET CHOIX
+# ========================================
+
+QUESTION_FIELDS = ('text', 'question_type', 'points', 'order', 'explanation')
+CHOICE_FIELDS = ('text', 'is_correct', 'order')
+
+
+def _model_fields(data):
+    """Données validées sans l'id ni les choix imbriqués"""
+    return {key: value for key, value in data.items() if key not in ('id', 'choices')}
+
+
+def _apply_changes(instance, data, fields):
+    """Copier les champs modifiés sur l'instance (True si au moins un a changé)"""
+    changed = False
+    for field in fields:
+        if field in data and getattr(instance, field) != data[field]:
+            setattr(instance, field, data[field])
+            changed = True
+    return changed
+
+
+def bulk_create_questions(quiz, questions_data):
+    """
+    Créer les questions puis leurs choix : deux INSERT au total
+    (les clés primaires des questions sont renvoyées par bulk_create)
+    """
+    questions = Question.objects.bulk_create([
+        Question(quiz=quiz, **_model_fields(question_data))
+        for question_data in questions_data
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, **_model_fields(choice_data))
+        for question, question_data in zip(questions, questions_data)
+        for choice_data in question_data['choices']
+    ])
+    return questions
+
+
+class _QuestionSync:
+    """
+    Différence entre le barème existant et les données reçues.
+    Questions et choix avec un id : modifiés sur place s'ils ont changé ;
+    sans id : créés ; absents des données : supprimés.
+    """
+    
+    def __init__(self):
+        self.questions_to_update = []
+        self.questions_to_create = []
+        self.question_ids_to_delete = []
+        self.choices_to_update = []
+        self.choices_to_create = []
+        self.choice_ids_to_delete = []
+    
+    def questions(self, quiz, questions_data):
+        existing = {
+            question.id: question
+            for question in quiz.questions.prefetch_related('choices')
+        }
+        
+        for question_data in questions_data:
+            question = existing.pop(question_data.get('id'), None)
+            if question is None:
+                self.questions_to_create.append(question_data)
+                continue
+            
+            if _apply_changes(question, question_data, QUESTION_FIELDS):
+                self.questions_to_update.append(question)
+            self.choices(
+                question,
+                question_data['choices'],
+                {choice.id: choice for choice in question.choices.all()}
+            )
+        
+        self.question_ids_to_delete.extend(existing)
+    
+    def choices(self, question, choices_data, existing):
+        for choice_data in choices_data:
+            choice = existing.pop(choice_data.get('id'), None)
+            if choice is None:
+                self.choices_to_create.append(Choice(question=question, **_model_fields(choice_data)))
+            elif _apply_changes(choice, choice_data, CHOICE_FIELDS):
+                self.choices_to_update.append(choice)
+        
+        self.choice_ids_to_delete.extend(existing)
+    
+    def save(self, quiz=None):
+        """Appliquer la différence (à appeler dans une transaction) ; True si modifié"""
+        if self.question_ids_to_delete:
+            Question.objects.filter(id__in=self.question_ids_to_delete).delete()
+        if self.choice_ids_to_delete:
+            Choice.objects.filter(id__in=self.choice_ids_to_delete).delete()
+        if self.questions_to_update:
+            Question.objects.bulk_update(self.questions_to_update, QUESTION_FIELDS)
+        if self.choices_to_update:
+            Choice.objects.bulk_update(self.choices_to_update, CHOICE_FIELDS)
+        if self.choices_to_create:
+            Choice.objects.bulk_create(self.choices_to_create)
+        if self.questions_to_create:
+            bulk_create_questions(quiz, self.questions_to_create)
+        
+        return any([
+            self.question_ids_to_delete, self.choice_ids_to_delete,
+            self.questions_to_update, self.choices_to_update,
+            self.choices_to_create, self.questions_to_create
+        ])
+
+
 class QuizCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer pour créer/modifier un quiz complet avec questions"""
     questions = QuestionCreateUpdateSerializer(many=True, required=False)
@@ -1582,8 +1804,47 @@ class QuizCreateUpdateSerializer(serializers.ModelSerializer):
                     'available_until': 'La date de fin doit être après la date de début.'
                 })
         
+        if data.get('questions') is not None:
+            self._validate_question_ids(data['questions'])
+        
         return data
     
+    def _validate_question_ids(self, questions_data):
+        """Les id fournis doivent désigner des questions/choix de CE quiz (une requête)"""
+        existing = {}
+        if self.instance is not None:
+            for question_id, choice_id in Question.objects.filter(
+                quiz=self.instance
+            ).values_list('id', 'choices__id'):
+                existing.setdefault(question_id, set()).add(choice_id)
+        
+        seen_questions, seen_choices = set(), set()
+        for question_data in questions_data:
+            question_id = question_data.get('id')
+            if question_id is None:
+                choice_ids = [c['id'] for c in question_data['choices'] if c.get('id') is not None]
+                if choice_ids:
+                    raise serializers.ValidationError({
+                        'questions': 'Une nouvelle question ne peut pas réutiliser des choix existants.'
+                    })
+                continue
+            
+            if question_id not in existing or question_id in seen_questions:
+                raise serializers.ValidationError({
+                    'questions': f"Question {question_id} invalide pour ce quiz."
+                })
+            seen_questions.add(question_id)
+            
+            for choice_data in question_data['choices']:
+                choice_id = choice_data.get('id')
+                if choice_id is None:
+                    continue
+                if choice_id not in existing[question_id] or choice_id in seen_choices:
+                    raise serializers.ValidationError({
+                        'questions': f"Choix {choice_id} invalide pour la question {question_id}."
+                    })
+                seen_choices.add(choice_id)
+    
     def create(self, validated_data):
         """Créer le quiz avec ses questions"""
         questions_data = validated_data.pop('questions', [])
@@ -1593,42 +1854,42 @@ class QuizCreateUpdateSerializer(serializers.ModelSerializer):
         if request and request.user:
             validated_data['created_by'] = request.user
         
-        # Créer le quiz
-        quiz = Quiz.objects.create(**validated_data)
-        
-        # Créer les questions
-        for question_data in questions_data:
-            choices_data = question_data.pop('choices')
-            question = Question.objects.create(quiz=quiz, **question_data)
+        with transaction.atomic():
+            # Créer le quiz
+            quiz = Quiz.objects.create(**validated_data)
+            
+            # Créer les questions puis les choix (bulk_create)
+            bulk_create_questions(quiz, questions_data)
             
-            # Créer les choix
-            for choice_data in choices_data:
-                Choice.objects.create(question=question, **choice_data)
+            # Recharger total_points / question_count (bulk_create ne déclenche pas les signals)
+            quiz.update_question_stats()
         
         return quiz
     
     def update(self, instance, validated_data):
-        """Mettre à jour le quiz"""
+        """
+        Mettre à jour le quiz.
+        Questions et choix : mise à jour différentielle (voir _QuestionSync) ;
+        les questions inchangées et leurs réponses étudiants sont conservées.
+        """
         questions_data = validated_data.pop('questions', None)
         
-        # Mettre à jour les champs du quiz
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Mettre à jour les questions si fournies
-        if questions_data is not None:
-            # Supprimer les anciennes questions (cascade sur les choix)
-            instance.questions.all().delete()
+        with transaction.atomic():
+            # Mettre à jour les champs du quiz
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
             
-            # Créer les nouvelles questions
-            for question_data in questions_data:
-                choices_data = question_data.pop('choices')
-                question = Question.objects.create(quiz=instance, **question_data)
+            # Mettre à jour les questions si fournies
+            if questions_data is not None:
+                sync = _QuestionSync()
+                sync.questions(instance, questions_data)
                 
-                # Créer les choix
-                for choice_data in choices_data:
-                    Choice.objects.create(question=question, **choice_data)
+                if sync.save(instance):
+                    # Recharger total_points / question_count ; bulk_update et
+                    # bulk_create ne déclenchent pas les signals du barème
+                    instance.update_question_stats()
+                    answer_keys.bump_answer_key(instance)
         
         return instance
 
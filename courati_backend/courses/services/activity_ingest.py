@@ -0,0 +1,324 @@
+# courses/services/activity_ingest.py
+"""
+Ingestion asynchrone des UserActivity.
+
+Les vues appellent record_activity() : l'événement est poussé dans une liste
+Redis et la requête répond sans INSERT. La tâche Celery périodique
+flush_activity_events dépile les événements par lots et les enregistre
+avec bulk_create (+ mise à jour du rollup journalier).
+
+Réglages (settings) :
+- ACTIVITY_INGEST_MODE : 'redis' (défaut) ou 'sync' (écriture immédiate, pour les tests)
+- ACTIVITY_INGEST_REDIS_URL : URL Redis de la file
+- ACTIVITY_INGEST_FLUSH_SIZE : nombre d'événements par bulk_create
+- ACTIVITY_INGEST_FLUSH_INTERVAL : secondes entre deux vidages (config/celery.py)
+
+Un événement inutilisable (utilisateur, document ou matière supprimé
+entre-temps, données invalides) est déplacé dans la file « lettre morte »
+DEAD_LETTER_KEY au lieu d'être remis en file : il ne bloque pas les suivants.
+
+Le lot en cours est déplacé (LMOVE) dans PROCESSING_KEY et n'en est retiré
+qu'une fois enregistré : si le worker s'arrête en plein lot, le vidage suivant
+remet ces événements en tête de file. Un arrêt entre le COMMIT et ce retrait
+peut donc enregistrer deux fois un lot (livraison « au moins une fois »).
+Un verrou (FLUSH_LOCK_KEY) garantit qu'un seul vidage utilise PROCESSING_KEY.
+"""
+import json
+import logging
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import User
+from courses.models import Document, Subject, UserActivity
+from courses.services.activity_rollup import increment_rollup
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'courati:activity_events'
+DEAD_LETTER_KEY = 'courati:activity_events:dead'
+PROCESSING_KEY = 'courati:activity_events:processing'
+FLUSH_LOCK_KEY = 'courati:activity_events:flush_lock'
+FLUSH_LOCK_TIMEOUT = 5 * 60
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            getattr(settings, 'ACTIVITY_INGEST_REDIS_URL', 'redis://localhost:6379/1')
+        )
+    return _client
+
+
+def _ingest_mode():
+    return getattr(settings, 'ACTIVITY_INGEST_MODE', 'redis')
+
+
+def _flush_size():
+    return getattr(settings, 'ACTIVITY_INGEST_FLUSH_SIZE', 500)
+
+
+def record_activity(user, document, action, subject=None, ip_address=None, user_agent=''):
+    """
+    Enregistrer une activité utilisateur (consultation, téléchargement, favori).
+
+    En mode 'redis', l'événement est mis en file et persisté par le consommateur.
+    En mode 'sync' (ou si Redis est indisponible), il est écrit immédiatement.
+    """
+    subject_id = subject.id if subject is not None else document.subject_id
+
+    if _ingest_mode() == 'sync':
+        UserActivity.objects.create(
+            user=user,
+            document=document,
+            subject_id=subject_id,
+            action=action,
+            ip_address=ip_address,
+            user_agent=user_agent or ''
+        )
+        return
+
+    event = {
+        'user_id': user.id,
+        'document_id': document.id,
+        'subject_id': subject_id,
+        'action': action,
+        'ip_address': ip_address,
+        'user_agent': user_agent or '',
+        'is_student': user.role == 'STUDENT',
+        'created_at': timezone.now().isoformat(),
+    }
+
+    try:
+        _get_client().rpush(QUEUE_KEY, json.dumps(event))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ File d'activité indisponible, écriture directe: {e}")
+        UserActivity.objects.create(
+            user=user,
+            document=document,
+            subject_id=subject_id,
+            action=action,
+            ip_address=ip_address,
+            user_agent=user_agent or ''
+        )
+
+
+def _recover_processing():
+    """
+    Remettre en tête de file, dans l'ordre, les événements d'un lot
+    interrompu (worker arrêté avant la fin du vidage précédent)
+
+    Returns:
+        int: nombre d'événements récupérés
+    """
+    client = _get_client()
+    recovered = 0
+    while client.lmove(PROCESSING_KEY, QUEUE_KEY, 'RIGHT', 'LEFT') is not None:
+        recovered += 1
+    if recovered:
+        logger.warning(f"⚠️ {recovered} activité(s) d'un lot interrompu remise(s) en file")
+    return recovered
+
+
+def _pop_events(count):
+    """
+    Déplacer atomiquement jusqu'à `count` événements de la file vers
+    PROCESSING_KEY, où ils restent jusqu'à _ack_events / _requeue_events
+    """
+    pipe = _get_client().pipeline(transaction=True)
+    for _ in range(count):
+        pipe.lmove(QUEUE_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+    return [json.loads(raw) for raw in pipe.execute() if raw is not None]
+
+
+def _ack_events():
+    """Lot traité (enregistré ou en lettre morte) : vider PROCESSING_KEY"""
+    _get_client().delete(PROCESSING_KEY)
+
+
+def _requeue_events(events):
+    """
+    Remettre des événements en file après un échec d'écriture (base indisponible)
+    et libérer PROCESSING_KEY dans la même transaction Redis
+    """
+    pipe = _get_client().pipeline(transaction=True)
+    if events:
+        pipe.lpush(QUEUE_KEY, *[json.dumps(event) for event in reversed(events)])
+    pipe.delete(PROCESSING_KEY)
+    pipe.execute()
+
+
+def _dead_letter(events, reason):
+    """Écarter des événements inutilisables (conservés pour analyse)"""
+    if not events:
+        return
+    _get_client().rpush(DEAD_LETTER_KEY, *[
+        json.dumps({**event, 'error': reason}) for event in events
+    ])
+    logger.warning(f"⚠️ {len(events)} activité(s) écartée(s) en lettre morte: {reason}")
+
+
+def _split_valid_events(events):
+    """
+    Séparer les événements dont l'utilisateur, le document et la matière
+    existent encore (trois requêtes par lot) des autres
+    """
+    user_ids = set(User.objects.filter(
+        id__in={event.get('user_id') for event in events}
+    ).values_list('id', flat=True))
+    document_ids = set(Document.objects.filter(
+        id__in={event.get('document_id') for event in events}
+    ).values_list('id', flat=True))
+    subject_ids = set(Subject.objects.filter(
+        id__in={event.get('subject_id') for event in events}
+    ).values_list('id', flat=True))
+
+    valid, invalid = [], []
+    for event in events:
+        if (event.get('user_id') in user_ids
+                and event.get('document_id') in document_ids
+                and event.get('subject_id') in subject_ids):
+            valid.append(event)
+        else:
+            invalid.append(event)
+    return valid, invalid
+
+
+def _persist_events(events):
+    """bulk_create des activités + rollup journalier agrégé par lot"""
+    activities = [
+        UserActivity(
+            user_id=event['user_id'],
+            document_id=event['document_id'],
+            subject_id=event['subject_id'],
+            action=event['action'],
+            ip_address=event['ip_address'],
+            user_agent=event['user_agent'],
+            created_at=parse_datetime(event['created_at'])
+        )
+        for event in events
+    ]
+
+    # bulk_create ne déclenche pas post_save : rollup mis à jour ici
+    rollup = Counter(
+        (timezone.localdate(activity.created_at), activity.subject_id, activity.action, event['is_student'])
+        for activity, event in zip(activities, events)
+    )
+
+    with transaction.atomic():
+        UserActivity.objects.bulk_create(activities, batch_size=_flush_size())
+        for (date, subject_id, action, is_student), amount in rollup.items():
+            increment_rollup(date, action, subject_id=subject_id, is_student=is_student, amount=amount)
+
+
+def _persist_or_isolate(events):
+    """
+    Persister un lot. Si des données invalides le font échouer (ex. ligne
+    supprimée entre le filtrage et le COMMIT, où PostgreSQL vérifie les clés
+    étrangères), le couper en deux jusqu'à isoler les événements fautifs,
+    envoyés en lettre morte. Toute autre erreur remet en file les événements
+    non encore enregistrés.
+
+    Returns:
+        int: nombre d'activités enregistrées
+    """
+    saved = 0
+    pending = [events]
+
+    while pending:
+        chunk = pending.pop()
+        try:
+            _persist_events(chunk)
+        except (IntegrityError, DataError, KeyError, TypeError, ValueError) as e:
+            if len(chunk) == 1:
+                _dead_letter(chunk, f"{type(e).__name__}: {e}")
+            else:
+                middle = len(chunk) // 2
+                pending.append(chunk[middle:])
+                pending.append(chunk[:middle])
+            continue
+        except Exception:
+            _requeue_events(chunk + [event for rest in reversed(pending) for event in rest])
+            raise
+
+        saved += len(chunk)
+
+    return saved
+
+
+def flush_activity_events(max_batches=None):
+    """
+    Persister les événements en attente par lots de ACTIVITY_INGEST_FLUSH_SIZE.
+
+    Args:
+        max_batches (int): nombre maximum de lots (None = vider la file)
+
+    Returns:
+        int: nombre d'activités enregistrées (0 si un vidage est déjà en cours)
+    """
+    if _ingest_mode() == 'sync':
+        return 0
+
+    client = _get_client()
+    if not client.set(FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_TIMEOUT):
+        logger.info("⏭️ Vidage de la file d'activités déjà en cours")
+        return 0
+
+    try:
+        _recover_processing()
+
+        size = _flush_size()
+        saved = 0
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            events = _pop_events(size)
+            if not events:
+                break
+
+            try:
+                valid, invalid = _split_valid_events(events)
+            except Exception:
+                # Base indisponible : réessayer au prochain passage
+                _requeue_events(events)
+                raise
+
+            _dead_letter(invalid, 'utilisateur, document ou matière introuvable')
+            if valid:
+                saved += _persist_or_isolate(valid)
+            _ack_events()
+
+            batches += 1
+
+            if len(events) < size:
+                break
+
+        if saved:
+            logger.info(f"📥 {saved} activité(s) enregistrée(s) en {batches} lot(s)")
+        return saved
+    finally:
+        client.delete(FLUSH_LOCK_KEY)
+
+
+def pending_activity_events():
+    """Nombre d'événements en attente (file + lot en cours de traitement)"""
+    if _ingest_mode() == 'sync':
+        return 0
+    pipe = _get_client().pipeline(transaction=False)
+    pipe.llen(QUEUE_KEY)
+    pipe.llen(PROCESSING_KEY)
+    return sum(pipe.execute())
+
+
+def dead_activity_events():
+    """Nombre d'événements écartés en lettre morte"""
+    if _ingest_mode() == 'sync':
+        return 0
+    return _get_client().llen(DEAD_LETTER_KEY)
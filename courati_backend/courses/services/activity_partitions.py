@@ -0,0 +1,210 @@
+# courses/services/activity_partitions.py
+"""
+Partitionnement mensuel de courses_useractivity (PostgreSQL uniquement).
+
+La table est partitionnée par RANGE sur created_at (migration 0014) :
+- une partition par mois : courses_useractivity_pYYYY_MM
+- une partition DEFAULT pour les lignes hors plage
+
+Rétention : les partitions plus anciennes que USER_ACTIVITY_RETENTION_MONTHS
+sont d'abord agrégées dans DailyActivityRollup, puis détachées et déplacées
+dans le schéma d'archive (mode 'archive') ou supprimées (mode 'drop').
+
+Sur les autres bases (SQLite en développement) toutes les fonctions sont sans effet.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'courses_useractivity'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+ARCHIVE_SCHEMA = 'archive'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year}_{month.month:02d}'
+
+
+def is_partitioned():
+    """La table est-elle déjà partitionnée ?"""
+    if not is_supported():
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND c.relnamespace = 'public'::regnamespace",
+            [PARENT_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """
+    Partitions mensuelles attachées : [(mois, nom de table)] triées par mois.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [PARENT_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f'{PARENT_TABLE}_p'
+    partitions = []
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix):].split('_')
+        partitions.append((date(int(year), int(month), 1), name))
+    return sorted(partitions)
+
+
+def create_partition(month):
+    """
+    Créer la partition du mois `month` si elle n'existe pas.
+    Les lignes déjà tombées dans la partition DEFAULT pour ce mois y sont déplacées.
+
+    Returns:
+        bool: True si la partition a été créée
+    """
+    month = _month_start(month)
+    name = partition_name(month)
+
+    if name in {existing for _, existing in list_partitions()}:
+        return False
+
+    start = month.isoformat()
+    end = _add_months(month, 1).isoformat()
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} "
+            f"(LIKE {qn(PARENT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS ("
+            f"  DELETE FROM {qn(DEFAULT_PARTITION)} "
+            f"  WHERE created_at >= %s AND created_at < %s RETURNING *"
+            f") INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end]
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(PARENT_TABLE)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end]
+        )
+
+    logger.info(f"🧱 Partition {name} créée ({start} → {end})")
+    return True
+
+
+def ensure_partitions(months_ahead=3, start=None):
+    """
+    Créer les partitions de `start` (défaut: mois courant) jusqu'à
+    `months_ahead` mois dans le futur.
+
+    Returns:
+        list: noms des partitions créées
+    """
+    if not is_partitioned():
+        logger.info("⏭️ Table d'activité non partitionnée, rien à créer")
+        return []
+
+    today = timezone.localdate()
+    month = _month_start(start or today)
+    last = _add_months(_month_start(today), months_ahead)
+
+    created = []
+    while month <= last:
+        if create_partition(month):
+            created.append(partition_name(month))
+        month = _add_months(month, 1)
+    return created
+
+
+def apply_retention(retention_months=None, mode=None, dry_run=False):
+    """
+    Retirer de la table les partitions dont le mois est plus ancien
+    que `retention_months` mois (mois courant exclu).
+
+    Chaque partition est d'abord agrégée dans DailyActivityRollup,
+    puis détachée et archivée (mode 'archive') ou supprimée (mode 'drop').
+
+    Returns:
+        list: noms des partitions traitées
+    """
+    if not is_partitioned():
+        logger.info("⏭️ Table d'activité non partitionnée, pas de rétention")
+        return []
+
+    if retention_months is None:
+        retention_months = getattr(settings, 'USER_ACTIVITY_RETENTION_MONTHS', 12)
+    if mode is None:
+        mode = getattr(settings, 'USER_ACTIVITY_RETENTION_MODE', 'archive')
+    if mode not in ('archive', 'drop'):
+        raise ValueError(f"Mode de rétention inconnu: {mode}")
+
+    cutoff = _add_months(_month_start(timezone.localdate()), -retention_months)
+    expired = [(month, name) for month, name in list_partitions() if month < cutoff]
+
+    if dry_run:
+        return [name for _, name in expired]
+
+    from courses.services.activity_rollup import rebuild_rollup
+
+    qn = connection.ops.quote_name
+    processed = []
+
+    for month, name in expired:
+        # Agréger le mois avant de retirer ses lignes de la table
+        rebuild_rollup(month, _add_months(month, 1) - timedelta(days=1))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}")
+
+            if mode == 'archive':
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {qn(ARCHIVE_SCHEMA)}")
+                cursor.execute(f"ALTER TABLE {qn(name)} SET SCHEMA {qn(ARCHIVE_SCHEMA)}")
+            else:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+
+        logger.info(f"🗄️ Partition {name} {'archivée' if mode == 'archive' else 'supprimée'}")
+        processed.append(name)
+
+    return processed
+
+
+def oldest_retained_date():
+    """
+    Première date encore présente dans la table (None si pas de rétention).
+    Les agrégats antérieurs ne doivent pas être recalculés depuis UserActivity.
+    """
+    if not is_partitioned():
+        return None
+
+    partitions = list_partitions()
+    return partitions[0][0] if partitions else None
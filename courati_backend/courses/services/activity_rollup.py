@@ -0,0 +1,196 @@
+# courses/services/activity_rollup.py
+import logging
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from courses.models import DailyActivityRollup, Document, QuizAttempt, UserActivity
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+def increment_rollup(date, action, subject_id=None, is_student=False, amount=1):
+    """
+    Incrémenter atomiquement le compteur (date, matière, action).
+    Crée la ligne si elle n'existe pas encore.
+    """
+    student_amount = amount if is_student else 0
+    lookup = {'date': date, 'subject_id': subject_id, 'action': action}
+
+    updated = DailyActivityRollup.objects.filter(**lookup).update(
+        count=F('count') + amount,
+        student_count=F('student_count') + student_amount
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyActivityRollup.objects.create(
+                count=amount,
+                student_count=student_amount,
+                **lookup
+            )
+    except IntegrityError:
+        # Créée entre-temps par une autre requête
+        DailyActivityRollup.objects.filter(**lookup).update(
+            count=F('count') + amount,
+            student_count=F('student_count') + student_amount
+        )
+
+
+def _day_bounds(start_date, end_date):
+    """Instants [début de start_date, début du lendemain de end_date[ dans le fuseau courant"""
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+    )
+
+
+def rebuild_rollup(start_date, end_date):
+    """
+    Recalculer les agrégats pour les jours [start_date, end_date]
+    à partir des tables sources (une requête groupée par source).
+
+    Les filtres portent sur les colonnes datetime elles-mêmes (bornes
+    >= / <) pour utiliser leurs index ; TruncDate ne sert qu'au regroupement.
+
+    Returns:
+        int: nombre de lignes d'agrégats écrites
+    """
+    from courses.services.activity_partitions import oldest_retained_date
+
+    # Les mois archivés ne sont plus dans UserActivity : leurs agrégats
+    # de consultations/téléchargements/favoris sont conservés tels quels
+    oldest = oldest_retained_date()
+    activity_start = max(start_date, oldest) if oldest else start_date
+
+    since, until = _day_bounds(start_date, end_date)
+    activity_since, _ = _day_bounds(activity_start, end_date)
+
+    rows = {}
+
+    def add(date, subject_id, action, count, student_count):
+        key = (date, subject_id, action)
+        current = rows.setdefault(key, [0, 0])
+        current[0] += count
+        current[1] += student_count
+
+    # Consultations, téléchargements, favoris
+    activities = UserActivity.objects.filter(
+        created_at__gte=activity_since,
+        created_at__lt=until
+    ).annotate(
+        day=TruncDate('created_at')
+    ).values('day', 'subject_id', 'action').annotate(
+        total=Count('id'),
+        students=Count('id', filter=Q(user__role='STUDENT'))
+    ).order_by()
+
+    for row in activities:
+        add(row['day'], row['subject_id'], row['action'], row['total'], row['students'])
+
+    # Tentatives de quiz
+    attempts = QuizAttempt.objects.filter(
+        started_at__gte=since,
+        started_at__lt=until
+    ).annotate(
+        day=TruncDate('started_at')
+    ).values('day', 'quiz__subject_id').annotate(
+        total=Count('id'),
+        students=Count('id', filter=Q(user__role='STUDENT'))
+    ).order_by()
+
+    for row in attempts:
+        add(row['day'], row['quiz__subject_id'], 'quiz_attempt', row['total'], row['students'])
+
+    # Nouveaux documents
+    documents = Document.objects.filter(
+        created_at__gte=since,
+        created_at__lt=until
+    ).annotate(
+        day=TruncDate('created_at')
+    ).values('day', 'subject_id').annotate(
+        total=Count('id')
+    ).order_by()
+
+    for row in documents:
+        add(row['day'], row['subject_id'], 'new_document', row['total'], 0)
+
+    # Nouveaux étudiants (action globale, sans matière)
+    students = User.objects.filter(
+        role='STUDENT',
+        date_joined__gte=since,
+        date_joined__lt=until
+    ).annotate(
+        day=TruncDate('date_joined')
+    ).values('day').annotate(
+        total=Count('id')
+    ).order_by()
+
+    for row in students:
+        add(row['day'], None, 'new_student', row['total'], row['total'])
+
+    rollups = [
+        DailyActivityRollup(
+            date=date,
+            subject_id=subject_id,
+            action=action,
+            count=count,
+            student_count=student_count
+        )
+        for (date, subject_id, action), (count, student_count) in rows.items()
+    ]
+
+    stale = DailyActivityRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if activity_start > start_date:
+        stale = stale.exclude(
+            date__lt=activity_start,
+            action__in=[action for action, _ in UserActivity._meta.get_field('action').choices]
+        )
+
+    with transaction.atomic():
+        stale.delete()
+        DailyActivityRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    logger.info(f"📊 Rollup recalculé du {start_date} au {end_date}: {len(rollups)} lignes")
+    return len(rollups)
+
+
+def get_daily_counts(days=7, subject_ids=None, actions=None):
+    """
+    Lire les compteurs des `days` derniers jours en une seule requête.
+
+    Args:
+        days (int): nombre de jours (aujourd'hui inclus)
+        subject_ids (list): restreindre à ces matières (None = toutes)
+        actions (list): restreindre à ces actions (None = toutes)
+
+    Returns:
+        tuple: (liste des dates, dict {(date, action): {'count', 'student_count'}})
+    """
+    today = timezone.localdate()
+    dates = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+    rollups = DailyActivityRollup.objects.filter(date__gte=dates[0], date__lte=today)
+    if subject_ids is not None:
+        rollups = rollups.filter(subject_id__in=subject_ids)
+    if actions is not None:
+        rollups = rollups.filter(action__in=actions)
+
+    counts = {}
+    for row in rollups.values('date', 'action').annotate(
+        total=Sum('count'),
+        students=Sum('student_count')
+    ).order_by():
+        counts[(row['date'], row['action'])] = {
+            'count': row['total'] or 0,
+            'student_count': row['students'] or 0,
+        }
+
+    return dates, counts
@@ -0,0 +1,132 @@
+# courses/services/answer_keys.py
+"""
+Barème d'un quiz en cache : snapshot immuable par version.
+
+Le snapshot contient, dans l'ordre des questions : points, explication,
+choix (id, texte, ordre) et un masque de bits des bonnes réponses
+(bit i = i-ème choix correct). Il sert à la correction (services/grading.py),
+à QuizCorrectionSerializer et à QuizStatisticsSerializer, sans relire
+Question et Choice.
+
+Clé de cache : quiz_id + Quiz.answer_key_version. Toute écriture d'une
+Question ou d'un Choice incrémente la version (signals de courses/signals.py) ;
+les écritures en bulk, qui ne déclenchent pas les signals, appellent
+bump_answer_key(). Les anciens snapshots expirent seuls : un snapshot ne
+change donc jamais une fois écrit.
+"""
+import logging
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+logger = logging.getLogger(__name__)
+
+ANSWER_KEY_CACHE_TIMEOUT = 24 * 60 * 60
+
+AnswerKey = namedtuple('AnswerKey', ['quiz_id', 'version', 'questions'])
+
+QuestionKey = namedtuple('QuestionKey', [
+    'id', 'order', 'text', 'question_type', 'points', 'explanation',
+    'choices', 'correct_mask'
+])
+
+ChoiceKey = namedtuple('ChoiceKey', ['id', 'text', 'order'])
+
+
+def _cache_key(quiz_id, version):
+    return f'quiz:answer_key:{quiz_id}:{version}'
+
+
+def build_answer_key(quiz_id, version):
+    """Snapshot du barème depuis la base (une requête, LEFT JOIN questions → choix)"""
+    from courses.models import Question
+
+    rows = Question.objects.filter(quiz_id=quiz_id).values_list(
+        'id', 'order', 'text', 'question_type', 'points', 'explanation',
+        'choices__id', 'choices__text', 'choices__order', 'choices__is_correct'
+    ).order_by('order', 'id', 'choices__order', 'choices__id')
+
+    questions = {}
+    for (question_id, order, text, question_type, points, explanation,
+         choice_id, choice_text, choice_order, is_correct) in rows:
+        question = questions.setdefault(question_id, {
+            'fields': (question_id, order, text, question_type, points, explanation),
+            'choices': [],
+            'correct_mask': 0,
+        })
+        if choice_id is not None:
+            if is_correct:
+                question['correct_mask'] |= 1 << len(question['choices'])
+            question['choices'].append(ChoiceKey(choice_id, choice_text, choice_order))
+
+    return AnswerKey(quiz_id, version, tuple(
+        QuestionKey(*question['fields'], tuple(question['choices']), question['correct_mask'])
+        for question in questions.values()
+    ))
+
+
+def get_answer_key(quiz, version=None):
+    """
+    Snapshot du barème (cache, sinon base)
+
+    Args:
+        quiz: Instance Quiz (answer_key_version chargé)
+        version: Version précise souhaitée (ex. celle d'une tentative corrigée) ;
+            si elle n'est plus en cache, la version actuelle est renvoyée
+    """
+    if version and version != quiz.answer_key_version:
+        answer_key = cache.get(_cache_key(quiz.pk, version))
+        if answer_key is not None:
+            return answer_key
+
+    key = _cache_key(quiz.pk, quiz.answer_key_version)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz.pk, quiz.answer_key_version)
+        cache.set(key, answer_key, timeout=ANSWER_KEY_CACHE_TIMEOUT)
+    return answer_key
+
+
+def bump_answer_keys(quiz_ids=(), question_ids=()):
+    """Nouvelle version du barème des quiz donnés ou contenant ces questions (un UPDATE)"""
+    from courses.models import Quiz
+
+    Quiz.objects.filter(
+        Q(pk__in=quiz_ids) | Q(questions__id__in=question_ids)
+    ).update(answer_key_version=F('answer_key_version') + 1)
+
+
+def bump_answer_key(quiz):
+    """Barème modifié (questions ou choix) : nouvelle version du snapshot"""
+    bump_answer_keys(quiz_ids=[quiz.pk])
+    quiz.refresh_from_db(fields=['answer_key_version'])
+    logger.info(f"🔑 Barème du quiz {quiz.pk} → version {quiz.answer_key_version}")
+
+
+# ========================================
+# LECTURE DU SNAPSHOT
+# ========================================
+
+def correct_choice_ids(question):
+    """Ids des bonnes réponses d'une question du snapshot"""
+    return frozenset(
+        choice.id for index, choice in enumerate(question.choices)
+        if question.correct_mask >> index & 1
+    )
+
+
+def selection_mask(question, choice_ids):
+    """
+    Masque de bits d'une sélection de choix
+
+    Returns:
+        int ou None si un choix n'appartient pas à la question
+    """
+    positions = {choice.id: index for index, choice in enumerate(question.choices)}
+    mask = 0
+    for choice_id in choice_ids:
+        if choice_id not in positions:
+            return None
+        mask |= 1 << positions[choice_id]
+    return mask
@@ -0,0 +1,139 @@
+# courses/services/curriculum.py
+"""
+Programme d'une cohorte (niveau, filière) partagé par tous ses étudiants.
+
+get_curriculum(level_id, major_id) renvoie, depuis le cache :
+- subject_ids : matières actives de la cohorte (triées par ordre, nom)
+- document_counts : {subject_id: nombre de documents actifs}
+- quiz_ids : quiz actifs de ces matières
+- teachers : {subject_id: [professeurs assignés]}
+
+Chaque cohorte a un numéro de version ; les signaux de courses/signals.py
+l'incrémentent (bump_*) dès que matières, documents, quiz ou assignations
+changent. Le cache de la page d'accueil (home_cache) repose sur la même version.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+logger = logging.getLogger(__name__)
+
+CURRICULUM_CACHE_TIMEOUT = 60 * 60
+
+
+def cohort_version_key(level_id, major_id):
+    return f'curriculum:version:{level_id}:{major_id}'
+
+
+def _bump(key):
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+# ========================================
+# INVALIDATION
+# ========================================
+
+def bump_cohorts(level_ids, major_ids):
+    """Invalider toutes les cohortes (niveau x filière)"""
+    for level_id in set(level_ids):
+        for major_id in set(major_ids):
+            if level_id is not None and major_id is not None:
+                _bump(cohort_version_key(level_id, major_id))
+
+
+def subject_cohorts(subject_ids):
+    """Cohortes (niveau, filière) concernées par ces matières"""
+    from courses.models import Subject
+
+    return {
+        (level_id, major_id)
+        for level_id, major_id in Subject.objects.filter(
+            id__in=subject_ids
+        ).values_list('levels', 'majors')
+        if level_id is not None and major_id is not None
+    }
+
+
+def bump_cohort_pairs(pairs):
+    """Invalider une liste de cohortes (niveau, filière)"""
+    for level_id, major_id in set(pairs):
+        _bump(cohort_version_key(level_id, major_id))
+
+
+def bump_subject_cohorts(subject_ids):
+    """Contenu modifié dans ces matières : invalider leurs cohortes"""
+    bump_cohort_pairs(subject_cohorts(subject_ids))
+
+
+# ========================================
+# LECTURE
+# ========================================
+
+def _build_curriculum(level_id, major_id):
+    """Calcul du programme (3 requêtes, une fois par cohorte et par version)"""
+    from accounts.models import TeacherAssignment
+    from courses.models import Quiz, Subject
+
+    subjects = list(
+        Subject.objects.filter(
+            levels=level_id,
+            majors=major_id,
+            is_active=True
+        ).annotate(
+            active_documents=Count('documents', filter=Q(documents__is_active=True))
+        ).order_by('order', 'name').values_list('id', 'active_documents')
+    )
+    subject_ids = [subject_id for subject_id, _ in subjects]
+
+    quiz_ids = list(
+        Quiz.objects.filter(
+            subject_id__in=subject_ids,
+            is_active=True
+        ).values_list('id', flat=True)
+    )
+
+    teachers = {subject_id: [] for subject_id in subject_ids}
+    assignments = TeacherAssignment.objects.filter(
+        subject_id__in=subject_ids,
+        is_active=True
+    ).select_related('teacher', 'teacher__teacher_profile')
+
+    for assignment in assignments:
+        teacher_data = {
+            'id': assignment.teacher.id,
+            'full_name': assignment.teacher.get_full_name(),
+            'email': assignment.teacher.email,
+        }
+        if hasattr(assignment.teacher, 'teacher_profile'):
+            teacher_data['specialization'] = assignment.teacher.teacher_profile.specialization
+        teachers[assignment.subject_id].append(teacher_data)
+
+    return {
+        'subject_ids': subject_ids,
+        'document_counts': dict(subjects),
+        'quiz_ids': quiz_ids,
+        'teachers': teachers,
+    }
+
+
+def get_curriculum(level_id, major_id):
+    """Programme de la cohorte (niveau, filière), depuis le cache si possible"""
+    version = cache.get(cohort_version_key(level_id, major_id), 0)
+    key = f'curriculum:data:{level_id}:{major_id}:{version}'
+
+    curriculum = cache.get(key)
+    if curriculum is None:
+        curriculum = _build_curriculum(level_id, major_id)
+        cache.set(key, curriculum, timeout=CURRICULUM_CACHE_TIMEOUT)
+        logger.info(f"📚 Programme calculé pour la cohorte ({level_id}, {major_id}) v{version}")
+
+    return curriculum
+
+
+def get_student_curriculum(student_profile):
+    """Programme de la cohorte de l'étudiant (vide si profil incomplet)"""
+    if not student_profile.level_id or not student_profile.major_id:
+        return {'subject_ids': [], 'document_counts': {}, 'quiz_ids': [], 'teachers': {}}
+    return get_curriculum(student_profile.level_id, student_profile.major_id)
@@ -0,0 +1,214 @@
+# courses/services/document_counters.py
+"""
+Compteurs de consultations / téléchargements des documents en écriture différée.
+
+Les incréments sont accumulés atomiquement dans Redis puis reportés sur
+Document par lots avec des expressions F() par une tâche Celery
+périodique (flush_document_counters).
+
+Clés utilisées :
+- doc_counter:<document_id> : hash {view_count, download_count} des incréments en attente
+- doc_counter:dirty         : set des documents à reporter
+
+L'incrément (HINCRBY + SADD) et la reprise des incréments (HGETALL + DEL)
+sont chacun une transaction MULTI : un document incrémenté pendant un report
+est simplement réinscrit dans le set et reporté au passage suivant.
+
+Réglages (settings) :
+- DOCUMENT_COUNTERS_REDIS_URL : URL Redis des compteurs
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from courses.models import Document
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('view_count', 'download_count')
+FLUSH_BATCH_SIZE = 500
+FLUSH_LOCK_TIMEOUT = 5 * 60
+
+KEY_PREFIX = 'doc_counter'
+DIRTY_KEY = f'{KEY_PREFIX}:dirty'
+FLUSH_LOCK_KEY = f'{KEY_PREFIX}:flush_lock'
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            getattr(settings, 'DOCUMENT_COUNTERS_REDIS_URL', 'redis://localhost:6379/1'),
+            decode_responses=True
+        )
+    return _client
+
+
+def _counter_key(document_id):
+    return f'{KEY_PREFIX}:{document_id}'
+
+
+def increment_document_counter(document_id, field, amount=1):
+    """
+    Ajouter `amount` au compteur `field` du document (sans écriture en BDD).
+    Si Redis est indisponible, le compteur est incrémenté directement en base.
+
+    Args:
+        document_id (int): id du document
+        field (str): 'view_count' ou 'download_count'
+        amount (int): incrément
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Compteur inconnu: {field}")
+
+    try:
+        pipe = _get_client().pipeline(transaction=True)
+        pipe.hincrby(_counter_key(document_id), field, amount)
+        pipe.sadd(DIRTY_KEY, document_id)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Compteurs indisponibles, écriture directe: {e}")
+        Document.objects.filter(id=document_id).update(**{field: F(field) + amount})
+
+
+def get_buffered_deltas(document_ids):
+    """
+    Incréments en attente pour ces documents (un aller-retour Redis).
+
+    Returns:
+        dict: {document_id: {'view_count': n, 'download_count': n}}
+    """
+    document_ids = list(document_ids)
+    deltas = {document_id: dict.fromkeys(COUNTER_FIELDS, 0) for document_id in document_ids}
+    if not document_ids:
+        return deltas
+
+    try:
+        pipe = _get_client().pipeline(transaction=False)
+        for document_id in document_ids:
+            pipe.hmget(_counter_key(document_id), *COUNTER_FIELDS)
+        values = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Compteurs indisponibles, valeurs en base uniquement: {e}")
+        return deltas
+
+    for document_id, counts in zip(document_ids, values):
+        for field, value in zip(COUNTER_FIELDS, counts):
+            deltas[document_id][field] = int(value or 0)
+    return deltas
+
+
+def apply_buffered_counts(documents):
+    """
+    Ajouter les incréments en attente aux compteurs des instances Document
+    (lecture seule : rien n'est sauvegardé). Une instance déjà traitée
+    n'est pas comptée deux fois.
+
+    Returns:
+        les mêmes documents
+    """
+    documents = list(documents)
+    pending = [document for document in documents if not getattr(document, '_buffered_counts', False)]
+    if not pending:
+        return documents
+
+    deltas = get_buffered_deltas([document.id for document in pending])
+    for document in pending:
+        for field, delta in deltas[document.id].items():
+            setattr(document, field, getattr(document, field) + delta)
+        document._buffered_counts = True
+    return documents
+
+
+def _take_deltas(document_ids):
+    """
+    Retirer de Redis les incréments en attente de ces documents et les renvoyer
+    (HGETALL + DEL dans une même transaction : aucun incrément n'est perdu).
+    """
+    pipe = _get_client().pipeline(transaction=True)
+    for document_id in document_ids:
+        pipe.hgetall(_counter_key(document_id))
+        pipe.delete(_counter_key(document_id))
+    results = pipe.execute()
+
+    deltas = {}
+    for document_id, counts in zip(document_ids, results[::2]):
+        fields = {field: int(counts.get(field, 0)) for field in COUNTER_FIELDS}
+        if any(fields.values()):
+            deltas[int(document_id)] = fields
+    return deltas
+
+
+def _restore_deltas(deltas):
+    """Remettre des incréments en attente (report en BDD échoué)"""
+    pipe = _get_client().pipeline(transaction=True)
+    for document_id, fields in deltas.items():
+        for field, delta in fields.items():
+            if delta:
+                pipe.hincrby(_counter_key(document_id), field, delta)
+        pipe.sadd(DIRTY_KEY, document_id)
+    pipe.execute()
+
+
+def _write_deltas(deltas):
+    """Reporter les incréments d'un lot sur Document en une requête UPDATE"""
+    updates = {}
+    for field in COUNTER_FIELDS:
+        whens = [
+            When(id=document_id, then=Value(fields[field]))
+            for document_id, fields in deltas.items()
+            if fields[field]
+        ]
+        if whens:
+            updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+
+    with transaction.atomic():
+        Document.objects.filter(id__in=list(deltas)).update(**updates)
+
+
+def flush_document_counters():
+    """
+    Reporter tous les incréments en attente sur la table Document,
+    par lots de FLUSH_BATCH_SIZE documents retirés du set (SPOP).
+
+    Un lot en échec est remis en attente ; les lots déjà écrits ne le sont
+    pas et les documents non encore retirés restent dans le set.
+
+    Returns:
+        int: nombre de documents mis à jour (None si un report est déjà en cours)
+    """
+    client = _get_client()
+    if not client.set(FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_TIMEOUT):
+        logger.info("⏭️ Report des compteurs déjà en cours")
+        return None
+
+    try:
+        flushed = 0
+        # Borne : les documents réinscrits pendant le report attendent le passage suivant
+        remaining = client.scard(DIRTY_KEY)
+        while remaining > 0:
+            document_ids = client.spop(DIRTY_KEY, min(remaining, FLUSH_BATCH_SIZE))
+            if not document_ids:
+                break
+            remaining -= len(document_ids)
+
+            deltas = _take_deltas(document_ids)
+            if not deltas:
+                continue
+            try:
+                _write_deltas(deltas)
+            except Exception:
+                _restore_deltas(deltas)
+                raise
+            flushed += len(deltas)
+
+        if flushed:
+            logger.info(f"📊 Compteurs reportés pour {flushed} document(s)")
+        return flushed
+    finally:
+        client.delete(FLUSH_LOCK_KEY)
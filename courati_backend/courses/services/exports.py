@@ -0,0 +1,378 @@
+# courses/services/exports.py
+"""
+Exports administrateur en flux (CSV) ou en XLSX (openpyxl, mode write-only).
+
+Chaque source de lignes (étudiants, documents, tentatives de quiz, journal
+d'activité, statistiques de quiz) est déclarée avec @export_source : en-têtes
++ générateur de lignes lisant la base par curseur serveur
+(iterator(chunk_size=EXPORT_CHUNK_SIZE)). Aucune source ne charge la table
+entière en mémoire.
+
+- stream_export() : réponse HTTP (StreamingHttpResponse pour le CSV)
+- write_export() : fichier dans le stockage privé des exports (EXPORTS_ROOT,
+  hors MEDIA_ROOT), pour les exports lancés en tâche Celery
+  (courses.tasks.run_export). Nom de fichier aléatoire, téléchargement
+  uniquement via la vue admin (open_export), suppression après
+  EXPORT_RETENTION_HOURS (delete_expired_exports).
+"""
+import csv
+import logging
+import os
+import secrets
+import tempfile
+from collections import namedtuple
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ExportSource = namedtuple('ExportSource', ['name', 'filename', 'headers', 'rows', 'delimiter'])
+
+EXPORT_SOURCES = {}
+
+
+class ExportError(ValueError):
+    """Source ou format d'export inconnu"""
+
+
+def export_source(name, filename, headers, delimiter=','):
+    """Déclarer une source de lignes : rows(filters) -> itérable de listes"""
+    def decorator(rows):
+        EXPORT_SOURCES[name] = ExportSource(name, filename, headers, rows, delimiter)
+        return rows
+    return decorator
+
+
+def get_source(name, export_format='csv'):
+    """Source déclarée (ExportError si source ou format inconnu)"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Format d'export inconnu: {export_format}")
+    try:
+        return EXPORT_SOURCES[name]
+    except KeyError:
+        raise ExportError(f"Source d'export inconnue: {name}")
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+# ========================================
+# SOURCES DE LIGNES
+# ========================================
+
+@export_source('students', 'etudiants', [
+    'ID', 'Nom d\'utilisateur', 'Email', 'Prénom', 'Nom', 'Niveau',
+    'Filière', 'Téléphone', 'Actif', 'Date d\'inscription'
+])
+def student_rows(filters):
+    from accounts.models import User
+
+    queryset = User.objects.filter(role='STUDENT').select_related(
+        'student_profile',
+        'student_profile__level',
+        'student_profile__major'
+    ).order_by('id')
+
+    if filters.get('level'):
+        queryset = queryset.filter(student_profile__level_id=filters['level'])
+    if filters.get('major'):
+        queryset = queryset.filter(student_profile__major_id=filters['major'])
+    if filters.get('is_active') is not None:
+        queryset = queryset.filter(is_active=str(filters['is_active']).lower() == 'true')
+
+    for student in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        profile = getattr(student, 'student_profile', None)
+        yield [
+            student.id,
+            student.username,
+            student.email,
+            student.first_name,
+            student.last_name,
+            profile.level.name if profile and profile.level else '',
+            profile.major.name if profile and profile.major else '',
+            profile.phone_number if profile else '',
+            'Oui' if student.is_active else 'Non',
+            _format_date(student.date_joined)
+        ]
+
+
+@export_source('documents', 'documents', [
+    'ID', 'Titre', 'Matière', 'Type', 'Actif', 'Téléchargements',
+    'Consultations', 'Créé par', 'Date de création'
+])
+def document_rows(filters):
+    from courses.models import Document
+
+    queryset = Document.objects.select_related('subject', 'created_by').order_by('id')
+
+    if filters.get('subject'):
+        queryset = queryset.filter(subject_id=filters['subject'])
+    if filters.get('is_active') is not None:
+        queryset = queryset.filter(is_active=str(filters['is_active']).lower() == 'true')
+
+    for document in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            document.id,
+            document.title,
+            document.subject.name,
+            document.get_document_type_display(),
+            'Oui' if document.is_active else 'Non',
+            document.download_count,
+            document.view_count,
+            document.created_by.get_full_name() if document.created_by else '',
+            _format_date(document.created_at)
+        ]
+
+
+@export_source('quiz_attempts', 'tentatives_quiz', [
+    'ID', 'Étudiant', 'Email', 'Quiz', 'Matière', 'Tentative',
+    'Statut', 'Score', 'Début', 'Fin'
+])
+def quiz_attempt_rows(filters):
+    from courses.models import QuizAttempt
+
+    queryset = QuizAttempt.objects.select_related(
+        'user', 'quiz', 'quiz__subject'
+    ).order_by('id')
+
+    if filters.get('quiz'):
+        queryset = queryset.filter(quiz_id=filters['quiz'])
+    if filters.get('subject'):
+        queryset = queryset.filter(quiz__subject_id=filters['subject'])
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+
+    for attempt in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            attempt.id,
+            attempt.user.get_full_name() or attempt.user.username,
+            attempt.user.email,
+            attempt.quiz.title,
+            attempt.quiz.subject.name,
+            attempt.attempt_number,
+            attempt.get_status_display(),
+            attempt.score if attempt.score is not None else '',
+            _format_date(attempt.started_at),
+            _format_date(attempt.completed_at)
+        ]
+
+
+@export_source('activity', 'activite', [
+    'ID', 'Utilisateur', 'Action', 'Document', 'Matière', 'Date', 'Adresse IP'
+])
+def activity_rows(filters):
+    from courses.models import UserActivity
+
+    queryset = UserActivity.objects.select_related(
+        'user', 'document', 'subject'
+    ).order_by('created_at', 'id')
+
+    if filters.get('days'):
+        since = timezone.now() - timedelta(days=int(filters['days']))
+        queryset = queryset.filter(created_at__gte=since)
+    if filters.get('subject'):
+        queryset = queryset.filter(subject_id=filters['subject'])
+    if filters.get('action'):
+        queryset = queryset.filter(action=filters['action'])
+
+    for activity in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            activity.id,
+            activity.user.username,
+            activity.get_action_display(),
+            activity.document.title,
+            activity.subject.name,
+            _format_date(activity.created_at),
+            activity.ip_address or ''
+        ]
+
+
+@export_source('quiz_statistics', 'quiz_statistics', [
+    'Quiz', 'Matière', 'Total tentatives', 'Complétées',
+    'Note moyenne (/20)', 'Taux de réussite (%)'
+], delimiter=';')
+def quiz_statistics_rows(filters):
+    """
+    Mêmes règles que les tableaux de bord (courses.analytics) : note moyenne
+    sur 20, réussite si score*100/total_points >= passing_percentage.
+    Une requête agrégée par lot de EXPORT_CHUNK_SIZE quiz.
+    """
+    from courses.analytics import quiz_performance_by_quiz
+    from courses.models import Quiz
+
+    queryset = Quiz.objects.order_by('id')
+    if filters.get('quiz_ids'):
+        queryset = queryset.filter(id__in=filters['quiz_ids'])
+    if filters.get('subject'):
+        queryset = queryset.filter(subject_id=filters['subject'])
+
+    quizzes = queryset.values_list('id', 'title', 'subject__name').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    empty = {'total_attempts': 0, 'completed_attempts': 0, 'average_score': 0, 'pass_rate': 0}
+
+    while True:
+        chunk = list(islice(quizzes, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        performance = quiz_performance_by_quiz([quiz_id for quiz_id, _, _ in chunk])
+        for quiz_id, title, subject_name in chunk:
+            stats = performance.get(quiz_id, empty)
+            yield [
+                title,
+                subject_name,
+                stats['total_attempts'],
+                stats['completed_attempts'],
+                f"{stats['average_score']:.2f}",
+                f"{stats['pass_rate']:.1f}"
+            ]
+
+
+# ========================================
+# FORMATS
+# ========================================
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne écrite"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(source, filters):
+    """Lignes CSV encodées une par une (BOM UTF-8 pour Excel)"""
+    writer = csv.writer(_Echo(), delimiter=source.delimiter)
+    yield '\ufeff'
+    yield writer.writerow(source.headers)
+    for row in source.rows(filters):
+        yield writer.writerow(row)
+
+
+def write_xlsx(source, filters, fileobj):
+    """Classeur XLSX en mode write-only : les lignes ne restent pas en mémoire"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("L'export XLSX nécessite openpyxl (pip install openpyxl)")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=source.name[:31])
+    sheet.append(source.headers)
+    for row in source.rows(filters):
+        sheet.append(row)
+    workbook.save(fileobj)
+
+
+def _filename(source, export_format):
+    return f"{source.filename}_{timezone.now():%Y%m%d_%H%M%S}.{export_format}"
+
+
+# ========================================
+# POINTS D'ENTRÉE
+# ========================================
+
+def stream_export(source_name, filters, export_format='csv'):
+    """
+    Réponse HTTP d'export.
+    CSV : flux ligne par ligne. XLSX : fichier temporaire sur disque, envoyé par morceaux.
+    """
+    source = get_source(source_name, export_format)
+    filename = _filename(source, export_format)
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(
+            iter_csv(source, filters),
+            content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(source, filters, tmp)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def get_export_storage():
+    """Stockage privé des exports (non servi par MEDIA_URL)"""
+    return FileSystemStorage(location=settings.EXPORTS_ROOT, base_url=None)
+
+
+def write_export(source_name, filters, export_format='csv'):
+    """
+    Écrire l'export dans le stockage privé (tâche Celery).
+    Le nom contient un jeton aléatoire : il n'est pas devinable.
+
+    Returns:
+        str: Nom du fichier dans get_export_storage()
+    """
+    source = get_source(source_name, export_format)
+    name = _filename(source, export_format).replace(
+        f'.{export_format}', f'_{secrets.token_urlsafe(16)}.{export_format}'
+    )
+    storage = get_export_storage()
+
+    with tempfile.TemporaryFile() as tmp:
+        if export_format == 'csv':
+            for chunk in iter_csv(source, filters):
+                tmp.write(chunk.encode('utf-8'))
+        else:
+            write_xlsx(source, filters, tmp)
+
+        tmp.seek(0)
+        name = storage.save(name, File(tmp))
+
+    logger.info(f"📦 Export {source_name} ({export_format}) écrit: {name}")
+    return name
+
+
+def open_export(name):
+    """
+    Réponse de téléchargement d'un export écrit par write_export()
+
+    Raises:
+        ExportError: Nom invalide ou fichier expiré
+    """
+    storage = get_export_storage()
+    if not name or os.path.basename(name) != name or not storage.exists(name):
+        raise ExportError("Export introuvable ou expiré")
+
+    content_type = XLSX_CONTENT_TYPE if name.endswith('.xlsx') else 'text/csv; charset=utf-8'
+    return FileResponse(storage.open(name), as_attachment=True, filename=name, content_type=content_type)
+
+
+def delete_expired_exports(max_age_hours=None):
+    """
+    Supprimer les exports plus anciens que EXPORT_RETENTION_HOURS
+
+    Returns:
+        int: nombre de fichiers supprimés
+    """
+    if max_age_hours is None:
+        max_age_hours = getattr(settings, 'EXPORT_RETENTION_HOURS', 24)
+
+    storage = get_export_storage()
+    if not os.path.isdir(storage.location):
+        return 0
+
+    limit = timezone.now() - timedelta(hours=max_age_hours)
+    deleted = 0
+    for name in storage.listdir('')[1]:
+        if storage.get_modified_time(name) < limit:
+            storage.delete(name)
+            deleted += 1
+
+    if deleted:
+        logger.info(f"🗑️ {deleted} export(s) expiré(s) supprimé(s)")
+    return deleted
@@ -0,0 +1,125 @@
+# courses/services/grading.py
+"""
+Correction d'une tentative de quiz en une passe.
+
+1. Barème : snapshot en cache par version (services/answer_keys.py)
+2. grade_answers() : validation et notation en mémoire (masques de bits)
+3. submit_attempt() : écriture dans une seule transaction
+   (StudentAnswer et choix sélectionnés en bulk_create)
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from courses.services import answer_keys
+
+logger = logging.getLogger(__name__)
+
+
+class GradingError(ValueError):
+    """Réponses soumises invalides pour ce quiz"""
+
+
+def _as_id(value, label):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise GradingError(f"{label} invalide: {value!r}")
+
+
+def grade_answers(answer_key, answers_data):
+    """
+    Noter les réponses en mémoire
+
+    Args:
+        answer_key: Snapshot du barème (answer_keys.get_answer_key)
+        answers_data: [{'question_id': 1, 'selected_choices': [1, 2]}, ...]
+
+    Returns:
+        tuple: (score total, [(question_id, choix sélectionnés, correct, points)])
+    """
+    questions = {question.id: question for question in answer_key.questions}
+    total_score = 0
+    graded = []
+    seen = set()
+
+    if not isinstance(answers_data, list):
+        raise GradingError("Le champ 'answers' doit être une liste")
+
+    for answer_data in answers_data:
+        if not isinstance(answer_data, dict):
+            raise GradingError("Chaque réponse doit contenir question_id et selected_choices")
+
+        question_id = _as_id(answer_data.get('question_id'), 'Question')
+        selected = frozenset(
+            _as_id(choice_id, 'Choix') for choice_id in answer_data.get('selected_choices') or []
+        )
+
+        question = questions.get(question_id)
+        if question is None:
+            raise GradingError(f"La question {question_id} n'appartient pas à ce quiz")
+        if question_id in seen:
+            raise GradingError(f"Réponse en double pour la question {question_id}")
+        mask = answer_keys.selection_mask(question, selected)
+        if mask is None:
+            raise GradingError(f"Choix invalides pour la question {question_id}")
+        seen.add(question_id)
+
+        is_correct = mask == question.correct_mask
+        points_earned = question.points if is_correct else 0
+        total_score += points_earned
+
+        graded.append((question_id, selected, is_correct, points_earned))
+
+    return total_score, graded
+
+
+def submit_attempt(attempt, answers_data, answer_key=None):
+    """
+    Corriger et clôturer une tentative en cours (une transaction)
+
+    Raises:
+        GradingError: Réponses invalides ou tentative déjà soumise
+    """
+    from courses.models import QuizAttempt, StudentAnswer
+
+    if answer_key is None:
+        answer_key = answer_keys.get_answer_key(attempt.quiz)
+
+    total_score, graded = grade_answers(answer_key, answers_data)
+
+    with transaction.atomic():
+        # Verrou : deux soumissions simultanées de la même tentative
+        locked = QuizAttempt.objects.select_for_update().filter(
+            pk=attempt.pk,
+            status='IN_PROGRESS'
+        ).exists()
+        if not locked:
+            raise GradingError("Cette tentative a déjà été soumise")
+
+        answers = StudentAnswer.objects.bulk_create([
+            StudentAnswer(
+                attempt=attempt,
+                question_id=question_id,
+                is_correct=is_correct,
+                points_earned=points_earned
+            )
+            for question_id, _, is_correct, points_earned in graded
+        ])
+
+        Through = StudentAnswer.selected_choices.through
+        Through.objects.bulk_create([
+            Through(studentanswer_id=answer.id, choice_id=choice_id)
+            for answer, (_, selected, _, _) in zip(answers, graded)
+            for choice_id in selected
+        ])
+
+        attempt.score = total_score
+        attempt.status = 'COMPLETED'
+        attempt.completed_at = timezone.now()
+        attempt.answer_key_version = answer_key.version
+        attempt.save(update_fields=['score', 'status', 'completed_at', 'answer_key_version'])
+
+    logger.info(f"📝 Tentative {attempt.pk} corrigée: {len(graded)} réponse(s), score {total_score}")
+    return attempt
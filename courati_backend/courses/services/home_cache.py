@@ -0,0 +1,71 @@
+# courses/services/home_cache.py
+"""
+Cache de la page d'accueil étudiant (PersonalizedHomeView).
+
+La réponse assemblée est mise en cache par étudiant, sous une clé qui contient :
+- la version de la cohorte (niveau, filière) : matières, documents récents
+  (partagée avec le programme, voir services/curriculum.py)
+- la version de l'utilisateur : favoris, progression, profil
+
+Invalider = incrémenter une version ; les anciennes entrées expirent seules.
+Les signaux de courses/signals.py appellent bump_user() et curriculum.bump_*().
+"""
+import logging
+
+from django.core.cache import cache
+
+from courses.services.curriculum import cohort_version_key
+
+logger = logging.getLogger(__name__)
+
+HOME_CACHE_TIMEOUT = 15 * 60
+
+
+def _user_version_key(user_id):
+    return f'home:user_version:{user_id}'
+
+
+def _bump(key):
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def _payload_key(student_profile):
+    """Clé du payload pour les versions actuelles (une lecture cache)"""
+    cohort_key = cohort_version_key(student_profile.level_id, student_profile.major_id)
+    user_key = _user_version_key(student_profile.user_id)
+    versions = cache.get_many([cohort_key, user_key])
+
+    return (
+        f'home:payload:{student_profile.user_id}:'
+        f'{student_profile.level_id}:{student_profile.major_id}:'
+        f'{versions.get(cohort_key, 0)}:{versions.get(user_key, 0)}'
+    )
+
+
+def get_home_payload(student_profile):
+    """
+    Payload en cache pour cet étudiant
+
+    Returns:
+        tuple: (clé des versions actuelles, payload ou None si absent ou périmé)
+        La clé est à repasser à set_home_payload() : calculée AVANT la
+        construction du payload, une invalidation survenue pendant celle-ci
+        ne peut pas enregistrer un payload périmé sous la nouvelle version.
+    """
+    key = _payload_key(student_profile)
+    return key, cache.get(key)
+
+
+def set_home_payload(key, payload):
+    cache.set(key, payload, timeout=HOME_CACHE_TIMEOUT)
+
+
+# ========================================
+# INVALIDATION
+# ========================================
+
+def bump_user(user_id):
+    """Favoris, progression ou profil de l'étudiant modifiés"""
+    _bump(_user_version_key(user_id))
+
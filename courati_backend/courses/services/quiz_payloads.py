@@ -0,0 +1,59 @@
+# courses/services/quiz_payloads.py
+"""
+Corps JSON du quiz servi par QuizViewSet.start, en cache.
+
+Le rendu de QuizDetailSerializer (questions et choix, sans les bonnes
+réponses) est identique pour tous les étudiants : il est mis en cache sous
+forme d'octets JSON déjà encodés, puis inséré tel quel dans la réponse.
+Seule la partie propre à la tentative est sérialisée à chaque requête.
+
+Clé : quiz + version du barème (services/answer_keys.py) + date de
+modification du quiz et de sa matière. Toute modification crée donc une
+nouvelle clé ; les anciennes expirent seules.
+"""
+import logging
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+QUIZ_PAYLOAD_CACHE_TIMEOUT = 60 * 60
+
+
+def _payload_key(quiz):
+    return (
+        f'quiz:start_payload:{quiz.pk}:{quiz.answer_key_version}:'
+        f'{quiz.updated_at.timestamp()}:{quiz.subject.updated_at.timestamp()}'
+    )
+
+
+def get_quiz_body(quiz):
+    """Octets JSON de QuizDetailSerializer pour ce quiz (cache, sinon rendu)"""
+    from courses.serializers import QuizDetailSerializer
+
+    key = _payload_key(quiz)
+    body = cache.get(key)
+    if body is None:
+        body = JSONRenderer().render(QuizDetailSerializer(quiz).data)
+        cache.set(key, body, timeout=QUIZ_PAYLOAD_CACHE_TIMEOUT)
+    return body
+
+
+def start_response(quiz, attempt_data, status=200, message=None):
+    """
+    Réponse de démarrage : {'message'?, 'attempt', 'quiz'}
+    La partie tentative est encodée ici, le corps du quiz vient du cache.
+    """
+    head = {'message': message} if message else {}
+    head['attempt'] = attempt_data
+
+    # '{...}' → '{...,"quiz":<corps en cache>}'
+    content = b''.join([
+        JSONRenderer().render(head)[:-1],
+        b',"quiz":',
+        get_quiz_body(quiz),
+        b'}'
+    ])
+    return HttpResponse(content, status=status, content_type='application/json')
@@ -0,0 +1,174 @@
+# courses/signals.py
+import logging
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from accounts.models import StudentProfile, TeacherAssignment
+from .models import (
+    Choice, Document, Question, Quiz, QuizAttempt, Subject, UserActivity, UserFavorite, UserProgress
+)
+from .services import answer_keys, curriculum, home_cache
+from .services.activity_rollup import increment_rollup
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+# ========================================
+# AGRÉGATS D'ACTIVITÉ JOURNALIÈRE
+# ========================================
+
+@receiver(post_save, sender=UserActivity)
+def rollup_user_activity(sender, instance, created, **kwargs):
+    """Comptabiliser une consultation/téléchargement/favori dans le rollup"""
+    if not created:
+        return
+
+    increment_rollup(
+        date=timezone.localdate(instance.created_at),
+        action=instance.action,
+        subject_id=instance.subject_id,
+        is_student=instance.user.role == 'STUDENT'
+    )
+
+
+@receiver(post_save, sender=QuizAttempt)
+def rollup_quiz_attempt(sender, instance, created, **kwargs):
+    """Comptabiliser une nouvelle tentative de quiz dans le rollup"""
+    if not created:
+        return
+
+    increment_rollup(
+        date=timezone.localdate(instance.started_at),
+        action='quiz_attempt',
+        subject_id=instance.quiz.subject_id,
+        is_student=instance.user.role == 'STUDENT'
+    )
+
+
+@receiver(post_save, sender=Document)
+def rollup_new_document(sender, instance, created, **kwargs):
+    """Comptabiliser un nouveau document dans le rollup"""
+    if not created:
+        return
+
+    increment_rollup(
+        date=timezone.localdate(instance.created_at),
+        action='new_document',
+        subject_id=instance.subject_id
+    )
+
+
+@receiver(post_save, sender=User)
+def rollup_new_student(sender, instance, created, **kwargs):
+    """Comptabiliser une inscription étudiante dans le rollup"""
+    if not created or instance.role != 'STUDENT':
+        return
+
+    increment_rollup(
+        date=timezone.localdate(instance.date_joined),
+        action='new_student',
+        is_student=True
+    )
+
+
+# ========================================
+# TOTAUX DÉNORMALISÉS DES QUIZ
+# ========================================
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def sync_quiz_question_stats(sender, instance, **kwargs):
+    """Maintenir Quiz.total_points et Quiz.question_count à jour"""
+    Quiz.refresh_question_stats([instance.quiz_id])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_answer_key_for_question(sender, instance, **kwargs):
+    """Question ajoutée, modifiée ou supprimée : nouvelle version du barème en cache"""
+    answer_keys.bump_answer_keys(quiz_ids=[instance.quiz_id])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def bump_answer_key_for_choice(sender, instance, **kwargs):
+    """Choix ajouté, modifié ou supprimé : nouvelle version du barème en cache"""
+    answer_keys.bump_answer_keys(question_ids=[instance.question_id])
+
+
+# ========================================
+# PROGRAMME DES COHORTES + CACHE D'ACCUEIL
+# ========================================
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=TeacherAssignment)
+@receiver(post_delete, sender=TeacherAssignment)
+def invalidate_cohorts_for_subject_content(sender, instance, **kwargs):
+    """Document, quiz ou assignation de professeur ajouté, modifié ou supprimé"""
+    curriculum.bump_subject_cohorts([instance.subject_id])
+
+
+@receiver(post_save, sender=Subject)
+def invalidate_cohorts_for_subject(sender, instance, **kwargs):
+    """Matière modifiée (nom, ordre, mise en avant, activation...)"""
+    curriculum.bump_subject_cohorts([instance.id])
+
+
+@receiver(pre_delete, sender=Subject)
+def remember_cohorts_of_deleted_subject(sender, instance, **kwargs):
+    """Niveaux/filières lus avant la suppression (les liens M2M disparaissent avec elle)"""
+    instance._cohort_pairs = curriculum.subject_cohorts([instance.id])
+
+
+@receiver(post_delete, sender=Subject)
+def invalidate_cohorts_for_deleted_subject(sender, instance, **kwargs):
+    """Matière supprimée : invalider les cohortes qui la contenaient"""
+    curriculum.bump_cohort_pairs(getattr(instance, '_cohort_pairs', ()))
+
+
+@receiver(m2m_changed, sender=Subject.levels.through)
+@receiver(m2m_changed, sender=Subject.majors.through)
+def invalidate_cohorts_for_subject_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """Matière ajoutée ou retirée d'un niveau / d'une filière"""
+    if action not in ('pre_clear', 'post_add', 'post_remove'):
+        return
+
+    if reverse:
+        # instance est un niveau ou une filière ; pk_set, les matières ajoutées
+        # ou retirées (après post_remove, elles ne sont plus dans subject_set)
+        subjects = Subject.objects.filter(Q(id__in=pk_set or ()) | Q(id__in=instance.subject_set.all()))
+        if sender is Subject.levels.through:
+            curriculum.bump_cohorts([instance.id], subjects.values_list('majors', flat=True))
+        else:
+            curriculum.bump_cohorts(subjects.values_list('levels', flat=True), [instance.id])
+        return
+
+    level_ids = list(instance.levels.values_list('id', flat=True))
+    major_ids = list(instance.majors.values_list('id', flat=True))
+    if sender is Subject.levels.through:
+        level_ids += list(pk_set or [])
+    else:
+        major_ids += list(pk_set or [])
+    curriculum.bump_cohorts(level_ids, major_ids)
+
+
+@receiver(post_save, sender=UserFavorite)
+@receiver(post_delete, sender=UserFavorite)
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+def invalidate_home_for_user_data(sender, instance, **kwargs):
+    """Favoris ou progression de l'étudiant modifiés"""
+    home_cache.bump_user(instance.user_id)
+
+
+@receiver(post_save, sender=StudentProfile)
+def invalidate_home_for_profile(sender, instance, **kwargs):
+    """Profil modifié (changement de niveau / filière, vérification...)"""
+    home_cache.bump_user(instance.user_id)
@@ -0,0 +1,141 @@
+# 📁 courati_backend/courses/tasks.py
+
+from celery import shared_task
+from celery.signals import worker_shutting_down
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='courses.tasks.rebuild_daily_activity_rollup')
+def rebuild_daily_activity_rollup(days=2):
+    """
+    ✨ TÂCHE AUTOMATIQUE
+    Recalcule les agrégats d'activité des `days` derniers jours
+    pour corriger toute dérive des compteurs incrémentaux
+    """
+    from .services.activity_rollup import rebuild_rollup
+
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=days - 1)
+
+    logger.info(f"📊 [CELERY] Recalcul du rollup d'activité du {start_date} au {end_date}...")
+
+    rows = rebuild_rollup(start_date, end_date)
+
+    logger.info(f"✅ [CELERY] Rollup d'activité recalculé: {rows} lignes")
+
+    return {
+        'success': True,
+        'rows': rows,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+    }
+
+
+@shared_task(name='courses.tasks.flush_document_counters')
+def flush_document_counters():
+    """
+    ✨ TÂCHE AUTOMATIQUE
+    Reporte sur Document les consultations / téléchargements
+    accumulés dans le cache
+    """
+    from .services.document_counters import flush_document_counters as flush
+
+    updated = flush()
+
+    if updated:
+        logger.info(f"✅ [CELERY] Compteurs de {updated} document(s) reportés")
+
+    return {
+        'success': True,
+        'documents_updated': updated or 0,
+    }
+
+
+@shared_task(name='courses.tasks.flush_activity_events')
+def flush_activity_events():
+    """
+    ✨ TÂCHE AUTOMATIQUE
+    Persiste par lots les activités (consultations, téléchargements, favoris)
+    mises en file par les vues
+    """
+    from .services.activity_ingest import flush_activity_events as flush
+
+    saved = flush()
+
+    return {
+        'success': True,
+        'activities_saved': saved,
+    }
+
+
+@shared_task(name='courses.tasks.maintain_activity_partitions')
+def maintain_activity_partitions(months_ahead=3):
+    """
+    ✨ TÂCHE AUTOMATIQUE
+    Crée les partitions mensuelles à venir de UserActivity
+    et applique la politique de rétention
+    """
+    from .services.activity_partitions import apply_retention, ensure_partitions
+
+    created = ensure_partitions(months_ahead=months_ahead)
+    retired = apply_retention()
+
+    logger.info(f"🧱 [CELERY] Partitions d'activité: {len(created)} créée(s), {len(retired)} retirée(s)")
+
+    return {
+        'success': True,
+        'created': created,
+        'retired': retired,
+    }
+
+
+@shared_task(name='courses.tasks.run_export')
+def run_export(source_name, filters=None, export_format='csv'):
+    """
+    Export administrateur volumineux écrit dans le stockage privé des exports
+    (voir services/exports.py) ; téléchargement via la vue admin
+    """
+    from .services.exports import write_export
+
+    logger.info(f"📦 [CELERY] Export {source_name} ({export_format}) en cours...")
+
+    path = write_export(source_name, filters or {}, export_format)
+
+    return {
+        'success': True,
+        'source': source_name,
+        'format': export_format,
+        'path': path,
+    }
+
+
+@shared_task(name='courses.tasks.delete_expired_exports')
+def delete_expired_exports():
+    """
+    ✨ TÂCHE AUTOMATIQUE
+    Supprime les exports plus anciens que EXPORT_RETENTION_HOURS
+    """
+    from .services.exports import delete_expired_exports as delete_expired
+
+    deleted = delete_expired()
+
+    return {
+        'success': True,
+        'deleted_count': deleted,
+    }
+
+
+@worker_shutting_down.connect
+def drain_activity_events(**kwargs):
+    """Vider la file d'activités avant l'arrêt du worker"""
+    from .services.activity_ingest import flush_activity_events as flush
+
+    try:
+        saved = flush()
+        logger.info(f"🛑 [CELERY] Arrêt du worker: {saved} activité(s) enregistrée(s)")
+    except Exception as e:
+        logger.error(f"❌ [CELERY] Échec du vidage de la file d'activités: {e}")
@@ -1,3 +1,301 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import Level, Major, StudentProfile, TeacherAssignment, User
+from .models import Choice, Document, Question, Quiz, QuizAttempt, StudentAnswer, Subject, UserActivity
+from .serializers import QuizCreateUpdateSerializer, bulk_create_questions
+from .services import answer_keys
+from .services.grading import GradingError, grade_answers, submit_attempt
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TeacherSubjectsViewQueryCountTest(TestCase):
+    """Le nombre de requêtes de TeacherSubjectsView ne dépend pas du nombre de matières"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.level = Level.objects.create(code='L1', name='Licence 1')
+        cls.major = Major.objects.create(code='INFO', name='Informatique')
+
+        for index in range(3):
+            student = User.objects.create_user(
+                username=f'student{index}',
+                email=f'student{index}@example.com',
+                password='password',
+                role='STUDENT'
+            )
+            StudentProfile.objects.create(
+                user=student,
+                phone_number=f'+2220000000{index}',
+                level=cls.level,
+                major=cls.major
+            )
+        cls.student = student
+
+    def _create_teacher(self, username, subject_count):
+        teacher = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password',
+            role='TEACHER'
+        )
+
+        for index in range(subject_count):
+            subject = Subject.objects.create(name=f'{username} {index}', code=f'{username}-{index}')
+            subject.levels.add(self.level)
+            subject.majors.add(self.major)
+            TeacherAssignment.objects.create(teacher=teacher, subject=subject)
+
+            # bulk_create : pas de signaux de notification
+            documents = Document.objects.bulk_create([
+                Document(subject=subject, title=f'Doc {n}', file=f'documents/{username}-{index}-{n}.pdf')
+                for n in range(2)
+            ])
+            Quiz.objects.bulk_create([Quiz(subject=subject, title='Quiz')])
+            UserActivity.objects.bulk_create([
+                UserActivity(user=self.student, document=documents[0], subject=subject, action='view'),
+                UserActivity(user=self.student, document=documents[0], subject=subject, action='view'),
+                UserActivity(user=self.student, document=documents[1], subject=subject, action='download'),
+            ])
+
+        return teacher
+
+    def _get_subjects(self, teacher):
+        client = APIClient()
+        client.force_authenticate(user=teacher)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('courses:teacher-subjects'))
+
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries.captured_queries)
+
+    def test_query_count_is_constant(self):
+        one_subject = self._create_teacher('teacher1', 1)
+        many_subjects = self._create_teacher('teacher5', 5)
+
+        data, single_count = self._get_subjects(one_subject)
+        self.assertEqual(data['total_subjects'], 1)
+
+        data, many_count = self._get_subjects(many_subjects)
+        self.assertEqual(data['total_subjects'], 5)
+
+        self.assertEqual(single_count, many_count)
+
+    def test_statistics(self):
+        teacher = self._create_teacher('teacher', 2)
+
+        data, _ = self._get_subjects(teacher)
+
+        for subject_data in data['subjects']:
+            self.assertEqual(subject_data['statistics'], {
+                'total_documents': 2,
+                'total_quizzes': 1,
+                'total_students': 3,
+                'total_views': 2,
+                'total_downloads': 1,
+            })
+            self.assertEqual(subject_data['subject']['levels'], [{'id': self.level.id, 'name': 'Licence 1'}])
+            self.assertTrue(subject_data['permissions']['can_edit_content'])
+
+
+def _create_quiz(subject):
+    """Quiz de 2 questions : QCM (2 points) et choix multiples (3 points)"""
+    # bulk_create : pas de signaux de notification
+    quiz = Quiz.objects.bulk_create([Quiz(subject=subject, title='Quiz')])[0]
+    bulk_create_questions(quiz, [
+        {
+            'text': 'QCM', 'question_type': 'QCM', 'points': 2, 'order': 1,
+            'choices': [
+                {'text': 'A', 'is_correct': True, 'order': 1},
+                {'text': 'B', 'is_correct': False, 'order': 2},
+            ],
+        },
+        {
+            'text': 'Multiple', 'question_type': 'MULTIPLE', 'points': 3, 'order': 2,
+            'choices': [
+                {'text': 'C', 'is_correct': True, 'order': 1},
+                {'text': 'D', 'is_correct': True, 'order': 2},
+                {'text': 'E', 'is_correct': False, 'order': 3},
+            ],
+        },
+    ])
+    quiz.update_question_stats()
+    return quiz
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QuizGradingTest(TestCase):
+    """Correction d'une tentative (services/grading.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            username='student',
+            email='student@example.com',
+            password='password',
+            role='STUDENT'
+        )
+        cls.quiz = _create_quiz(Subject.objects.create(name='Algèbre', code='ALG'))
+
+    def setUp(self):
+        self.answer_key = answer_keys.get_answer_key(self.quiz)
+        self.qcm, self.multiple = self.quiz.questions.prefetch_related('choices')
+        self.a, self.b = self.qcm.choices.all()
+        self.c, self.d, self.e = self.multiple.choices.all()
+
+    def _answers(self, qcm_choices, multiple_choices):
+        return [
+            {'question_id': self.qcm.id, 'selected_choices': [choice.id for choice in qcm_choices]},
+            {'question_id': self.multiple.id, 'selected_choices': [choice.id for choice in multiple_choices]},
+        ]
+
+    def test_correct_answers(self):
+        score, graded = grade_answers(self.answer_key, self._answers([self.a], [self.c, self.d]))
+
+        self.assertEqual(score, 5)
+        self.assertEqual([is_correct for _, _, is_correct, _ in graded], [True, True])
+
+    def test_partial_selection_earns_no_points(self):
+        score, graded = grade_answers(self.answer_key, self._answers([self.a], [self.c]))
+
+        self.assertEqual(score, 2)
+        self.assertEqual(graded[1][2:], (False, 0))
+
+    def test_invalid_answers_are_rejected(self):
+        invalid_answers = [
+            # Choix d'une autre question
+            self._answers([self.c], [self.d]),
+            # Question d'un autre quiz
+            [{'question_id': 0, 'selected_choices': [self.a.id]}],
+            # Réponse en double
+            self._answers([self.a], [self.c])[:1] * 2,
+            # Identifiant non numérique
+            [{'question_id': self.qcm.id, 'selected_choices': ['abc']}],
+        ]
+
+        for answers in invalid_answers:
+            with self.subTest(answers=answers), self.assertRaises(GradingError):
+                grade_answers(self.answer_key, answers)
+
+    def test_submit_attempt(self):
+        attempt = QuizAttempt.objects.create(user=self.student, quiz=self.quiz, attempt_number=1)
+
+        submit_attempt(attempt, self._answers([self.b], [self.c, self.d]))
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, 'COMPLETED')
+        self.assertEqual(attempt.score, 3)
+        self.assertEqual(attempt.answer_key_version, self.quiz.answer_key_version)
+
+        answers = {answer.question_id: answer for answer in attempt.answers.prefetch_related('selected_choices')}
+        self.assertFalse(answers[self.qcm.id].is_correct)
+        self.assertEqual({choice.id for choice in answers[self.multiple.id].selected_choices.all()},
+                         {self.c.id, self.d.id})
+
+    def test_duplicate_submit_is_rejected(self):
+        attempt = QuizAttempt.objects.create(user=self.student, quiz=self.quiz, attempt_number=1)
+        stale = QuizAttempt.objects.get(pk=attempt.pk)
+
+        submit_attempt(attempt, self._answers([self.a], [self.c, self.d]))
+
+        # Instance chargée avant la première soumission (requête concurrente)
+        with self.assertRaises(GradingError):
+            submit_attempt(stale, self._answers([self.a], [self.c, self.d]))
+
+        self.assertEqual(StudentAnswer.objects.filter(attempt=attempt).count(), 2)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QuizQuestionSyncTest(TestCase):
+    """Mise à jour différentielle des questions et choix d'un quiz (_QuestionSync)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Analyse', code='ANA')
+
+    def setUp(self):
+        self.quiz = _create_quiz(self.subject)
+
+    def _payload(self, quiz):
+        """Barème actuel au format de l'API"""
+        return [
+            {
+                'id': question.id,
+                'text': question.text,
+                'question_type': question.question_type,
+                'points': question.points,
+                'order': question.order,
+                'choices': [
+                    {'id': choice.id, 'text': choice.text, 'is_correct': choice.is_correct, 'order': choice.order}
+                    for choice in question.choices.all()
+                ],
+            }
+            for question in quiz.questions.prefetch_related('choices')
+        ]
+
+    def _save(self, questions):
+        serializer = QuizCreateUpdateSerializer(self.quiz, data={'questions': questions}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def test_update_create_and_delete(self):
+        qcm, multiple = self._payload(self.quiz)
+        kept_choice, removed_choice = qcm['choices']
+        version = self.quiz.answer_key_version
+
+        qcm['points'] = 4
+        kept_choice['text'] = 'A modifié'
+        qcm['choices'] = [kept_choice, {'text': 'F', 'is_correct': False, 'order': 3}]
+        new_question = {
+            'text': 'Vrai ou faux ?', 'question_type': 'TRUE_FALSE', 'points': 1, 'order': 3,
+            'choices': [
+                {'text': 'Vrai', 'is_correct': True, 'order': 1},
+                {'text': 'Faux', 'is_correct': False, 'order': 2},
+            ],
+        }
+
+        quiz = self._save([qcm, new_question])
+
+        questions = list(quiz.questions.prefetch_related('choices'))
+        self.assertEqual([question.text for question in questions], ['QCM', 'Vrai ou faux ?'])
+        self.assertEqual(questions[0].id, qcm['id'])
+        self.assertEqual(questions[0].points, 4)
+        self.assertFalse(Question.objects.filter(id=multiple['id']).exists())
+        choices = list(questions[0].choices.all())
+        self.assertEqual([choice.text for choice in choices], ['A modifié', 'F'])
+        self.assertEqual(choices[0].id, kept_choice['id'])
+        self.assertFalse(Choice.objects.filter(id=removed_choice['id']).exists())
+        self.assertEqual(questions[1].choices.count(), 2)
+
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.total_points, 5)
+        self.assertEqual(quiz.question_count, 2)
+        self.assertGreater(quiz.answer_key_version, version)
+
+    def test_unchanged_questions_keep_answer_key_version(self):
+        version = self.quiz.answer_key_version
+
+        quiz = self._save(self._payload(self.quiz))
+
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.answer_key_version, version)
+        self.assertEqual(quiz.question_count, 2)
+
+    def test_foreign_ids_are_rejected(self):
+        other_question = self._payload(_create_quiz(self.subject))[0]
+        qcm, multiple = self._payload(self.quiz)
+        foreign_choice = {**qcm, 'choices': [other_question['choices'][0], qcm['choices'][1]]}
+
+        for questions in ([other_question, multiple], [foreign_choice, multiple], [qcm, qcm]):
+            with self.subTest(questions=questions):
+                serializer = QuizCreateUpdateSerializer(self.quiz, data={'questions': questions}, partial=True)
+                self.assertFalse(serializer.is_valid())
+                self.assertIn('questions', serializer.errors)
+
+        self.assertEqual(self.quiz.questions.count(), 2)
@@ -83,6 +83,11 @@ urlpatterns = [
     path('admin/quizzes/', views.AdminQuizListCreateView.as_view(), name='admin-quizzes'),
     path('admin/quizzes/<int:quiz_id>/', views.AdminQuizDetailView.as_view(), name='admin-quiz-detail'),
     path('admin/quizzes/<int:quiz_id>/toggle-active/', views.AdminQuizToggleActiveView.as_view(), name='admin-quiz-toggle-active'),
+
+    # APIs ADMIN - Exports (CSV en flux / XLSX, ou tâche Celery)
+    path('admin/exports/jobs/<str:task_id>/', views.AdminExportJobView.as_view(), name='admin-export-job'),
+    path('admin/exports/jobs/<str:task_id>/download/', views.AdminExportDownloadView.as_view(), name='admin-export-download'),
+    path('admin/exports/<str:source_name>/', views.AdminExportView.as_view(), name='admin-export'),
     
     # ========================================
     # APIs QUIZ & PROJETS - ViewSets
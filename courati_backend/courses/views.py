@@ -1,15 +1,21 @@
 # courses/views.py
 
+import json
 import logging
-from django.db.models import Q, Count, Avg, Max, Sum, F
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Count, Avg, Max, Sum, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from datetime import datetime, timedelta
 
 from rest_framework import status, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
 
 from accounts.models import StudentProfile, Level, Major
 from .models import (
@@ -68,8 +74,20 @@ from accounts.permissions import (
     TeacherSubjectPermission, has_subject_access,
     can_upload_document, get_teacher_subjects,
     can_manage_students, can_delete_document,
+    can_access_subject, can_access_document, can_access_quiz,
     IsAdminPermission  
 )
+from config.pagination import cursor_requested, paginate_request
+from config.query_profiler import query_budget
+
+from .services.activity_rollup import get_daily_counts
+from .services import curriculum, home_cache
+from .services.activity_ingest import record_activity
+from .services.document_counters import apply_buffered_counts, increment_document_counter
+from .services.exports import ExportError, get_source as get_export_source, open_export, stream_export
+from .services import answer_keys, grading, quiz_payloads
+from .services.grading import GradingError
+from .analytics import quiz_performance, quiz_performance_by, subject_quiz_performance
 
 logger = logging.getLogger(__name__)
 
@@ -101,30 +119,33 @@ class StudentSubjectsView(APIView):
                     'suggestion': 'Complétez votre profil dans les paramètres'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Filtrer les matières selon le niveau et la filière de l'étudiant
+            # Programme de la cohorte (niveau, filière), partagé et mis en cache
+            cohort = curriculum.get_student_curriculum(student_profile)
+            
             subjects = Subject.objects.filter(
-                levels=user_level,
-                majors=user_major,
-                is_active=True
-            ).prefetch_related('levels', 'majors').annotate(
-                document_count=Count('documents', filter=Q(documents__is_active=True))
-            ).order_by('order', 'name')
+                id__in=cohort['subject_ids']
+            ).prefetch_related('levels', 'majors').order_by('order', 'name')
             
             # Paramètres de filtrage optionnels
             is_featured = request.GET.get('featured', None)
             if is_featured and is_featured.lower() == 'true':
                 subjects = subjects.filter(is_featured=True)
             
+            subjects = list(subjects)
+            for subject in subjects:
+                subject.document_count = cohort['document_counts'].get(subject.id, 0)
+            
             # Récupérer les favoris de l'utilisateur
             user_favorites = UserFavorite.objects.filter(
                 user=user,
                 favorite_type='SUBJECT',
-                subject__in=subjects
+                subject_id__in=[subject.id for subject in subjects]
             ).values_list('subject_id', flat=True)
             
             serializer = SubjectSimpleSerializer(subjects, many=True, context={
                 'request': request,
-                'user_favorites': list(user_favorites)
+                'user_favorites': list(user_favorites),
+                'assigned_teachers': cohort['teachers']
             })
             
             return Response({
@@ -133,7 +154,7 @@ class StudentSubjectsView(APIView):
                     'level': user_level.name,
                     'major': user_major.name,
                 },
-                'total_subjects': subjects.count(),
+                'total_subjects': len(subjects),
                 'subjects': serializer.data,
                 'filters_applied': {
                     'featured_only': is_featured
@@ -169,12 +190,10 @@ class SubjectDocumentsView(APIView):
             student_profile = user.student_profile
             
             # Vérifier que l'étudiant peut accéder à cette matière
-            subject = Subject.objects.get(
-                id=subject_id,
-                levels=student_profile.level,
-                majors=student_profile.major,
-                is_active=True
-            )
+            if not can_access_subject(user, subject_id):
+                raise Subject.DoesNotExist
+            
+            subject = Subject.objects.get(id=subject_id)
             
             # Récupérer les documents de la matière
             documents = Document.objects.filter(
@@ -253,19 +272,43 @@ class UserFavoritesView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        """Récupérer tous les favoris de l'utilisateur"""
+        """Récupérer les favoris de l'utilisateur (pagination par curseur)"""
         user = request.user
         
         favorites = UserFavorite.objects.filter(user=user).select_related(
             'subject', 'document', 'document__subject'
-        ).order_by('-created_at')
+        )
+        
+        # Sans ?cursor= : tous les favoris (contrat des clients existants)
+        if not cursor_requested(request):
+            serializer = UserFavoriteSerializer(favorites.order_by('-created_at', '-id'), many=True)
+            return Response({
+                'success': True,
+                'total_favorites': len(serializer.data),
+                'favorites': serializer.data
+            })
+        
+        try:
+            favorites, pagination = paginate_request(
+                request,
+                favorites,
+                ('-created_at', '-id'),
+                default_page_size=100
+            )
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'error': 'Paramètres de pagination invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = UserFavoriteSerializer(favorites, many=True)
         
         return Response({
             'success': True,
-            'total_favorites': favorites.count(),
-            'favorites': serializer.data
+            'total_favorites': pagination['total'],
+            'favorites': serializer.data,
+            'pagination': pagination
         })
 
     def post(self, request):
@@ -287,7 +330,7 @@ class UserFavoritesView(APIView):
                 if favorite:
                     favorite.delete()
                     # Enregistrer l'activité
-                    UserActivity.objects.create(
+                    record_activity(
                         user=user,
                         document=document,
                         subject=document.subject,
@@ -306,7 +349,7 @@ class UserFavoritesView(APIView):
                         document=document
                     )
                     # Enregistrer l'activité
-                    UserActivity.objects.create(
+                    record_activity(
                         user=user,
                         document=document,
                         subject=document.subject,
@@ -343,17 +386,13 @@ class DocumentDownloadView(APIView):
         try:
             student_profile = user.student_profile
             
-            # Vérifier l'accès au document
-            document = Document.objects.select_related('subject').get(
-                id=document_id,
-                is_active=True,
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major,
-                subject__is_active=True
-            )
+            # Vérifier l'accès au document (matières actives de la cohorte, en cache)
+            document = Document.objects.select_related('subject').get(id=document_id)
+            if not can_access_document(user, document):
+                raise Document.DoesNotExist
             
             # Enregistrer l'activité de téléchargement
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 document=document,
                 subject=document.subject,
@@ -362,9 +401,8 @@ class DocumentDownloadView(APIView):
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
             
-            # Incrémenter le compteur de téléchargements
-            document.download_count += 1
-            document.save(update_fields=['download_count'])
+            # Incrémenter le compteur de téléchargements (reporté en BDD par lots)
+            increment_document_counter(document.id, 'download_count')
             
             # Mettre à jour la progression
             progress, created = UserProgress.objects.get_or_create(
@@ -447,14 +485,22 @@ class PersonalizedHomeView(APIView):
                     'redirect_to': 'profile_completion'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            # ✅ Réponse en cache (invalidée par les signaux, voir services/home_cache.py)
+            cache_key, cached_payload = home_cache.get_home_payload(student_profile)
+            if cached_payload is not None:
+                return Response(cached_payload)
+            
+            # Programme de la cohorte (niveau, filière), partagé et mis en cache
+            cohort = curriculum.get_student_curriculum(student_profile)
+            subject_ids = cohort['subject_ids']
+            documents_per_subject = cohort['document_counts']
+            
             # Matières recommandées pour ce profil
-            recommended_subjects = Subject.objects.filter(
-                levels=student_profile.level,
-                majors=student_profile.major,
-                is_active=True
-            ).prefetch_related('levels', 'majors').annotate(
-                document_count=Count('documents', filter=Q(documents__is_active=True))
-            ).order_by('-is_featured', 'order')[:6]
+            recommended_subjects = list(Subject.objects.filter(
+                id__in=subject_ids
+            ).prefetch_related('levels', 'majors').order_by('-is_featured', 'order')[:6])
+            for subject in recommended_subjects:
+                subject.document_count = documents_per_subject.get(subject.id, 0)
             
             # Matières en cours (avec progression)
             in_progress_subjects = Subject.objects.filter(
@@ -464,8 +510,7 @@ class PersonalizedHomeView(APIView):
             
             # Documents récents pour ce profil
             recent_documents = Document.objects.filter(
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major,
+                subject_id__in=subject_ids,
                 is_active=True
             ).select_related('subject').order_by('-created_at')[:5]
             
@@ -478,36 +523,19 @@ class PersonalizedHomeView(APIView):
             # ✅ STATISTIQUES GLOBALES CORRIGÉES
             # ========================================
             
-            total_subjects = Subject.objects.filter(
-                levels=student_profile.level,
-                majors=student_profile.major,
-                is_active=True
-            ).count()
+            total_subjects = len(subject_ids)
 
-            # ✅ Total de documents disponibles (actifs uniquement)
-            total_documents = Document.objects.filter(
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major,
-                subject__is_active=True,
-                is_active=True  # ✅ Documents actifs uniquement
-            ).count()
-
-            # ✅ Documents consultés (exclure les documents supprimés)
-            viewed_documents = UserProgress.objects.filter(
-                user=user,
-                document__is_active=True,  # ✅ CORRECTION : Exclure documents supprimés
-                status__in=['IN_PROGRESS', 'COMPLETED']
-            ).values('document').distinct().count()
-
-            # ✅ SÉCURITÉ : Limiter viewed_documents au maximum de total_documents
-            viewed_documents = min(viewed_documents, total_documents)
-
-            # ✅ Calcul de la progression réelle (limitée à 100%)
-            if total_documents > 0:
-                completion_rate = round((viewed_documents / total_documents) * 100, 1)
-                completion_rate = min(completion_rate, 100.0)  # ✅ Limiter à 100%
-            else:
-                completion_rate = 0.0
+            # ✅ Documents actifs consultés par matière (une requête groupée)
+            viewed_per_subject = dict(
+                UserProgress.objects.filter(
+                    user=user,
+                    subject_id__in=subject_ids,
+                    document__is_active=True,  # ✅ Exclure documents supprimés
+                    status__in=['IN_PROGRESS', 'COMPLETED']
+                ).values('subject_id').annotate(
+                    viewed=Count('document', distinct=True)
+                ).order_by().values_list('subject_id', 'viewed')
+            )
 
             # ========================================
             # ✅ PROGRESSION PAR MATIÈRE CORRIGÉE
@@ -515,38 +543,21 @@ class PersonalizedHomeView(APIView):
             
             subject_progress = {}
             completed_subjects = 0
+            total_documents = 0
+            viewed_documents = 0
 
-            for subject in Subject.objects.filter(
-                levels=student_profile.level,
-                majors=student_profile.major,
-                is_active=True
-            ):
-                # ✅ Compter uniquement les documents actifs
-                subject_docs = Document.objects.filter(
-                    subject=subject,
-                    is_active=True
-                ).count()
+            for subject_id in subject_ids:
+                subject_docs = documents_per_subject.get(subject_id, 0)
                 
                 if subject_docs > 0:
-                    # ✅ CORRECTION CRITIQUE : Exclure les documents supprimés
-                    viewed_in_subject = UserProgress.objects.filter(
-                        user=user,
-                        subject=subject,
-                        document__is_active=True,  # ✅ AJOUT : Exclure documents supprimés
-                        status__in=['IN_PROGRESS', 'COMPLETED']
-                    ).values('document').distinct().count()
-                    
                     # ✅ SÉCURITÉ : Limiter à subject_docs (évite 3/2 = 150%)
-                    viewed_in_subject = min(viewed_in_subject, subject_docs)
+                    viewed_in_subject = min(viewed_per_subject.get(subject_id, 0), subject_docs)
                     
-                    # ✅ Calculer le taux de progression pour cette matière
-                    subject_rate = round((viewed_in_subject / subject_docs) * 100, 1)
-                    
-                    # ✅ SÉCURITÉ : Assurer que le taux ne dépasse jamais 100%
-                    subject_rate = min(subject_rate, 100.0)
+                    # ✅ Calculer le taux de progression pour cette matière (max 100%)
+                    subject_rate = min(round((viewed_in_subject / subject_docs) * 100, 1), 100.0)
                     
                     # ✅ Stocker dans le dictionnaire
-                    subject_progress[str(subject.id)] = {
+                    subject_progress[str(subject_id)] = {
                         'viewed_documents': viewed_in_subject,
                         'total_documents': subject_docs,
                         'completion_rate': subject_rate,
@@ -556,6 +567,15 @@ class PersonalizedHomeView(APIView):
                     # Compter les matières complétées à 100%
                     if viewed_in_subject == subject_docs:
                         completed_subjects += 1
+                    
+                    total_documents += subject_docs
+                    viewed_documents += viewed_in_subject
+
+            # ✅ Calcul de la progression réelle (limitée à 100%)
+            if total_documents > 0:
+                completion_rate = min(round((viewed_documents / total_documents) * 100, 1), 100.0)
+            else:
+                completion_rate = 0.0
 
             # ========================================
             # FAVORIS
@@ -584,13 +604,16 @@ class PersonalizedHomeView(APIView):
                 },
                 # ✅ Progression détaillée par matière
                 'subject_progress': subject_progress
-            })
+            }, context={'assigned_teachers': cohort['teachers']})
             
-            return Response({
+            payload = {
                 'success': True,
                 'personalized': True,
                 'data': serializer.data
-            })
+            }
+            home_cache.set_home_payload(cache_key, payload)
+            
+            return Response(payload)
             
         except StudentProfile.DoesNotExist:
             return Response({
@@ -637,39 +660,61 @@ class UserHistoryView(APIView):
             activities = UserActivity.objects.filter(
                 user=user,
                 created_at__gte=since_date
-            ).select_related('document', 'subject').order_by('-created_at')
+            ).select_related('document', 'subject')
             
             # Filtrer par type d'action si spécifié
             action_filter = request.GET.get('action')
             if action_filter and action_filter in ['download', 'view', 'favorite', 'unfavorite']:
                 activities = activities.filter(action=action_filter)
             
-            # Limiter le nombre de résultats
-            limit = int(request.GET.get('limit', 100))
-            activities = activities[:limit]
+            if cursor_requested(request):
+                # Pagination par curseur (?limit= reste accepté comme taille de page)
+                page, pagination = paginate_request(
+                    request,
+                    activities,
+                    ('-created_at', '-id'),
+                    default_page_size=100
+                )
+                total, limit = pagination['total'], pagination['page_size']
+            else:
+                # Contrat historique : les `limit` activités les plus récentes
+                limit = int(request.GET.get('limit', 100))
+                page = list(activities.order_by('-created_at', '-id')[:limit])
+                pagination, total = None, len(page)
             
-            serializer = UserActivitySerializer(activities, many=True)
+            serializer = UserActivitySerializer(page, many=True)
             
             # Statistiques rapides
             stats = {
                 'total_downloads': UserActivity.objects.filter(user=user, action='download').count(),
                 'total_views': UserActivity.objects.filter(user=user, action='view').count(),
                 'total_favorites': UserFavorite.objects.filter(user=user).count(),
-                'last_activity': activities.first().created_at if activities.exists() else None
+                'last_activity': activities.order_by('-created_at').values_list(
+                    'created_at', flat=True
+                ).first()
             }
             
-            return Response({
+            response_data = {
                 'success': True,
                 'history': serializer.data,
-                'total': activities.count(),
+                'total': total,
                 'stats': stats,
                 'filters': {
                     'days': days_ago,
                     'action': action_filter,
                     'limit': limit
                 }
-            })
+            }
+            if pagination is not None:
+                response_data['pagination'] = pagination
+            return Response(response_data)
             
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'message': 'Paramètres de pagination invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"❌ Erreur récupération historique: {str(e)}")
             return Response({
@@ -695,14 +740,10 @@ class DocumentViewTrackingView(APIView):
         try:
             student_profile = user.student_profile
             
-            # Vérifier l'accès au document
-            document = Document.objects.select_related('subject').get(
-                id=document_id,
-                is_active=True,
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major,
-                subject__is_active=True
-            )
+            # Vérifier l'accès au document (matières actives de la cohorte, en cache)
+            document = Document.objects.select_related('subject').get(id=document_id)
+            if not can_access_document(user, document):
+                raise Document.DoesNotExist
             
             # Générer l'URL de visualisation
             if document.file:
@@ -750,17 +791,13 @@ class DocumentViewTrackingView(APIView):
         try:
             student_profile = user.student_profile
             
-            # Vérifier l'accès au document
-            document = Document.objects.select_related('subject').get(
-                id=document_id,
-                is_active=True,
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major,
-                subject__is_active=True
-            )
+            # Vérifier l'accès au document (matières actives de la cohorte, en cache)
+            document = Document.objects.select_related('subject').get(id=document_id)
+            if not can_access_document(user, document):
+                raise Document.DoesNotExist
             
             # Enregistrer l'activité de consultation
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 document=document,
                 subject=document.subject,
@@ -769,10 +806,9 @@ class DocumentViewTrackingView(APIView):
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
             
-            # Incrémenter le compteur de vues (si le champ existe)
-            if hasattr(document, 'view_count'):
-                document.view_count += 1
-                document.save(update_fields=['view_count'])
+            # Incrémenter le compteur de vues (reporté en BDD par lots)
+            increment_document_counter(document.id, 'view_count')
+            apply_buffered_counts([document])
             
             # Mettre à jour la progression si nécessaire
             progress, created = UserProgress.objects.get_or_create(
@@ -947,11 +983,12 @@ class DocumentConsultationHistoryView(APIView):
 from accounts.permissions import (
     IsTeacherUser, IsAdminOrTeacher, HasSubjectAccess,
     TeacherSubjectPermission, has_subject_access,
-    can_upload_document, get_teacher_subjects
+    can_upload_document, can_edit_subject_content, get_teacher_subjects
 )
 from .serializers import TeacherSubjectSerializer
 
 
+@query_budget(12)
 class TeacherSubjectsView(APIView):
     """Liste des matières assignées à un professeur"""
     permission_classes = [IsTeacherUser]
@@ -961,44 +998,73 @@ class TeacherSubjectsView(APIView):
         logger.info(f"👨‍🏫 Matières du professeur: {user.username}")
         
         try:
-            # Récupérer les matières assignées
-            subjects = get_teacher_subjects(user)
+            # Récupérer les matières assignées (niveaux et filières préchargés)
+            subjects = list(
+                get_teacher_subjects(user).prefetch_related('levels', 'majors')
+            )
+            subject_ids = [subject.id for subject in subjects]
+            
+            # ✅ Une requête groupée par métrique pour toutes les matières
+            document_counts = dict(
+                Document.objects.filter(
+                    subject_id__in=subject_ids
+                ).values('subject_id').annotate(
+                    total=Count('id')
+                ).values_list('subject_id', 'total')
+            )
+            
+            quiz_counts = dict(
+                Quiz.objects.filter(
+                    subject_id__in=subject_ids
+                ).values('subject_id').annotate(
+                    total=Count('id')
+                ).values_list('subject_id', 'total')
+            )
+            
+            activity_counts = {
+                (subject_id, action): total
+                for subject_id, action, total in UserActivity.objects.filter(
+                    subject_id__in=subject_ids,
+                    action__in=['view', 'download']
+                ).values('subject_id', 'action').annotate(
+                    total=Count('id')
+                ).values_list('subject_id', 'action', 'total')
+            }
+            
+            # Étudiants par cohorte (niveau, filière) ; un profil n'a qu'un
+            # niveau et une filière, donc la somme par matière reste distincte
+            level_ids = {level.id for subject in subjects for level in subject.levels.all()}
+            major_ids = {major.id for subject in subjects for major in subject.majors.all()}
+            cohort_counts = {
+                (level_id, major_id): total
+                for level_id, major_id, total in StudentProfile.objects.filter(
+                    level_id__in=level_ids,
+                    major_id__in=major_ids
+                ).values('level_id', 'major_id').annotate(
+                    total=Count('id')
+                ).values_list('level_id', 'major_id', 'total')
+            }
             
             # Construction manuelle avec toutes les stats
             subjects_data = []
             
             for subject in subjects:
-                # Documents
-                total_documents = Document.objects.filter(subject=subject).count()
-                
-                # Quiz
-                total_quizzes = Quiz.objects.filter(subject=subject).count()
-                
-                # Étudiants
-                from accounts.models import StudentProfile
-                student_profiles = StudentProfile.objects.filter(
-                    level__in=subject.levels.all(),
-                    major__in=subject.majors.all()
-                ).distinct()
-                total_students = student_profiles.count()
-                
-                # Vues et téléchargements
-                total_views = UserActivity.objects.filter(
-                    subject=subject,
-                    action='view'
-                ).count()
+                levels = list(subject.levels.all())
+                majors = list(subject.majors.all())
                 
-                total_downloads = UserActivity.objects.filter(
-                    subject=subject,
-                    action='download'
-                ).count()
+                total_documents = document_counts.get(subject.id, 0)
+                total_quizzes = quiz_counts.get(subject.id, 0)
+                total_students = sum(
+                    cohort_counts.get((level.id, major.id), 0)
+                    for level in levels
+                    for major in majors
+                )
+                total_views = activity_counts.get((subject.id, 'view'), 0)
+                total_downloads = activity_counts.get((subject.id, 'download'), 0)
                 
                 # LOG DEBUG
                 logger.info(f"📊 {subject.name}: docs={total_documents}, quiz={total_quizzes}, students={total_students}")
                 
-                # ✅ CORRECTION : Import uniquement ce qui existe
-                from accounts.permissions import can_edit_subject_content
-                
                 # ✅ Permissions simplifiées
                 # Un professeur peut toujours uploader des documents sur ses matières
                 can_upload = True  # Par défaut, le professeur peut uploader
@@ -1012,8 +1078,8 @@ class TeacherSubjectsView(APIView):
                         'description': subject.description,
                         'is_active': subject.is_active,
                         'is_featured': subject.is_featured,
-                        'levels': [{'id': l.id, 'name': l.name} for l in subject.levels.all()],
-                        'majors': [{'id': m.id, 'name': m.name} for m in subject.majors.all()],
+                        'levels': [{'id': l.id, 'name': l.name} for l in levels],
+                        'majors': [{'id': m.id, 'name': m.name} for m in majors],
                         'created_at': subject.created_at,
                         'updated_at': subject.updated_at
                     },
@@ -1025,6 +1091,7 @@ class TeacherSubjectsView(APIView):
                         'total_downloads': total_downloads
                     },
                     'permissions': {
+                        # Matrice de permissions en cache, sans requête par matière
                         'can_edit_content': can_edit_subject_content(user, subject),
                         'can_upload_documents': can_upload  # ✅ Simplifié
                     }
@@ -1054,16 +1121,36 @@ class TeacherSubjectsView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class TeacherSubjectStudentsView(APIView):
-    """Liste des étudiants d'une matière pour un professeur"""
+    """
+    Liste des étudiants d'une matière pour un professeur
+    
+    GET /api/courses/teacher/subjects/{id}/students/
+        ?ordering=name|completion_rate|-completion_rate
+        ?page_size=50&cursor=...  (pagination par curseur, optionnelle)
+    
+    Sans pagination, les grandes cohortes sont renvoyées en flux (streaming).
+    """
     permission_classes = [IsTeacherUser]
     
+    ORDERINGS = {
+        'name': ('user__last_name', 'user__first_name', 'user_id'),
+        # Même nombre de documents pour tous : trier sur les documents vus
+        'completion_rate': ('viewed_documents', 'user_id'),
+        '-completion_rate': ('-viewed_documents', 'user_id'),
+    }
+    STREAM_THRESHOLD = 500
+    STREAM_CHUNK_SIZE = 500
+    
     def get(self, request, subject_id):
         user = request.user
         logger.info(f"👥 Étudiants matière {subject_id} par prof: {user.username}")
         
         try:
             # Vérifier l'accès à la matière
-            subject = Subject.objects.get(id=subject_id, is_active=True)
+            subject = Subject.objects.prefetch_related('levels', 'majors').get(
+                id=subject_id,
+                is_active=True
+            )
             
             if not has_subject_access(user, subject):
                 return Response({
@@ -1071,70 +1158,122 @@ class TeacherSubjectStudentsView(APIView):
                 }, status=status.HTTP_403_FORBIDDEN)
             
             # Vérifier la permission de gestion étudiants
-            from accounts.permissions import can_manage_students
             if not can_manage_students(user, subject):
                 return Response({
                     'error': 'Vous n\'avez pas la permission de voir les étudiants'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # Récupérer les étudiants concernés par cette matière
+            ordering_key = request.query_params.get('ordering', 'name')
+            ordering = self.ORDERINGS.get(ordering_key)
+            if ordering is None:
+                return Response({
+                    'error': 'Tri invalide',
+                    'allowed': list(self.ORDERINGS)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Étudiants concernés par cette matière
             students = StudentProfile.objects.filter(
-                level__in=subject.levels.all(),
-                major__in=subject.majors.all()
-            ).select_related('user', 'level', 'major')
-            
-            # Enrichir avec les progressions
-            students_data = []
-            for student in students:
-                # Progression dans cette matière
-                progress_docs = UserProgress.objects.filter(
-                    user=student.user,
-                    subject=subject
-                )
-                
-                total_docs = Document.objects.filter(
-                    subject=subject,
-                    is_active=True
-                ).count()
-                
-                viewed_docs = progress_docs.filter(
-                    status__in=['IN_PROGRESS', 'COMPLETED']
-                ).count()
-                
-                students_data.append({
-                    'id': student.user.id,
-                    'full_name': student.user.get_full_name(),
-                    'email': student.user.email,
-                    'level': student.level.name if student.level else None,
-                    'major': student.major.name if student.major else None,
-                    'progress': {
-                        'total_documents': total_docs,
-                        'viewed_documents': viewed_docs,
-                        'completion_rate': round((viewed_docs / total_docs * 100) if total_docs > 0 else 0, 1)
-                    }
-                })
+                level_id__in=[level.id for level in subject.levels.all()],
+                major_id__in=[major.id for major in subject.majors.all()]
+            )
+            total_students = students.count()
             
-            return Response({
+            # Une seule requête de comptage des documents
+            total_docs = Document.objects.filter(
+                subject=subject,
+                is_active=True
+            ).count()
+            
+            # Documents vus par étudiant : agrégat UserProgress groupé par utilisateur
+            viewed_documents = UserProgress.objects.filter(
+                user_id=OuterRef('user_id'),
+                subject=subject,
+                status__in=['IN_PROGRESS', 'COMPLETED']
+            ).values('user_id').annotate(total=Count('id')).values('total')
+            
+            students = students.select_related('user', 'level', 'major').annotate(
+                viewed_documents=Coalesce(Subquery(viewed_documents), 0)
+            )
+            
+            response_data = {
                 'success': True,
                 'subject': {
                     'id': subject.id,
                     'name': subject.name,
                     'code': subject.code
                 },
-                'total_students': len(students_data),
-                'students': students_data
-            })
+                'total_students': total_students,
+                'ordering': ordering_key,
+            }
+            
+            # Pagination par curseur
+            if 'cursor' in request.query_params or 'page_size' in request.query_params:
+                page, pagination = paginate_request(request, students, ordering, total='none')
+                pagination['total'] = total_students
+                response_data['students'] = [
+                    self._student_data(student, total_docs) for student in page
+                ]
+                response_data['next_cursor'] = pagination['next_cursor']
+                response_data['pagination'] = pagination
+                return Response(response_data)
+            
+            students = students.order_by(*ordering)
+            
+            # Grandes cohortes : flux JSON construit au fil du curseur serveur
+            if total_students > self.STREAM_THRESHOLD:
+                logger.info(f"🌊 Streaming de {total_students} étudiants (matière {subject.code})")
+                return StreamingHttpResponse(
+                    self._stream_students(response_data, students, total_docs),
+                    content_type='application/json'
+                )
+            
+            response_data['students'] = [
+                self._student_data(student, total_docs) for student in students
+            ]
+            return Response(response_data)
             
         except Subject.DoesNotExist:
             return Response({
                 'error': 'Matière non trouvée'
             }, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({
+                'error': 'Paramètres invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"❌ Erreur étudiants matière {subject_id}: {str(e)}")
             return Response({
                 'error': 'Erreur serveur',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @staticmethod
+    def _student_data(student, total_docs):
+        viewed_docs = student.viewed_documents
+        return {
+            'id': student.user.id,
+            'full_name': student.user.get_full_name(),
+            'email': student.user.email,
+            'level': student.level.name if student.level else None,
+            'major': student.major.name if student.major else None,
+            'progress': {
+                'total_documents': total_docs,
+                'viewed_documents': viewed_docs,
+                'completion_rate': round((viewed_docs / total_docs * 100) if total_docs > 0 else 0, 1)
+            }
+        }
+    
+    def _stream_students(self, response_data, students, total_docs):
+        """Même JSON que la réponse normale, écrit étudiant par étudiant"""
+        header = json.dumps(response_data, cls=DjangoJSONEncoder)
+        yield header[:-1] + ', "students": ['
+        
+        for index, student in enumerate(students.iterator(chunk_size=self.STREAM_CHUNK_SIZE)):
+            row = json.dumps(self._student_data(student, total_docs), cls=DjangoJSONEncoder)
+            yield row if index == 0 else ',' + row
+        
+        yield ']}'
 
 
 class TeacherUploadDocumentView(APIView):
@@ -1315,7 +1454,9 @@ class TeacherSubjectStatisticsView(APIView):
             
             # ✅ TOP DOCUMENTS
             top_documents = []
-            docs = Document.objects.filter(subject=subject).order_by('-view_count')[:5]
+            docs = apply_buffered_counts(
+                Document.objects.filter(subject=subject).order_by('-view_count')[:5]
+            )
             for doc in docs:
                 top_documents.append({
                     'id': doc.id,
@@ -1324,41 +1465,24 @@ class TeacherSubjectStatisticsView(APIView):
                     'downloads': doc.download_count
                 })
             
-            # ✅ PERFORMANCE DES QUIZ
-            quiz_performance = []
-            quizzes = Quiz.objects.filter(subject=subject)
+            # ✅ PERFORMANCE DES QUIZ (une requête groupée par quiz)
+            quiz_stats = quiz_performance_by(
+                QuizAttempt.objects.filter(quiz__subject=subject),
+                'quiz_id',
+                extra_fields=('quiz__title', 'quiz__created_at')
+            )
             
-            for quiz in quizzes:
-                attempts = QuizAttempt.objects.filter(quiz=quiz)
-                completed = attempts.filter(status='COMPLETED')
-                
-                if completed.exists():
-                    # Score moyen normalisé sur 20
-                    scores = []
-                    for attempt in completed:
-                        if quiz.total_points and quiz.total_points > 0:
-                            normalized = (float(attempt.score) / float(quiz.total_points)) * 20
-                            scores.append(normalized)
-                    
-                    avg_score = round(sum(scores) / len(scores), 2) if scores else 0
-                    
-                    # Taux de réussite
-                    passed = 0
-                    for attempt in completed:
-                        if quiz.total_points and quiz.total_points > 0:
-                            percentage = (float(attempt.score) / float(quiz.total_points)) * 100
-                            if percentage >= float(quiz.passing_percentage):
-                                passed += 1
-                    
-                    pass_rate = round((passed / completed.count()) * 100, 1) if completed.count() > 0 else 0
-                    
-                    quiz_performance.append({
-                        'quiz_id': quiz.id,
-                        'quiz_title': quiz.title,
-                        'total_attempts': attempts.count(),
-                        'average_score': avg_score,
-                        'pass_rate': pass_rate
-                    })
+            quiz_performance = [{
+                'quiz_id': quiz_id,
+                'quiz_title': stats['quiz__title'],
+                'total_attempts': stats['total_attempts'],
+                'average_score': stats['average_score'],
+                'pass_rate': stats['pass_rate']
+            } for quiz_id, stats in sorted(
+                quiz_stats.items(),
+                key=lambda item: item[1]['quiz__created_at'],
+                reverse=True
+            ) if stats['completed_attempts'] > 0]
             
             # ✅ LOG POUR DEBUG
             logger.info(f"📊 Stats calculées pour {subject.name}:")
@@ -1424,20 +1548,19 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         """
         user = self.request.user
     
+        quizzes = Quiz.objects.select_related('subject')
+    
         if user.is_staff or user.role == 'ADMIN':
-            return Quiz.objects.all()
+            return quizzes
         elif user.role == 'TEACHER':
             teacher_subjects = get_teacher_subjects(user)
-            return Quiz.objects.filter(subject__in=teacher_subjects)
+            return quizzes.filter(subject__in=teacher_subjects)
         else:
             # ÉTUDIANT : FILTRAGE PAR NIVEAU ET FILIÈRE ACTUELS
             try:
                 student_profile = user.student_profile
-                return Quiz.objects.filter(
-                    is_active=True,
-                    subject__levels=student_profile.level,
-                    subject__majors=student_profile.major
-                ).distinct()
+                cohort = curriculum.get_student_curriculum(student_profile)
+                return quizzes.filter(id__in=cohort['quiz_ids'])
             except AttributeError:
                 return Quiz.objects.none()
     
@@ -1463,12 +1586,17 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Vérifier si l'utilisateur peut passer le quiz
-        attempts_count = QuizAttempt.objects.filter(
-            user=request.user, 
+        # Tentatives de l'utilisateur : nombre + tentative en cours (une requête)
+        attempts = QuizAttempt.objects.filter(
+            user=request.user,
             quiz=quiz
-        ).count()
+        ).aggregate(
+            count=Count('id'),
+            ongoing_id=Max('id', filter=Q(status='IN_PROGRESS'))
+        )
+        attempts_count = attempts['count']
         
+        # Vérifier si l'utilisateur peut passer le quiz
         if attempts_count >= quiz.max_attempts:
             return Response(
                 {'error': f'Vous avez déjà utilisé vos {quiz.max_attempts} tentatives'},
@@ -1490,13 +1618,10 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         # Vérifier s'il y a déjà une tentative en cours
-        ongoing = QuizAttempt.objects.filter(
-            user=request.user,
-            quiz=quiz,
-            status='IN_PROGRESS'
-        ).first()
-        
-        if ongoing:
+        if attempts['ongoing_id']:
+            ongoing = QuizAttempt.objects.get(id=attempts['ongoing_id'])
+            ongoing.quiz = quiz
+            
             # Vérifier si la tentative est expirée (optionnel mais recommandé)
             duration_seconds = quiz.duration_minutes * 60
             elapsed = (timezone.now() - ongoing.started_at).total_seconds()
@@ -1507,15 +1632,12 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
                 ongoing.completed_at = timezone.now()
                 ongoing.save()
             else:
-                # Retourner la tentative en cours AVEC le quiz
-                attempt_serializer = QuizAttemptSerializer(ongoing)
-                quiz_serializer = QuizDetailSerializer(quiz)
-                
-                return Response({
-                    'message': 'Reprise de votre tentative en cours',
-                    'attempt': attempt_serializer.data,
-                    'quiz': quiz_serializer.data
-                })
+                # Retourner la tentative en cours AVEC le quiz (corps en cache)
+                return quiz_payloads.start_response(
+                    quiz,
+                    QuizAttemptSerializer(ongoing).data,
+                    message='Reprise de votre tentative en cours'
+                )
         
         # Créer une nouvelle tentative
         attempt = QuizAttempt.objects.create(
@@ -1526,13 +1648,12 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             started_at=timezone.now()
         )
         
-        attempt_serializer = QuizAttemptSerializer(attempt)
-        quiz_serializer = QuizDetailSerializer(quiz)
-        
-        return Response({
-            'attempt': attempt_serializer.data,
-            'quiz': quiz_serializer.data
-        }, status=status.HTTP_201_CREATED)
+        # Corps du quiz rendu une fois par version, puis servi depuis le cache
+        return quiz_payloads.start_response(
+            quiz,
+            QuizAttemptSerializer(attempt).data,
+            status=status.HTTP_201_CREATED
+        )
     
     @action(detail=True, methods=['post'])
     def submit(self, request, pk=None):
@@ -1562,44 +1683,15 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             status='IN_PROGRESS'
         )
         
-        # Calculer le score
-        total_score = 0
-        
-        for answer_data in answers_data:
-            question_id = answer_data.get('question_id')
-            selected_choice_ids = answer_data.get('selected_choices', [])
-            
-            question = get_object_or_404(Question, id=question_id, quiz=quiz)
-            
-            # Récupérer les bonnes réponses
-            correct_choices = set(
-                question.choices.filter(is_correct=True).values_list('id', flat=True)
-            )
-            selected_choices_set = set(selected_choice_ids)
-            
-            # Vérifier si la réponse est correcte
-            is_correct = correct_choices == selected_choices_set
-            points_earned = question.points if is_correct else 0
-            total_score += points_earned
-            
-            # Enregistrer la réponse
-            student_answer = StudentAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                is_correct=is_correct,
-                points_earned=points_earned
+        # Correction en une passe : barème en cache (snapshot versionné),
+        # réponses écrites en bulk dans une transaction
+        try:
+            grading.submit_attempt(attempt, answers_data, answer_keys.get_answer_key(quiz))
+        except GradingError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # Ajouter les choix sélectionnés
-            if selected_choice_ids:
-                choices = Choice.objects.filter(id__in=selected_choice_ids)
-                student_answer.selected_choices.set(choices)
-        
-        # Mettre à jour la tentative
-        attempt.score = total_score
-        attempt.status = 'COMPLETED'
-        attempt.completed_at = timezone.now()
-        attempt.save()
         
         # Retourner les résultats
         result_serializer = QuizResultSerializer(attempt)
@@ -1623,8 +1715,7 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             student_profile = user.student_profile
             
-            if not (quiz.subject.levels.filter(id=student_profile.level.id).exists() and
-                    quiz.subject.majors.filter(id=student_profile.major.id).exists()):
+            if not can_access_quiz(user, quiz):
                 return Response({
                     'error': 'Ce quiz n\'est pas accessible avec votre filière actuelle',
                     'message': 'Vous avez peut-être changé de filière'
@@ -1674,8 +1765,7 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             student_profile = user.student_profile
             
-            if not (quiz.subject.levels.filter(id=student_profile.level.id).exists() and
-                    quiz.subject.majors.filter(id=student_profile.major.id).exists()):
+            if not can_access_quiz(user, quiz):
                 return Response({
                     'error': 'Ce quiz n\'est pas accessible avec votre filière actuelle'
                 }, status=status.HTTP_403_FORBIDDEN)
@@ -1761,82 +1851,19 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
                     'message': 'Veuillez compléter votre profil (niveau et filière)',
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Récupérer les quiz
+            # Récupérer les quiz (programme de la cohorte en cache)
+            cohort = curriculum.get_student_curriculum(student_profile)
             quizzes = Quiz.objects.filter(
-                is_active=True,
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major
-            ).distinct().select_related('subject')
-            
-            # Récupérer les tentatives en une requête
-            from django.db.models import Max, Count as CountAgg
-            
-            user_attempts = QuizAttempt.objects.filter(
-                user=user,
-                quiz__in=quizzes
-            ).values('quiz_id').annotate(
-                attempts_count=CountAgg('id'),
-                best_score=Max('score'),
-                last_attempt_date=Max('started_at')
-            )
+                id__in=cohort['quiz_ids']
+            ).select_related('subject')
             
-            attempts_dict = {a['quiz_id']: a for a in user_attempts}
-            
-            # Construire la réponse
-            quizzes_data = []
-            
-            for quiz in quizzes:
-                user_data = attempts_dict.get(quiz.id, {})
-                attempts_count = user_data.get('attempts_count', 0)
-                best_score = user_data.get('best_score', None)
-                last_attempt = user_data.get('last_attempt_date', None)
-                
-                # Calculer les points totaux
-                total_points = quiz.total_points or 0
-                question_count = quiz.question_count or 0
-                
-                # Score normalisé
-                best_score_normalized = None
-                best_score_percentage = 0
-                
-                if best_score is not None and total_points > 0:
-                    best_score_normalized = round((float(best_score) / float(total_points)) * 20, 2)
-                    best_score_percentage = round((float(best_score) / float(total_points)) * 100, 1)
-                
-                remaining_attempts = max(0, quiz.max_attempts - attempts_count)
-                
-                # Disponibilité
-                now = timezone.now()
-                is_available = quiz.is_active
-                if quiz.available_from and now < quiz.available_from:
-                    is_available = False
-                if quiz.available_until and now > quiz.available_until:
-                    is_available = False
-                
-                can_attempt = is_available and (attempts_count < quiz.max_attempts)
-                
-                quizzes_data.append({
-                    'id': quiz.id,
-                    'title': quiz.title,
-                    'description': quiz.description,
-                    'subject_name': quiz.subject.name,
-                    'subject_code': quiz.subject.code,
-                    'duration_minutes': quiz.duration_minutes,
-                    'passing_percentage': float(quiz.passing_percentage),
-                    'max_attempts': quiz.max_attempts,
-                    'question_count': question_count,
-                    'total_points': float(total_points),
-                    'is_active': quiz.is_active,
-                    'available_from': quiz.available_from,
-                    'available_until': quiz.available_until,
-                    'user_best_score': best_score_normalized,
-                    'user_attempts_count': attempts_count,
-                    'user_last_attempt': last_attempt,
-                    'best_score_percentage': best_score_percentage,
-                    'remaining_attempts': remaining_attempts,
-                    'is_available': is_available,
-                    'can_attempt': can_attempt
-                })
+            # Tentatives de l'étudiant préchargées en une requête groupée
+            # (voir QuizListListSerializer)
+            quizzes_data = QuizListSerializer(
+                quizzes,
+                many=True,
+                context={'request': request}
+            ).data
             
             return Response({
                 'success': True,
@@ -1906,8 +1933,6 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
         """Récupérer tous les quiz de l'étudiant avec son statut"""
         user = request.user
         
-        print(f"🔍 DEBUG my_quizzes - User: {user.username}")
-        
         if not user.is_student():
             return Response({
                 'error': 'Cette ressource est réservée aux étudiants'
@@ -1915,7 +1940,6 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
         
         try:
             student_profile = user.student_profile
-            print(f"🔍 DEBUG - Level: {student_profile.level}, Major: {student_profile.major}")
             
             if not student_profile.level or not student_profile.major:
                 return Response({
@@ -1923,14 +1947,11 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
                     'message': 'Veuillez compléter votre profil (niveau et filière)',
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Récupérer les quiz
+            # Récupérer les quiz (programme de la cohorte en cache)
+            cohort = curriculum.get_student_curriculum(student_profile)
             quizzes = Quiz.objects.filter(
-                is_active=True,
-                subject__levels=student_profile.level,
-                subject__majors=student_profile.major
-            ).distinct().select_related('subject')
-            
-            print(f"🔍 DEBUG - Quizzes found: {quizzes.count()}")
+                id__in=cohort['quiz_ids']
+            ).select_related('subject')
             
             # Sérialiser
             serializer = QuizListSerializer(
@@ -1938,8 +1959,7 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
                 many=True, 
                 context={'request': request}
             )
-            
-            print(f"🔍 DEBUG - Serialization OK")
+            quizzes_data = serializer.data
             
             return Response({
                 'success': True,
@@ -1947,14 +1967,12 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
                     'level': student_profile.level.name,
                     'major': student_profile.major.name,
                 },
-                'quizzes': serializer.data,
-                'total_quizzes': quizzes.count(),
+                'quizzes': quizzes_data,
+                'total_quizzes': len(quizzes_data),
             })
             
         except Exception as e:
-            print(f"❌ ERROR in my_quizzes: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"❌ Erreur my_quizzes pour {user.username}: {str(e)}", exc_info=True)
             
             return Response({
                 'error': 'Erreur serveur',
@@ -2260,10 +2278,7 @@ class SubjectDetailAPIView(APIView):
                     student_profile = user.student_profile
                     
                     # Vérifier que l'étudiant a accès à cette matière
-                    if not (
-                        subject.levels.filter(id=student_profile.level.id).exists() and
-                        subject.majors.filter(id=student_profile.major.id).exists()
-                    ):
+                    if not can_access_subject(user, subject.id):
                         return Response({
                             'success': False,
                             'error': 'Vous n\'avez pas accès à cette matière'
@@ -2583,7 +2598,9 @@ class AdminSubjectStatisticsView(APIView):
                 documents_by_type[doc_label] = count
             
             # Top 5 documents les plus consultés
-            most_viewed = documents.filter(is_active=True).order_by('-view_count')[:5]
+            most_viewed = apply_buffered_counts(
+                documents.filter(is_active=True).order_by('-view_count')[:5]
+            )
             most_viewed_documents = [{
                 'id': doc.id,
                 'title': doc.title,
@@ -2597,12 +2614,10 @@ class AdminSubjectStatisticsView(APIView):
             total_quizzes = quizzes.count()
             active_quizzes = quizzes.filter(is_active=True).count()
             
-            # Score moyen des quiz
-            completed_attempts = QuizAttempt.objects.filter(
-                quiz__subject=subject,
-                status='COMPLETED'
-            )
-            avg_score = completed_attempts.aggregate(avg=Avg('score'))['avg'] or 0
+            # Score moyen des quiz (normalisé sur 20)
+            avg_score = quiz_performance(
+                QuizAttempt.objects.filter(quiz__subject=subject)
+            )['average_score']
             
             # Étudiants
             from accounts.models import StudentProfile
@@ -2818,7 +2833,7 @@ class AdminQuizListCreateView(APIView):
                     'passing_percentage': float(quiz.passing_percentage),
                     'max_attempts': quiz.max_attempts,
                     'is_active': quiz.is_active,
-                    'question_count': quiz.questions.count(),
+                    'question_count': quiz.question_count,
                     'total_attempts': quiz.attempts.count(),
                     'pass_rate': pass_rate,  # ✅ AJOUTÉ
                     'created_by_name': quiz.created_by.get_full_name() if quiz.created_by else 'Inconnu',
@@ -3390,43 +3405,27 @@ class TeacherDashboardView(APIView):
             # ACTIVITÉ HEBDOMADAIRE (jour par jour)
             # =====================================
 
+            # Lecture des agrégats pré-calculés (une seule requête)
+            week_dates, daily_counts = get_daily_counts(
+                days=7,
+                subject_ids=subject_ids,
+                actions=['view', 'download', 'quiz_attempt']
+            )
+
             weekly_activity = []
 
-            for i in range(6, -1, -1):  # 7 derniers jours (du plus ancien au plus récent)
-                day_start = now - timedelta(days=i)
-                day_start = day_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-                
-                # ✅ Vues du jour (étudiants uniquement)
-                day_views = UserActivity.objects.filter(
-                    subject__in=teacher_subjects,
-                    action='view',
-                    user__role='STUDENT',  # ✅ CORRECT : user__role
-                    created_at__gte=day_start,
-                    created_at__lt=day_end
-                ).count()
-                
-                # ✅ Téléchargements du jour (étudiants uniquement)
-                day_downloads = UserActivity.objects.filter(
-                    subject__in=teacher_subjects,
-                    action='download',
-                    user__role='STUDENT',  # ✅ CORRECT : user__role
-                    created_at__gte=day_start,
-                    created_at__lt=day_end
-                ).count()
-                
-                # Tentatives de quiz du jour
-                day_quiz_attempts = QuizAttempt.objects.filter(
-                    quiz__subject__in=teacher_subjects,
-                    started_at__gte=day_start,
-                    started_at__lt=day_end
-                ).count()
+            for day in week_dates:  # 7 derniers jours (du plus ancien au plus récent)
+                day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+                day_views = daily_counts.get((day, 'view'), {})
+                day_downloads = daily_counts.get((day, 'download'), {})
+                day_quiz_attempts = daily_counts.get((day, 'quiz_attempt'), {})
                 
                 weekly_activity.append({
                     'date': day_start.isoformat(),
-                    'views': day_views,
-                    'downloads': day_downloads,
-                    'quiz_attempts': day_quiz_attempts
+                    # ✅ Vues et téléchargements des étudiants uniquement
+                    'views': day_views.get('student_count', 0),
+                    'downloads': day_downloads.get('student_count', 0),
+                    'quiz_attempts': day_quiz_attempts.get('count', 0)
                 })
 
             logger.info(f"📊 Activité hebdomadaire: {weekly_activity}")
@@ -3455,6 +3454,9 @@ class TeacherDashboardView(APIView):
 
             subject_performance = []
 
+            # Performance des quiz de toutes les matières (une requête groupée)
+            quiz_stats_by_subject = subject_quiz_performance(subject_ids)
+
             for subject in teacher_subjects:
                 # Documents et quiz
                 doc_count = Document.objects.filter(subject=subject).count()
@@ -3485,53 +3487,11 @@ class TeacherDashboardView(APIView):
                     action='download'
                 ).count()
                 
-                quiz_attempts = QuizAttempt.objects.filter(
-                    quiz__subject=subject
-                ).count()
-                
-                # ✅ PERFORMANCE QUIZ CORRIGÉE
-                completed = QuizAttempt.objects.filter(
-                    quiz__subject=subject,
-                    status='COMPLETED'
-                ).select_related('quiz')
-                
-                avg_score = 0
-                pass_rate = 0
-                
-                if completed.exists():
-                    # Score moyen normalisé sur 20
-                    scores = []
-                    passed = 0
-                    total = 0
-                    
-                    for attempt in completed:
-                        quiz = attempt.quiz
-                        
-                        # Vérifier que le quiz a un total_points valide
-                        if quiz.total_points and quiz.total_points > 0:
-                            # ✅ Score normalisé sur 20
-                            normalized_score = (float(attempt.score) / float(quiz.total_points)) * 20
-                            scores.append(normalized_score)
-                            
-                            # ✅ Calculer le pourcentage pour vérifier la réussite
-                            percentage = (float(attempt.score) / float(quiz.total_points)) * 100
-                            
-                            # ✅ Comparer le POURCENTAGE au passing_percentage
-                            if percentage >= float(quiz.passing_percentage):
-                                passed += 1
-                            
-                            total += 1
-                    
-                    # Score moyen
-                    if scores:
-                        avg_score = round(sum(scores) / len(scores), 2)
-                    
-                    # Taux de réussite
-                    if total > 0:
-                        pass_rate = round((passed / total) * 100, 1)
-                    
-                    # ✅ LOG POUR DEBUG
-                    logger.info(f"📊 {subject.name}: {passed}/{total} réussis ({pass_rate}%) - Score moyen: {avg_score}/20")
+                # ✅ PERFORMANCE QUIZ (score moyen /20 et taux de réussite)
+                quiz_stats = quiz_stats_by_subject.get(subject.id, {})
+                quiz_attempts = quiz_stats.get('total_attempts', 0)
+                avg_score = quiz_stats.get('average_score', 0)
+                pass_rate = quiz_stats.get('pass_rate', 0)
                 
                 subject_performance.append({
                     'subject_id': subject.id,
@@ -3949,7 +3909,9 @@ class AdminDocumentListView(APIView):
     """
     Liste de TOUS les documents avec filtres
     GET /api/courses/admin/documents/
-    Filtres disponibles: ?subject=1&teacher=2&type=PDF&is_active=true&search=math&page=1&page_size=20
+    Filtres disponibles: ?subject=1&teacher=2&type=PDF&is_active=true&search=math
+    Pagination par page: ?page=1&page_size=20
+    Pagination par curseur: ?cursor=&page_size=20&total=approx|exact|none
     """
     permission_classes = [IsAdminPermission]
     
@@ -3963,7 +3925,7 @@ class AdminDocumentListView(APIView):
                 'subject', 'created_by'
             ).prefetch_related(
                 'subject__levels', 'subject__majors'
-            ).order_by('-created_at')
+            )
             
             # ===== FILTRES =====
             
@@ -3996,14 +3958,36 @@ class AdminDocumentListView(APIView):
                     Q(description__icontains=search)
                 )
             
-            # ===== PAGINATION =====
+            # ===== PAGINATION PAR CURSEUR (?cursor=, total estimé sans filtre) =====
+            if cursor_requested(request):
+                documents, pagination = paginate_request(
+                    request,
+                    queryset,
+                    ('-created_at', '-id'),
+                    default_page_size=20,
+                    total='approx'
+                )
+                serializer = DocumentSerializer(
+                    documents,
+                    many=True,
+                    context={'request': request}
+                )
+                return Response({
+                    'success': True,
+                    'total': pagination['total'],
+                    'page_size': pagination['page_size'],
+                    'documents': serializer.data,
+                    'pagination': pagination
+                })
+            
+            # ===== PAGINATION PAR PAGE (?page=, contrat historique) =====
             page = int(request.GET.get('page', 1))
             page_size = int(request.GET.get('page_size', 20))
             start = (page - 1) * page_size
             end = start + page_size
             
             total = queryset.count()
-            documents = queryset[start:end]
+            documents = queryset.order_by('-created_at', '-id')[start:end]
             
             # ===== SERIALIZATION =====
             serializer = DocumentSerializer(
@@ -4021,6 +4005,12 @@ class AdminDocumentListView(APIView):
                 'documents': serializer.data
             })
             
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'error': 'Paramètres de pagination invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"❌ Erreur liste documents admin: {str(e)}")
             import traceback
@@ -4209,10 +4199,13 @@ class AdminDocumentBulkActionView(APIView):
             # Exécuter l'action
             if action == 'activate':
                 documents.update(is_active=True)
+                # update() ne déclenche pas post_save : invalider le cache d'accueil
+                curriculum.bump_subject_cohorts(documents.values_list('subject_id', flat=True))
                 message = f'{count} document(s) activé(s)'
                 
             elif action == 'deactivate':
                 documents.update(is_active=False)
+                curriculum.bump_subject_cohorts(documents.values_list('subject_id', flat=True))
                 message = f'{count} document(s) désactivé(s)'
                 
             elif action == 'delete':
@@ -4292,4 +4285,118 @@ class AdminSubjectDocumentsView(APIView):
             return Response({
                 'success': False,
                 'error': 'Erreur serveur'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ========================================
+# ADMIN - EXPORTS
+# ========================================
+
+class AdminExportView(APIView):
+    """
+    Export administrateur : CSV en flux ou XLSX
+    GET /api/courses/admin/exports/{source}/?export_format=csv|xlsx&async=true&<filtres>
+    Sources: students, documents, quiz_attempts, activity, quiz_statistics
+    
+    Avec async=true, l'export est écrit dans le stockage privé par une tâche
+    Celery ; suivre GET /api/courses/admin/exports/jobs/{task_id}/
+    """
+    permission_classes = [IsAdminPermission]
+    source_name = None
+    RESERVED_PARAMS = ('export_format', 'async')
+    
+    def get(self, request, source_name=None):
+        source_name = source_name or self.source_name
+        export_format = request.GET.get('export_format', 'csv')
+        filters = {
+            key: value for key, value in request.GET.items()
+            if key not in self.RESERVED_PARAMS
+        }
+        logger.info(f"📥 Export {source_name} ({export_format}) par admin: {request.user.username}")
+        
+        try:
+            get_export_source(source_name, export_format)
+            
+            if request.GET.get('async', '').lower() == 'true':
+                from .tasks import run_export
+                task = run_export.delay(source_name, filters, export_format)
+                
+                return Response({
+                    'success': True,
+                    'message': 'Export lancé en arrière-plan',
+                    'task_id': task.id,
+                    'status_url': request.build_absolute_uri(
+                        reverse('courses:admin-export-job', args=[task.id])
+                    )
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            return stream_export(source_name, filters, export_format)
+            
+        except ExportError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"❌ Erreur export {source_name}: {str(e)}")
+            return Response({
+                'success': False,
+                'error': 'Erreur serveur',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AdminExportJobView(APIView):
+    """
+    État d'un export lancé en arrière-plan
+    GET /api/courses/admin/exports/jobs/{task_id}/
+    """
+    permission_classes = [IsAdminPermission]
+    
+    def get(self, request, task_id):
+        from celery.result import AsyncResult
+        
+        result = AsyncResult(task_id)
+        data = {
+            'success': True,
+            'task_id': task_id,
+            'status': result.status
+        }
+        
+        if result.successful():
+            data['download_url'] = request.build_absolute_uri(
+                reverse('courses:admin-export-download', args=[task_id])
+            )
+            data['format'] = result.result['format']
+        elif result.failed():
+            data['success'] = False
+            data['error'] = str(result.result)
+        
+        return Response(data)
+
+
+class AdminExportDownloadView(APIView):
+    """
+    Télécharger un export terminé (fichier hors MEDIA_ROOT, admin uniquement)
+    GET /api/courses/admin/exports/jobs/{task_id}/download/
+    """
+    permission_classes = [IsAdminPermission]
+    
+    def get(self, request, task_id):
+        from celery.result import AsyncResult
+        
+        result = AsyncResult(task_id)
+        if not result.successful():
+            return Response({
+                'success': False,
+                'error': 'Export non terminé',
+                'status': result.status
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            return open_export(result.result['path'])
+        except ExportError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
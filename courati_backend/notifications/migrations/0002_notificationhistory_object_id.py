@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationhistory',
+            name='object_id',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name="id de l'objet"),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationhistory',
+            constraint=models.UniqueConstraint(condition=models.Q(('object_id__isnull', False)), fields=('notification_type', 'object_id', 'user'), name='unique_notification_per_object_user'),
+        ),
+    ]
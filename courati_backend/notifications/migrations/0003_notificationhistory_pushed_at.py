@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+def mark_existing_as_pushed(apps, schema_editor):
+    """Les notifications existantes ont déjà été traitées : pas de nouveau push"""
+    NotificationHistory = apps.get_model('notifications', 'NotificationHistory')
+    NotificationHistory.objects.update(pushed_at=models.F('sent_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificationhistory_object_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationhistory',
+            name='pushed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='push envoyé le'),
+        ),
+        migrations.RunPython(mark_existing_as_pushed, migrations.RunPython.noop),
+    ]
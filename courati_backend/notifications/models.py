@@ -160,8 +160,21 @@ class NotificationHistory(models.Model):
         help_text="IDs des documents, quiz, projets, etc."
     )
     
+    # Objet concerné (quiz, document...) : clé d'idempotence des envois groupés
+    object_id = models.PositiveIntegerField(
+        _('id de l\'objet'),
+        null=True,
+        blank=True
+    )
+    
     # Statut
     sent_at = models.DateTimeField(auto_now_add=True)
+    # Push FCM effectué (NULL : push encore à envoyer pour cette ligne)
+    pushed_at = models.DateTimeField(
+        _('push envoyé le'),
+        null=True,
+        blank=True
+    )
     read = models.BooleanField(
         _('lu'),
         default=False
@@ -179,6 +192,14 @@ class NotificationHistory(models.Model):
             models.Index(fields=['user', '-sent_at']),
             models.Index(fields=['user', 'read']),
         ]
+        constraints = [
+            # Une seule notification par (type, objet, utilisateur)
+            models.UniqueConstraint(
+                fields=['notification_type', 'object_id', 'user'],
+                condition=models.Q(object_id__isnull=False),
+                name='unique_notification_per_object_user'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_notification_type_display()} - {self.sent_at.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
@@ -1,11 +1,20 @@
 # notifications/services.py
 import logging
 from firebase_admin import messaging
+from firebase_admin import exceptions as firebase_exceptions
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
-from .models import FCMToken, NotificationHistory
+from .models import FCMToken, NotificationHistory, SubjectPreference
 
 logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# Limite FCM : 500 tokens par envoi multicast
+FCM_MULTICAST_LIMIT = 500
+HISTORY_BATCH_SIZE = 1000
 
 
 def send_push_notification(user, title, body, data=None):
@@ -81,12 +90,12 @@ def send_push_notification(user, title, body, data=None):
             import traceback
             logger.error(f"   Traceback: {traceback.format_exc()}")
             
-            # Si c'est une erreur réseau, on continue
-            if "Connection" in str(type(e).__name__) or "Transport" in str(type(e).__name__):
-                logger.warning(f"⚠️ Erreur réseau temporaire, le token reste actif")
+            # Quota, serveur, réseau, payload... : erreur temporaire, le token reste actif
+            if not _is_invalid_token_error(e):
+                logger.warning(f"⚠️ Erreur temporaire, le token reste actif")
                 continue
             
-            # Pour les autres erreurs, désactiver le token
+            # Token mal formé : désactivation
             logger.warning(f"⚠️ Désactivation du token à cause de l'erreur")
             fcm_token.is_active = False
             fcm_token.save()
@@ -99,6 +108,214 @@ def send_push_notification(user, title, body, data=None):
         return False
 
 
+# ========================================
+# ENVOI EN MASSE (NOUVEAUX CONTENUS)
+# ========================================
+
+def _clean_data(data):
+    """FCM n'accepte que des valeurs string"""
+    if not data:
+        return {}
+    return {key: str(value) if value is not None else '' for key, value in data.items()}
+
+
+def _is_invalid_token_error(exception):
+    """
+    Erreurs FCM pour lesquelles le token doit être désactivé : token
+    désinscrit, d'un autre projet ou mal formé.
+    Les autres erreurs (quota, serveur, réseau, payload trop gros,
+    authentification APNs/Web) sont temporaires ou concernent tout l'envoi :
+    le token reste actif.
+    """
+    if isinstance(exception, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return True
+    if isinstance(exception, firebase_exceptions.InvalidArgumentError):
+        # « The registration token is not a valid FCM registration token »
+        return 'registration token' in str(exception).lower()
+    return False
+
+
+def get_notification_recipients(subject, preference_field):
+    """
+    Étudiants actifs de la matière qui acceptent ce type de notification.
+    Préférences globales et par matière résolues dans la même requête.
+
+    Args:
+        subject: matière concernée
+        preference_field (str): champ de NotificationPreference
+                                ('quiz_enabled', 'new_content_enabled')
+
+    Returns:
+        QuerySet: utilisateurs destinataires
+    """
+    subject_disabled = SubjectPreference.objects.filter(
+        user=OuterRef('pk'),
+        subject=subject,
+        notifications_enabled=False
+    )
+
+    return User.objects.filter(
+        role='STUDENT',
+        is_active=True,
+        student_profile__level__in=subject.levels.all(),
+        student_profile__major__in=subject.majors.all(),
+        notification_preference__notifications_enabled=True,
+        **{f'notification_preference__{preference_field}': True}
+    ).exclude(
+        Exists(subject_disabled)
+    )
+
+
+def create_notification_history(user_ids, notification_type, title, message, data=None, object_id=None):
+    """
+    Enregistrer la notification pour tous les destinataires (bulk_create par lots).
+    
+    Avec object_id, l'opération est idempotente : les utilisateurs ayant déjà
+    une notification (type, objet) sont ignorés.
+
+    Returns:
+        list: ids des utilisateurs pour lesquels une ligne a été créée
+    """
+    user_ids = list(user_ids)
+
+    if object_id is not None:
+        already_notified = set(
+            NotificationHistory.objects.filter(
+                notification_type=notification_type,
+                object_id=object_id,
+                user_id__in=user_ids
+            ).values_list('user_id', flat=True)
+        )
+        user_ids = [user_id for user_id in user_ids if user_id not in already_notified]
+
+    notifications = [
+        NotificationHistory(
+            user_id=user_id,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            data=data,
+            object_id=object_id
+        )
+        for user_id in user_ids
+    ]
+    NotificationHistory.objects.bulk_create(
+        notifications,
+        batch_size=HISTORY_BATCH_SIZE,
+        ignore_conflicts=object_id is not None
+    )
+    return user_ids
+
+
+def send_multicast_notification(user_ids, title, body, data=None):
+    """
+    Envoyer une notification push à plusieurs utilisateurs
+    par envois multicast de FCM_MULTICAST_LIMIT tokens.
+    Les tokens invalides sont désactivés en une seule requête.
+
+    Returns:
+        dict: sent (envois réussis), failed, deactivated (tokens désactivés),
+        unsent_user_ids (utilisateurs d'un envoi multicast en erreur, à renvoyer)
+    """
+    tokens = list(
+        FCMToken.objects.filter(
+            user_id__in=user_ids,
+            is_active=True
+        ).values_list('token', 'user_id')
+    )
+
+    result = {'sent': 0, 'failed': 0, 'deactivated': 0, 'unsent_user_ids': set()}
+    if not tokens:
+        logger.info("⚠️ Aucun token FCM actif pour ces destinataires")
+        return result
+
+    notification = messaging.Notification(title=title, body=body)
+    clean_data = _clean_data(data)
+    invalid_tokens = []
+
+    for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+        batch = tokens[start:start + FCM_MULTICAST_LIMIT]
+        message = messaging.MulticastMessage(
+            notification=notification,
+            data=clean_data,
+            tokens=[token for token, _ in batch],
+        )
+
+        try:
+            response = messaging.send_each_for_multicast(message)
+        except Exception as e:
+            logger.error(f"❌ Erreur envoi multicast ({len(batch)} tokens): {type(e).__name__}: {e}")
+            result['failed'] += len(batch)
+            result['unsent_user_ids'].update(user_id for _, user_id in batch)
+            continue
+
+        result['sent'] += response.success_count
+        result['failed'] += response.failure_count
+
+        for (token, _), send_response in zip(batch, response.responses):
+            if not send_response.success and _is_invalid_token_error(send_response.exception):
+                invalid_tokens.append(token)
+
+    if invalid_tokens:
+        result['deactivated'] = FCMToken.objects.filter(
+            token__in=invalid_tokens
+        ).update(is_active=False)
+        logger.warning(f"⚠️ {result['deactivated']} token(s) FCM invalide(s) désactivé(s)")
+
+    logger.info(f"✅ Multicast: {result['sent']} envoyé(s), {result['failed']} échec(s)")
+    return result
+
+
+def fan_out_notification(user_ids, notification_type, title, body, data=None, object_id=None):
+    """
+    Historique en BDD + push pour une liste de destinataires.
+
+    Avec object_id, le push suit l'état de chaque ligne (pushed_at) :
+    - les lignes encore à pousser sont verrouillées (SELECT ... FOR UPDATE
+      SKIP LOCKED), un envoi concurrent du même lot ne les reprend donc pas ;
+    - pushed_at n'est renseigné qu'après l'envoi, hors utilisateurs d'un envoi
+      multicast en erreur : un nouvel essai ne renvoie rien aux utilisateurs
+      déjà notifiés mais reprend ceux dont le push n'est pas parti.
+
+    Returns:
+        dict: db_saved, push_sent, push_failed, tokens_deactivated,
+        push_pending (utilisateurs dont le push reste à envoyer)
+    """
+    new_user_ids = create_notification_history(
+        user_ids, notification_type, title, body, data, object_id
+    )
+
+    with transaction.atomic():
+        pending = NotificationHistory.objects.filter(
+            notification_type=notification_type,
+            pushed_at__isnull=True
+        )
+        if object_id is not None:
+            pending = pending.filter(object_id=object_id, user_id__in=user_ids)
+        else:
+            # Sans clé d'idempotence : uniquement les lignes créées à l'instant
+            pending = pending.filter(object_id__isnull=True, user_id__in=new_user_ids)
+        rows = list(
+            pending.select_for_update(skip_locked=True).values_list('id', 'user_id')
+        )
+
+        push = send_multicast_notification([user_id for _, user_id in rows], title, body, data)
+
+        pushed_ids = [
+            row_id for row_id, user_id in rows
+            if user_id not in push['unsent_user_ids']
+        ]
+        NotificationHistory.objects.filter(id__in=pushed_ids).update(pushed_at=timezone.now())
+
+    return {
+        'db_saved': len(new_user_ids),
+        'push_sent': push['sent'],
+        'push_failed': push['failed'],
+        'tokens_deactivated': push['deactivated'],
+        'push_pending': len(rows) - len(pushed_ids),
+    }
+
+
 def is_quiet_hours(prefs):
     """Vérifie si on est dans les heures silencieuses"""
     if not prefs.quiet_hours_enabled:
@@ -1,5 +1,6 @@
 # notifications/signals.py
 import logging
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
@@ -58,10 +59,11 @@ def notify_new_quiz(sender, instance, created, **kwargs):
     # ✅ LANCER LA TÂCHE CELERY (asynchrone)
     from .tasks import send_quiz_notifications
     
-    # Utiliser .delay() pour l'exécution asynchrone
-    result = send_quiz_notifications.delay(quiz.id)
+    # Utiliser .delay() pour l'exécution asynchrone, après le COMMIT :
+    # le quiz et ses questions peuvent être créés dans une transaction
+    transaction.on_commit(lambda: send_quiz_notifications.delay(quiz.id))
     
-    print(f"✅ Tâche Celery lancée avec ID: {result.id}")
+    print("✅ Tâche Celery programmée (après commit)")
     print(f"⚡ L'admin peut continuer à travailler, les notifications s'envoient en arrière-plan!")
 
 
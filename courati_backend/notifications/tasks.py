@@ -1,6 +1,8 @@
 # 📁 courati_backend/notifications/tasks.py
 
-from celery import shared_task
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.db import DatabaseError
 from django.utils import timezone
 from datetime import timedelta
 from .models import NotificationHistory
@@ -63,20 +65,106 @@ def test_celery():
         'timestamp': timezone.now().isoformat()
     }
 
+# ========================================
+# ENVOI GROUPÉ PAR LOTS (COORDINATEUR + SOUS-TÂCHES)
+# ========================================
+
+def dispatch_notification_chunks(recipient_ids, notification_type, object_id, title, body, data):
+    """
+    Découper les destinataires en lots de NOTIFICATION_CHUNK_SIZE et lancer
+    un chord : un send_notification_chunk par lot, puis l'agrégation finale.
+    
+    Returns:
+        int: nombre de lots lancés
+    """
+    chunk_size = getattr(settings, 'NOTIFICATION_CHUNK_SIZE', 500)
+    chunks = [
+        recipient_ids[start:start + chunk_size]
+        for start in range(0, len(recipient_ids), chunk_size)
+    ]
+    
+    if not chunks:
+        return 0
+    
+    header = group(
+        send_notification_chunk.s(chunk, notification_type, object_id, title, body, data)
+        for chunk in chunks
+    )
+    chord(header)(aggregate_notification_results.s(notification_type, object_id))
+    
+    return len(chunks)
+
+
+@shared_task(
+    bind=True,
+    name='notifications.tasks.send_notification_chunk',
+    max_retries=3,
+    default_retry_delay=30
+)
+def send_notification_chunk(self, user_ids, notification_type, object_id, title, body, data):
+    """
+    ⚡ SOUS-TÂCHE
+    Historique + push pour un lot de destinataires.
+    Idempotente sur (notification_type, object_id, user_id) : un nouvel essai
+    ne crée pas de doublon et ne renvoie le push qu'aux lignes sans pushed_at.
+    """
+    from .services import fan_out_notification
+    
+    try:
+        result = fan_out_notification(user_ids, notification_type, title, body, data, object_id)
+    except DatabaseError as e:
+        logger.warning(f"⚠️ [CELERY] Lot {notification_type} #{object_id} en échec, nouvel essai: {e}")
+        raise self.retry(exc=e)
+    
+    if result['push_pending'] and self.request.retries < self.max_retries:
+        logger.warning(
+            f"⚠️ [CELERY] Lot {notification_type} #{object_id}: "
+            f"{result['push_pending']} push en échec, nouvel essai"
+        )
+        raise self.retry()
+    
+    logger.info(
+        f"📦 [CELERY] Lot {notification_type} #{object_id}: "
+        f"{result['db_saved']}/{len(user_ids)} en BDD, {result['push_sent']} push"
+    )
+    return result
+
+
+@shared_task(name='notifications.tasks.aggregate_notification_results')
+def aggregate_notification_results(results, notification_type, object_id):
+    """
+    ⚡ CALLBACK DU CHORD
+    Additionner les résultats de tous les lots
+    """
+    totals = {'db_saved': 0, 'push_sent': 0, 'push_failed': 0, 'tokens_deactivated': 0, 'push_pending': 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result.get(key, 0)
+    
+    logger.info(
+        f"✅ [CELERY] {notification_type} #{object_id} terminé ({len(results)} lots): "
+        f"{totals['db_saved']} en BDD, {totals['push_sent']} push envoyés"
+    )
+    
+    return {
+        'success': True,
+        'notification_type': notification_type,
+        'object_id': object_id,
+        'chunks': len(results),
+        **totals,
+    }
+
+
 # ✅ NOUVELLE TÂCHE : ENVOYER LES NOTIFICATIONS DE QUIZ
 @shared_task(name='notifications.tasks.send_quiz_notifications')
 def send_quiz_notifications(quiz_id):
     """
-    ⚡ TÂCHE ASYNCHRONE
+    ⚡ TÂCHE ASYNCHRONE (COORDINATEUR)
     Envoyer les notifications pour un nouveau quiz
-    Exécuté en arrière-plan par Celery
+    Les destinataires sont répartis en lots traités en parallèle
     """
-    from django.contrib.auth import get_user_model
     from courses.models import Quiz
-    from .models import NotificationHistory, SubjectPreference
-    from .services import send_push_notification
-    
-    User = get_user_model()
+    from .services import get_notification_recipients
     
     logger.info(f"🔄 [CELERY] Traitement des notifications pour quiz #{quiz_id}")
     
@@ -87,88 +175,33 @@ def send_quiz_notifications(quiz_id):
         
         logger.info(f"📝 [CELERY] Quiz: {quiz.title} ({subject.code})")
         
-        # Récupérer tous les étudiants concernés
-        students = User.objects.filter(
-            role='STUDENT',
-            student_profile__level__in=subject.levels.all(),
-            student_profile__major__in=subject.majors.all(),
-            is_active=True
-        ).distinct()
+        # Destinataires + préférences en une requête
+        recipient_ids = list(
+            get_notification_recipients(subject, 'quiz_enabled').values_list('id', flat=True)
+        )
         
-        logger.info(f"👥 [CELERY] {students.count()} étudiants concernés")
+        logger.info(f"👥 [CELERY] {len(recipient_ids)} étudiants à notifier")
         
-        success_count = 0
-        db_count = 0
+        # Construire le message
+        title = "📝 Nouveau quiz disponible !"
+        body = f"{quiz.title} en {subject.name}"
+        
+        data = {
+            'type': 'new_quiz',
+            'quiz_id': str(quiz.id),
+            'subject_id': str(subject.id),
+        }
         
-        # Envoyer la notification à chaque étudiant
-        for student in students:
-            # Vérifier les préférences globales
-            prefs = getattr(student, 'notification_preference', None)
-            if not prefs or not prefs.notifications_enabled or not prefs.quiz_enabled:
-                logger.info(f"⏭️ [CELERY] Notifications désactivées pour {student.username}")
-                continue
-            
-            # Vérifier les préférences par matière
-            subject_pref = SubjectPreference.objects.filter(
-                user=student,
-                subject=subject
-            ).first()
-            
-            if subject_pref and not subject_pref.notifications_enabled:
-                logger.info(f"⏭️ [CELERY] Notifs désactivées pour {subject.code} par {student.username}")
-                continue
-            
-            # Construire le message
-            title = "📝 Nouveau quiz disponible !"
-            body = f"{quiz.title} en {subject.name}"
-            
-            data = {
-                'type': 'new_quiz',
-                'quiz_id': str(quiz.id),
-                'subject_id': str(subject.id),
-            }
-            
-            # ✅ ÉTAPE 1 : Enregistrer en BDD
-            try:
-                notification_history = NotificationHistory.objects.create(
-                    user=student,
-                    notification_type='new_quiz',
-                    title=title,
-                    message=body,
-                    data=data
-                )
-                db_count += 1
-                logger.info(f"💾 [CELERY] Notification #{notification_history.id} enregistrée pour {student.username}")
-            except Exception as e:
-                logger.error(f"❌ [CELERY] Erreur BDD pour {student.username}: {e}")
-                continue
-            
-            # ✅ ÉTAPE 2 : Envoyer push notification
-            try:
-                success = send_push_notification(
-                    user=student,
-                    title=title,
-                    body=body,
-                    data=data
-                )
-                
-                if success:
-                    success_count += 1
-                    logger.info(f"✅ [CELERY] Push envoyé à {student.username}")
-                else:
-                    logger.warning(f"⚠️ [CELERY] Push échoué pour {student.username}")
-            except Exception as e:
-                logger.error(f"❌ [CELERY] Erreur push pour {student.username}: {e}")
+        chunks = dispatch_notification_chunks(recipient_ids, 'new_quiz', quiz.id, title, body, data)
         
-        logger.info(f"✅ [CELERY] Traitement terminé: {db_count} en BDD, {success_count} push envoyés")
+        logger.info(f"🚀 [CELERY] {chunks} lot(s) lancé(s) pour quiz #{quiz_id}")
         
         return {
             'success': True,
             'quiz_id': quiz_id,
             'quiz_title': quiz.title,
-            'students_notified': students.count(),
-            'db_saved': db_count,
-            'push_sent': success_count,
+            'students_notified': len(recipient_ids),
+            'chunks': chunks,
         }
         
     except Quiz.DoesNotExist:
@@ -190,15 +223,12 @@ def send_quiz_notifications(quiz_id):
 @shared_task(name='notifications.tasks.send_document_notifications')
 def send_document_notifications(document_id):
     """
-    ⚡ TÂCHE ASYNCHRONE
+    ⚡ TÂCHE ASYNCHRONE (COORDINATEUR)
     Envoyer les notifications pour un nouveau document
+    Les destinataires sont répartis en lots traités en parallèle
     """
-    from django.contrib.auth import get_user_model
     from courses.models import Document
-    from .models import NotificationHistory, SubjectPreference
-    from .services import send_push_notification
-    
-    User = get_user_model()
+    from .services import get_notification_recipients
     
     logger.info(f"🔄 [CELERY] Traitement des notifications pour document #{document_id}")
     
@@ -208,90 +238,40 @@ def send_document_notifications(document_id):
         
         logger.info(f"📚 [CELERY] Document: {document.title} ({subject.code})")
         
-        students = User.objects.filter(
-            role='STUDENT',
-            student_profile__level__in=subject.levels.all(),
-            student_profile__major__in=subject.majors.all(),
-            is_active=True
-        ).distinct()
+        recipient_ids = list(
+            get_notification_recipients(subject, 'new_content_enabled').values_list('id', flat=True)
+        )
+        
+        logger.info(f"👥 [CELERY] {len(recipient_ids)} étudiants à notifier")
         
-        logger.info(f"👥 [CELERY] {students.count()} étudiants concernés")
+        doc_type_display = document.get_document_type_display()
+        title = f"📚 Nouveau {doc_type_display.lower()} disponible !"
+        body = f"{document.title} en {subject.name}"
         
-        success_count = 0
-        db_count = 0
+        # ✅ ENRICHIR LES DATA AVEC TOUTES LES INFOS DE LA MATIÈRE
+        data = {
+            'type': 'new_document',
+            'document_id': str(document.id),
+            'subject_id': str(subject.id),
+            'document_type': document.document_type,
+            # ✅ AJOUT DES INFOS DE LA MATIÈRE
+            'subject_name': subject.name,
+            'subject_code': subject.code,
+            'subject_credits': str(subject.credits),
+            'subject_is_featured': str(subject.is_featured),
+        }
         
-        for student in students:
-            prefs = getattr(student, 'notification_preference', None)
-            if not prefs or not prefs.notifications_enabled or not prefs.new_content_enabled:
-                logger.info(f"⏭️ [CELERY] Notifications désactivées pour {student.username}")
-                continue
-            
-            subject_pref = SubjectPreference.objects.filter(
-                user=student,
-                subject=subject
-            ).first()
-            
-            if subject_pref and not subject_pref.notifications_enabled:
-                logger.info(f"⏭️ [CELERY] Notifs désactivées pour {subject.code} par {student.username}")
-                continue
-            
-            doc_type_display = document.get_document_type_display()
-            title = f"📚 Nouveau {doc_type_display.lower()} disponible !"
-            body = f"{document.title} en {subject.name}"
-            
-            # ✅ ENRICHIR LES DATA AVEC TOUTES LES INFOS DE LA MATIÈRE
-            data = {
-                'type': 'new_document',
-                'document_id': str(document.id),
-                'subject_id': str(subject.id),
-                'document_type': document.document_type,
-                # ✅ AJOUT DES INFOS DE LA MATIÈRE
-                'subject_name': subject.name,
-                'subject_code': subject.code,
-                'subject_credits': str(subject.credits),
-                'subject_is_featured': str(subject.is_featured),
-            }
-            
-            try:
-                notification_history = NotificationHistory.objects.create(
-                    user=student,
-                    notification_type='new_document',
-                    title=title,
-                    message=body,
-                    data=data  # ← Data enrichie
-                )
-                db_count += 1
-                logger.info(f"💾 [CELERY] Notification #{notification_history.id} enregistrée pour {student.username}")
-            except Exception as e:
-                logger.error(f"❌ [CELERY] Erreur BDD pour {student.username}: {e}")
-                continue
-            
-            try:
-                success = send_push_notification(
-                    user=student,
-                    title=title,
-                    body=body,
-                    data=data  # ← Data enrichie
-                )
-                
-                if success:
-                    success_count += 1
-                    logger.info(f"✅ [CELERY] Push envoyé à {student.username}")
-                else:
-                    logger.warning(f"⚠️ [CELERY] Push échoué pour {student.username}")
-            except Exception as e:
-                logger.error(f"❌ [CELERY] Erreur push pour {student.username}: {e}")
+        chunks = dispatch_notification_chunks(recipient_ids, 'new_document', document.id, title, body, data)
         
-        logger.info(f"✅ [CELERY] Traitement terminé: {db_count} en BDD, {success_count} push envoyés")
+        logger.info(f"🚀 [CELERY] {chunks} lot(s) lancé(s) pour document #{document_id}")
         
         return {
             'success': True,
             'document_id': document_id,
             'document_title': document.title,
             'document_type': document.document_type,
-            'students_notified': students.count(),
-            'db_saved': db_count,
-            'push_sent': success_count,
+            'students_notified': len(recipient_ids),
+            'chunks': chunks,
         }
         
     except Document.DoesNotExist:
@@ -301,4 +281,4 @@ def send_document_notifications(document_id):
         logger.error(f"❌ [CELERY] Erreur globale: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return {'success': False, 'error': str(e)}
\ No newline at end of file
+        return {'success': False, 'error': str(e)}
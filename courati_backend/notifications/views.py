@@ -4,6 +4,7 @@ from rest_framework import status, permissions, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 
 from .models import FCMToken, NotificationPreference, SubjectPreference, NotificationHistory
@@ -14,6 +15,7 @@ from .serializers import (
     NotificationHistorySerializer
 )
 from courses.models import Subject
+from config.pagination import paginate_request
 
 logger = logging.getLogger(__name__)
 
@@ -287,9 +289,9 @@ class SubjectPreferenceUpdateView(APIView):
 class NotificationHistoryListView(APIView):
     """
     Liste des notifications reçues
-    GET /api/notifications/history/
+    GET /api/notifications/history/?page_size=50&cursor=...
     
-    ✅ LIMITÉ À 100 NOTIFICATIONS (les plus récentes)
+    ✅ Pagination par curseur (50 notifications par page, les plus récentes d'abord)
     ✅ Les anciennes sont supprimées automatiquement après 30 jours
     """
     permission_classes = [permissions.IsAuthenticated]
@@ -297,10 +299,19 @@ class NotificationHistoryListView(APIView):
     def get(self, request):
         user = request.user
         
-        # ✅ RÉCUPÉRER SEULEMENT LES 50 DERNIÈRES
-        notifications = NotificationHistory.objects.filter(
-            user=user
-        ).order_by('-sent_at')[:50]  # ← LIMITE ICI
+        try:
+            notifications, pagination = paginate_request(
+                request,
+                NotificationHistory.objects.filter(user=user),
+                ('-sent_at', '-id'),
+                total='none'
+            )
+        except ValidationError as e:
+            return Response({
+                'success': False,
+                'error': 'Paramètres de pagination invalides',
+                'details': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = NotificationHistorySerializer(notifications, many=True)
         
@@ -314,7 +325,8 @@ class NotificationHistoryListView(APIView):
             'success': True,
             'count': len(serializer.data),
             'unread_count': unread_count,
-            'notifications': serializer.data
+            'notifications': serializer.data,
+            'pagination': pagination
         })
 
 